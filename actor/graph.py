@@ -0,0 +1,267 @@
+"""
+Actor collaboration graph: who played with whom, and how far apart two
+actors are.
+
+`manage.py build_actor_graph` turns the Casting table into a bipartite
+actor-movie graph stored as NumPy arrays under ACTOR_GRAPH_DIR, in CSR
+form both ways (the movies of actor i are
+actor_movies[actor_indptr[i]:actor_indptr[i + 1]], the cast of movie j
+likewise) plus every actor's top co-stars, precomputed. Web workers
+memory-map the files, so they share one copy through the page cache.
+
+Each build goes to a new directory and CURRENT is switched to it
+atomically. Workers notice within ACTOR_GRAPH_CHECK_SECONDS and map the
+new build, and readers of the old one are unaffected. Without a build,
+get_graph() returns None and pages do without.
+
+Shortest paths use a bidirectional breadth-first search that always
+expands the smaller frontier, one hop (actor -> movie or movie -> actor)
+at a time, with each frontier expanded in vectorized NumPy calls.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from movie.models import Casting
+
+
+ARRAYS = (
+	'actor_ids', 'movie_ids',
+	'actor_indptr', 'actor_movies', 'movie_indptr', 'movie_actors',
+	'costar_indptr', 'costar_actors', 'costar_counts',
+)
+# Builds kept on disk, older ones are removed by the next build
+KEEP_BUILDS = 2
+
+UNSEEN = -2
+ROOT = -1
+
+CoStar = namedtuple('CoStar', ['actor_id', 'movies'])
+
+
+def csr(rows, columns, row_count):
+	"""indptr and indices of the CSR matrix with a 1 at every (rows, columns)"""
+	order = np.lexsort((columns, rows))
+	indptr = np.zeros(row_count + 1, dtype=np.int64)
+	np.cumsum(np.bincount(rows, minlength=row_count), out=indptr[1:])
+	return indptr, columns[order].astype(np.int32)
+
+
+def gather(indptr, indices, nodes):
+	"""(neighbors, node each neighbor was reached from) of every node of `nodes`"""
+	starts, ends = indptr[nodes], indptr[nodes + 1]
+	sizes = ends - starts
+	total = int(sizes.sum())
+	if not total:
+		return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+	sources = np.repeat(nodes, sizes)
+	# Position of every neighbor in `indices`: its slice start plus its rank in the slice
+	offsets = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+	return indices[np.repeat(starts, sizes) + offsets].astype(np.int64), sources
+
+
+def top_costars(actor_indptr, actor_movies, movie_indptr, movie_actors, top):
+	"""CSR of the `top` most frequent co-stars of every actor, with their number of shared movies"""
+	actor_count = len(actor_indptr) - 1
+	movie_of_entry = np.repeat(np.arange(len(movie_indptr) - 1), np.diff(movie_indptr))
+	# Every ordered pair of actors sharing a movie, once per movie
+	left, _ = gather(movie_indptr, movie_actors, movie_of_entry)
+	right = np.repeat(movie_actors.astype(np.int64), np.diff(movie_indptr)[movie_of_entry])
+	keep = left != right
+	pairs, counts = np.unique(right[keep] * actor_count + left[keep], return_counts=True)
+	actors, costars = pairs // actor_count, pairs % actor_count
+
+	# Most shared movies first, then by actor for stable lists
+	order = np.lexsort((costars, -counts, actors))
+	actors, costars, counts = actors[order], costars[order], counts[order]
+	group_starts = np.searchsorted(actors, actors)
+	keep = np.arange(len(actors)) - group_starts < top
+	actors, costars, counts = actors[keep], costars[keep], counts[keep]
+
+	indptr = np.zeros(actor_count + 1, dtype=np.int64)
+	np.cumsum(np.bincount(actors, minlength=actor_count), out=indptr[1:])
+	return indptr, costars.astype(np.int32), counts.astype(np.int32)
+
+
+def build_arrays(pairs, top):
+	"""Arrays of the graph of (actor id, movie id) `pairs`"""
+	pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+	actor_ids, actor_index = np.unique(pairs[:, 0], return_inverse=True)
+	movie_ids, movie_index = np.unique(pairs[:, 1], return_inverse=True)
+	actor_indptr, actor_movies = csr(actor_index, movie_index, len(actor_ids))
+	movie_indptr, movie_actors = csr(movie_index, actor_index, len(movie_ids))
+	costar_indptr, costar_actors, costar_counts = top_costars(actor_indptr, actor_movies, movie_indptr, movie_actors, top)
+	return {
+		'actor_ids': actor_ids, 'movie_ids': movie_ids,
+		'actor_indptr': actor_indptr, 'actor_movies': actor_movies,
+		'movie_indptr': movie_indptr, 'movie_actors': movie_actors,
+		'costar_indptr': costar_indptr, 'costar_actors': costar_actors, 'costar_counts': costar_counts,
+	}
+
+
+def build(directory=None, top=None):
+	"""Build the graph from the Casting table and make it current, returns its metadata"""
+	directory = directory or settings.ACTOR_GRAPH_DIR
+	top = top or settings.ACTOR_GRAPH_TOP_COSTARS
+	started = time.perf_counter()
+	arrays = build_arrays(list(Casting.objects.values_list('actor_id', 'movie_id')), top)
+
+	version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+	path = os.path.join(directory, version)
+	os.makedirs(path)
+	for name, values in arrays.items():
+		np.save(os.path.join(path, name + '.npy'), values)
+	meta = {
+		'version': version,
+		'actors': len(arrays['actor_ids']),
+		'movies': len(arrays['movie_ids']),
+		'castings': len(arrays['actor_movies']),
+		'top_costars': top,
+		'built_at': timezone.now().isoformat(),
+		'seconds': round(time.perf_counter() - started, 3),
+	}
+	with open(os.path.join(path, 'meta.json'), 'w') as f:
+		json.dump(meta, f)
+
+	current = os.path.join(directory, 'CURRENT')
+	with open(current + '.tmp', 'w') as f:
+		f.write(version)
+	os.replace(current + '.tmp', current)
+
+	builds = sorted(name for name in os.listdir(directory) if name.isdigit())
+	for name in builds[:-KEEP_BUILDS]:
+		shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+	return meta
+
+
+class ActorGraph:
+
+	def __init__(self, path):
+		with open(os.path.join(path, 'meta.json')) as f:
+			self.meta = json.load(f)
+		for name in ARRAYS:
+			setattr(self, name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+
+	@property
+	def version(self):
+		return self.meta['version']
+
+	@property
+	def built_at(self):
+		return datetime.fromisoformat(self.meta['built_at'])
+
+	def actor_index(self, actor_id):
+		position = int(np.searchsorted(self.actor_ids, actor_id))
+		if position < len(self.actor_ids) and self.actor_ids[position] == actor_id:
+			return position
+		return None
+
+	def costars(self, actor_id, limit=None):
+		"""[CoStar(actor id, shared movies)] most frequent first"""
+		index = self.actor_index(actor_id)
+		if index is None:
+			return []
+		start, end = int(self.costar_indptr[index]), int(self.costar_indptr[index + 1])
+		if limit is not None:
+			end = min(end, start + limit)
+		actors = self.actor_ids[self.costar_actors[start:end]].tolist()
+		return [CoStar(actor, movies) for actor, movies in zip(actors, self.costar_counts[start:end].tolist())]
+
+	def shortest_path(self, source_id, target_id, max_movies=6):
+		"""
+		[actor id, movie id, actor id, ..., actor id] of a shortest chain of
+		shared movies between two actors, None when they are not connected
+		within `max_movies` movies.
+		"""
+		source, target = self.actor_index(source_id), self.actor_index(target_id)
+		if source is None or target is None:
+			return None
+		if source == target:
+			return [int(source_id)]
+
+		actor_count, movie_count = len(self.actor_ids), len(self.movie_ids)
+		# Per side, the node every actor and movie was reached from
+		sides = []
+		for root in (source, target):
+			actor_parent = np.full(actor_count, UNSEEN, dtype=np.int64)
+			actor_parent[root] = ROOT
+			sides.append({
+				'parents': {'actor': actor_parent, 'movie': np.full(movie_count, UNSEEN, dtype=np.int64)},
+				'frontier': np.array([root], dtype=np.int64),
+				'kind': 'actor',
+			})
+
+		for _ in range(2 * max_movies):
+			side, other = sorted(sides, key=lambda s: len(s['frontier']))
+			if not len(side['frontier']):
+				return None
+			if side['kind'] == 'actor':
+				reached, sources = gather(self.actor_indptr, self.actor_movies, side['frontier'])
+				kind = 'movie'
+			else:
+				reached, sources = gather(self.movie_indptr, self.movie_actors, side['frontier'])
+				kind = 'actor'
+
+			parents = side['parents'][kind]
+			fresh = parents[reached] == UNSEEN
+			reached, sources = reached[fresh], sources[fresh]
+			reached, first = np.unique(reached, return_index=True)
+			parents[reached] = sources[first]
+			side['frontier'], side['kind'] = reached, kind
+
+			met = reached[other['parents'][kind][reached] != UNSEEN]
+			if len(met):
+				return self.join(sides, kind, int(met[0]))
+		return None
+
+	def join(self, sides, kind, node):
+		"""Path from the source to the target through `node`, reached from both sides"""
+		halves = []
+		for side in sides:
+			half, current, current_kind = [], node, kind
+			while current != ROOT:
+				half.append((current_kind, current))
+				current = int(side['parents'][current_kind][current])
+				current_kind = 'movie' if current_kind == 'actor' else 'actor'
+			halves.append(half)
+		forward, backward = halves
+		chain = forward[::-1] + backward[1:]
+		ids = {'actor': self.actor_ids, 'movie': self.movie_ids}
+		return [int(ids[kind][index]) for kind, index in chain]
+
+
+_graph = None
+_graph_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current_version(directory=None):
+	try:
+		with open(os.path.join(directory or settings.ACTOR_GRAPH_DIR, 'CURRENT')) as f:
+			return f.read().strip() or None
+	except FileNotFoundError:
+		return None
+
+
+def get_graph():
+	"""This process's mapping of the current build, None before the first build"""
+	global _graph, _graph_version, _checked_at
+	now = time.monotonic()
+	if _graph is not None and now - _checked_at < settings.ACTOR_GRAPH_CHECK_SECONDS:
+		return _graph
+	with _lock:
+		_checked_at = now
+		version = current_version()
+		if version != _graph_version:
+			_graph = ActorGraph(os.path.join(settings.ACTOR_GRAPH_DIR, version)) if version else None
+			_graph_version = version
+		return _graph
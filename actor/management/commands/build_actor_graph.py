@@ -0,0 +1,48 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from actor import graph
+
+
+class Command(BaseCommand):
+    help = 'Build the actor collaboration graph (co-stars and shortest paths) from the Casting table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=settings.ACTOR_GRAPH_TOP_COSTARS, help='Co-stars kept per actor')
+        parser.add_argument('--paths', type=int, default=0, help='Then time this many shortest paths between random actors')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        meta = graph.build(top=options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Built graph {meta['version']}: {meta['actors']} actors, {meta['movies']} movies, "
+            f"{meta['castings']} castings in {meta['seconds']}s."
+        ))
+        if options['paths']:
+            self.time_paths(graph.ActorGraph(settings.ACTOR_GRAPH_DIR / meta['version']), options['paths'], options['seed'])
+
+    def time_paths(self, built, count, seed):
+        rng = random.Random(seed)
+        actor_ids = built.actor_ids.tolist()
+        timings, lengths, unconnected = [], [], 0
+        for _ in range(count):
+            source, target = rng.choice(actor_ids), rng.choice(actor_ids)
+            start = time.perf_counter()
+            path = built.shortest_path(source, target)
+            timings.append((time.perf_counter() - start) * 1000)
+            if path is None:
+                unconnected += 1
+            else:
+                lengths.append(len(path) // 2)
+        timings.sort()
+        self.stdout.write(
+            f'{count} paths: median {statistics.median(timings):.2f} ms, '
+            f'p95 {timings[int((len(timings) - 1) * 0.95)]:.2f} ms, '
+            f'max {timings[-1]:.2f} ms; '
+            f'{unconnected} unconnected within 6 movies, '
+            f'mean {statistics.mean(lengths) if lengths else 0:.2f} movies apart'
+        )
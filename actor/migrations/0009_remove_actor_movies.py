@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actor', '0008_alter_actor_id'),
+        # Its links are merged into movie.Casting first
+        ('movie', '0036_casting'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='actor',
+            name='movies',
+        ),
+    ]
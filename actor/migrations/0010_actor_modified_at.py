@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actor', '0009_remove_actor_movies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actor',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
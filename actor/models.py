@@ -2,6 +2,7 @@ from django.db import models
 
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils import timezone
 
 # Create your models here.
 
@@ -9,7 +10,8 @@ class Actor(models.Model):
 	name = models.CharField(max_length=70, unique=True)
 	picture = models.ImageField(blank=True)
 	slug = models.SlugField(null=True, unique=True)
-	movies = models.ManyToManyField('movie.Movie')
+	# Last change to the actor's own row, part of the validator of the actor page
+	modified_at = models.DateTimeField(default=timezone.now)
 
 	def get_absolute_url(self):
 		return reverse('actors', args=[self.slug])
@@ -20,4 +22,5 @@ class Actor(models.Model):
 	def save(self, *args, **kwargs):
 		if not self.slug:
 			self.slug = slugify(self.name)
+		self.modified_at = timezone.now()
 		return super().save(*args, **kwargs)
@@ -1,28 +1,93 @@
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
 from django.template import loader
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import Q
 
+from actor import graph
 from actor.models import Actor
-from movie.models import Movie
+from movie import listings
+from movie.models import Movie, MOVIE_SORTS, DEFAULT_MOVIE_SORT
+from movie.cursors import InvalidCursor
+from authy.models import UserMovieState
+from movie.conditional import conditional_page, movie_markers
 
 # Create your views here.
 
+# Co-stars shown on an actor page, the graph keeps ACTOR_GRAPH_TOP_COSTARS
+COSTARS_SHOWN = 8
 
+
+def actor_markers(request, actor_slug):
+	# The name and picture are on the actor's own row
+	actor = Actor.objects.filter(slug=actor_slug).values_list('pk', 'modified_at').first()
+	found = movie_markers(Movie.objects.filter(Actors__slug=actor_slug))
+	if actor is None or found is None:
+		return None
+	parts, modified = found
+	parts, modified = (actor, parts), max(filter(None, (actor[1], modified)))
+	collaborations = graph.get_graph()
+	if collaborations is None:
+		return parts, modified
+	# Co-stars and paths change with the graph build
+	return (parts, collaborations.version), max(filter(None, (modified, collaborations.built_at)))
+
+
+def frequent_costars(collaborations, actor):
+	"""[(Actor, shared movies)] from the precomputed co-star lists"""
+	found = collaborations.costars(actor.pk, COSTARS_SHOWN)
+	actors = Actor.objects.in_bulk([costar.actor_id for costar in found])
+	return [(actors[costar.actor_id], costar.movies) for costar in found if costar.actor_id in actors]
+
+
+def separation(collaborations, actor, query):
+	"""The other actor, looked up by name or slug, and the chain of movies and co-stars leading to them"""
+	other = Actor.objects.filter(Q(name__iexact=query) | Q(slug=query)).first()
+	if other is None:
+		return {'query': query, 'error': 'No actor named "%s".' % query}
+	path = collaborations.shortest_path(actor.pk, other.pk)
+	if path is None:
+		return {'query': query, 'other': other, 'error': '%s and %s are not connected within six movies.' % (actor, other)}
+	actors = Actor.objects.in_bulk(path[2::2])
+	movies = Movie.objects.in_bulk(path[1::2])
+	if len(actors) < len(path[2::2]) or len(movies) < len(path[1::2]):
+		# Deleted since the graph was built
+		return {'query': query, 'other': other, 'error': 'This connection is being updated, please try again later.'}
+	steps = [{'movie': movies[movie_id], 'actor': actors[actor_id]} for movie_id, actor_id in zip(path[1::2], path[2::2])]
+	return {'query': query, 'other': other, 'steps': steps}
+
+
+@conditional_page(actor_markers)
 def actors(request, actor_slug):
 	actor = get_object_or_404(Actor, slug=actor_slug)
-	movies = Movie.objects.filter(Actors=actor)
+	# Through Casting's (actor, movie) index
+	movies = actor.movies.all()
+	sort = request.GET.get('sort')
+	if sort not in MOVIE_SORTS:
+		sort = DEFAULT_MOVIE_SORT
 
 	#Pagination
-	paginator = Paginator(movies, 9)
-	page_number = request.GET.get('page')
-	movie_data = paginator.get_page(page_number)
+	cursor = request.GET.get('after')
+	try:
+		page = listings.movie_page(movies, sort, cursor)
+	except InvalidCursor:
+		return HttpResponseRedirect('%s?sort=%s' % (request.path, sort))
 
 	context = {
-		'movie_data': movie_data,
+		'movie_data': UserMovieState.objects.annotate(request.user, page.items),
+		'next_cursor': page.next_cursor,
+		'first_page': not cursor,
+		'total': listings.movie_count('actor:%s' % actor.pk, movies),
 		'actor': actor,
+		'sort': sort,
 	}
 
+	collaborations = graph.get_graph()
+	if collaborations is not None:
+		context['costars'] = frequent_costars(collaborations, actor)
+		query = request.GET.get('with', '').strip()
+		if query:
+			context['separation'] = separation(collaborations, actor, query)
+
 
 	template = loader.get_template('actor.html')
 
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AuthyConfig(AppConfig):
     name = 'authy'
+
+    def ready(self):
+        from authy import signals  # noqa: F401
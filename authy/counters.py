@@ -0,0 +1,74 @@
+"""
+Counting what ProfileCounters holds, with one grouped query per counter
+for any number of users. The signals of authy/signals.py recount the
+counters a change touches for the users it touches, rather than adding
+and subtracting, so a counter cannot drift from a replayed or partial
+signal: M2M removals report the ids asked for, not the ones removed.
+"""
+from django.db.models import Count
+
+from authy.models import Profile, PersonalList, ProfileCounters
+from gamification.models import UserBadge
+from movie.models import Review
+
+
+COUNTERS = ('movies_watched', 'series_watched', 'watchlist', 'reviews', 'personal_lists', 'badges')
+WATCHED = ('movies_watched', 'series_watched')
+
+
+def grouped(rows):
+	"""Number of rows of every group of a values_list(), keyed on its values"""
+	rows = rows.annotate(n=Count('pk')).order_by()
+	return {values[0] if len(values) == 1 else tuple(values): n for *values, n in rows}
+
+
+def count(user_ids, fields=COUNTERS):
+	"""user id -> {counter: value} of the given counters"""
+	counts = {user_id: dict.fromkeys(fields, 0) for user_id in user_ids}
+	user_ids = list(counts)
+
+	if set(fields) & set(WATCHED):
+		watched = Profile.watched.through.objects.filter(profile__user_id__in=user_ids, movie__Type__in=['movie', 'series'])
+		for (user_id, kind), n in grouped(watched.values_list('profile__user_id', 'movie__Type')).items():
+			field = 'movies_watched' if kind == 'movie' else 'series_watched'
+			if field in counts[user_id]:
+				counts[user_id][field] = n
+
+	simple = {
+		'watchlist': Profile.to_watch.through.objects.filter(profile__user_id__in=user_ids).values_list('profile__user_id'),
+		'reviews': Review.objects.filter(user_id__in=user_ids).values_list('user_id'),
+		'personal_lists': PersonalList.objects.filter(user_id__in=user_ids).values_list('user_id'),
+		'badges': UserBadge.objects.filter(user_id__in=user_ids).values_list('user_id'),
+	}
+	for field, rows in simple.items():
+		if field in fields:
+			for user_id, n in grouped(rows).items():
+				counts[user_id][field] = n
+	return counts
+
+
+def recount(user_ids, fields=COUNTERS):
+	"""
+	Store the given counters of the users of `user_ids` that have a row.
+	Rows are not created here: signals of a user being deleted would bring
+	theirs back.
+	"""
+	user_ids = list(ProfileCounters.objects.filter(user_id__in=list(user_ids)).values_list('user_id', flat=True))
+	if user_ids:
+		rows = [ProfileCounters(user_id=user_id, **values) for user_id, values in count(user_ids, fields).items()]
+		ProfileCounters.objects.bulk_update(rows, list(fields))
+
+
+def rebuild(user_ids):
+	"""Count and store every counter of `user_ids`, creating missing rows, returns user id -> row"""
+	rows = [ProfileCounters(user_id=user_id, **values) for user_id, values in count(user_ids).items()]
+	ProfileCounters.objects.bulk_create(rows, update_conflicts=True, unique_fields=['user'], update_fields=list(COUNTERS))
+	return {row.user_id: row for row in rows}
+
+
+def for_user(user):
+	"""The counters of `user`, counted and stored the first time"""
+	counters = ProfileCounters.objects.filter(user=user).first()
+	if counters is None:
+		counters = rebuild([user.pk])[user.pk]
+	return counters
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authy import counters
+from authy.models import ProfileCounters
+
+
+class Command(BaseCommand):
+    help = 'Recount the profile counters of every user with grouped queries, creating missing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users recounted per round of queries')
+
+    def handle(self, *args, **options):
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        fixed = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            with transaction.atomic():
+                stored = {row.user_id: row for row in ProfileCounters.objects.filter(user_id__in=batch)}
+                for user_id, row in counters.rebuild(batch).items():
+                    old = stored.get(user_id)
+                    if old is None or any(getattr(old, field) != getattr(row, field) for field in counters.COUNTERS):
+                        fixed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Fixed the profile counters of {fixed} of {len(user_ids)} users.'))
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def assign_list_slots(apps, schema_editor):
+    PersonalList = apps.get_model('authy', 'PersonalList')
+    slots = {}
+    for plist in PersonalList.objects.order_by('created_at', 'id'):
+        plist.slot = slots.get(plist.user_id, 0)
+        slots[plist.user_id] = plist.slot + 1
+        plist.save(update_fields=['slot'])
+
+
+def fill_user_movie_states(apps, schema_editor):
+    Profile = apps.get_model('authy', 'Profile')
+    PersonalList = apps.get_model('authy', 'PersonalList')
+    UserMovieState = apps.get_model('authy', 'UserMovieState')
+    Review = apps.get_model('movie', 'Review')
+
+    states = {}
+
+    def state(user_id, movie_id):
+        key = (user_id, movie_id)
+        if key not in states:
+            states[key] = UserMovieState(user_id=user_id, movie_id=movie_id)
+        return states[key]
+
+    for user_id, movie_id in Profile.to_watch.through.objects.values_list('profile__user_id', 'movie_id'):
+        state(user_id, movie_id).in_watchlist = True
+    for user_id, movie_id in Profile.watched.through.objects.values_list('profile__user_id', 'movie_id'):
+        state(user_id, movie_id).watched = True
+    for user_id, movie_id, rate in Review.objects.values_list('user_id', 'movie_id', 'rate'):
+        state(user_id, movie_id).rating = rate
+    rows = PersonalList.movies.through.objects.values_list('personallist__user_id', 'movie_id', 'personallist__slot')
+    for user_id, movie_id, slot in rows:
+        state(user_id, movie_id).lists |= 1 << slot
+
+    UserMovieState.objects.bulk_create(states.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('movie', '0031_review_keyset_indexes'),
+        ('authy', '0003_personallist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personallist',
+            name='slot',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(assign_list_slots, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='personallist',
+            unique_together={('user', 'name'), ('user', 'slot')},
+        ),
+        migrations.CreateModel(
+            name='UserMovieState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watched', models.BooleanField(default=False)),
+                ('in_watchlist', models.BooleanField(default=False)),
+                ('rating', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('lists', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_states', to='movie.movie')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movie_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'movie')},
+            },
+        ),
+        migrations.RunPython(fill_user_movie_states, migrations.RunPython.noop),
+    ]
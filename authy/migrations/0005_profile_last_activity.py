@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:18
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_last_activity(apps, schema_editor):
+    apps.get_model('authy', 'Profile').objects.update(last_activity=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authy', '0004_user_movie_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_last_activity, migrations.RunPython.noop),
+    ]
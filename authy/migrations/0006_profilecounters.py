@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_profile_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Profile = apps.get_model('authy', 'Profile')
+    PersonalList = apps.get_model('authy', 'PersonalList')
+    ProfileCounters = apps.get_model('authy', 'ProfileCounters')
+    Review = apps.get_model('movie', 'Review')
+    UserBadge = apps.get_model('gamification', 'UserBadge')
+
+    counters = {user_id: ProfileCounters(user_id=user_id) for user_id in User.objects.values_list('pk', flat=True)}
+
+    def fill(field, rows):
+        for user_id, n in rows.annotate(n=Count('pk')).order_by():
+            setattr(counters[user_id], field, n)
+
+    watched = Profile.watched.through.objects.values_list('profile__user_id')
+    fill('movies_watched', watched.filter(movie__Type='movie'))
+    fill('series_watched', watched.filter(movie__Type='series'))
+    fill('watchlist', Profile.to_watch.through.objects.values_list('profile__user_id'))
+    fill('reviews', Review.objects.values_list('user_id'))
+    fill('personal_lists', PersonalList.objects.values_list('user_id'))
+    fill('badges', UserBadge.objects.values_list('user_id'))
+
+    ProfileCounters.objects.bulk_create(counters.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gamification', '0002_auto_20250830_1002'),
+        ('movie', '0031_review_keyset_indexes'),
+        ('authy', '0005_profile_last_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('movies_watched', models.PositiveIntegerField(default=0)),
+                ('series_watched', models.PositiveIntegerField(default=0)),
+                ('watchlist', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('personal_lists', models.PositiveIntegerField(default=0)),
+                ('badges', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_profile_counters, migrations.RunPython.noop),
+    ]
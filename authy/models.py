@@ -6,10 +6,14 @@ from django.db.models.signals import post_save
 
 from PIL import Image
 from django.conf import settings
+from django.utils import timezone
 import os
 
 # Create your models here.
 
+# Slots available for PersonalList.slot, the views allow 5 lists per user
+MAX_LIST_SLOTS = 30
+
 def user_directory_path(instance, filename):
 	profile_pic_name = 'user_{0}/profile.jpg'.format(instance.user.id)
 	full_path = os.path.join(settings.MEDIA_ROOT, profile_pic_name)
@@ -30,8 +34,11 @@ class Profile(models.Model):
 	to_watch = models.ManyToManyField(Movie, related_name='towatch')
 	watched = models.ManyToManyField(Movie, related_name='watched')
 	picture = models.ImageField(upload_to=user_directory_path, blank=True, null=True)
+	# Touched with every change to what the profile page shows (authy/signals.py)
+	last_activity = models.DateTimeField(null=True, blank=True)
 
 	def save(self, *args, **kwargs):
+		self.last_activity = timezone.now()
 		super().save(*args, **kwargs)
 		SIZE = 250, 250
 
@@ -43,6 +50,29 @@ class Profile(models.Model):
 	def __str__(self):
 		return self.user.username
 
+	@classmethod
+	def touch(cls, user_ids):
+		"""Mark the profiles of `user_ids`, a list or a values() queryset, as changed"""
+		cls.objects.filter(user_id__in=user_ids).update(last_activity=timezone.now())
+
+
+class ProfileCounters(models.Model):
+	"""
+	What the header of a profile page counts, one row per user, so showing
+	it is one primary key read. Kept by authy/signals.py with authy/counters.py
+	and recomputed by `manage.py repair_profile_counters`.
+	"""
+	user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+	movies_watched = models.PositiveIntegerField(default=0)
+	series_watched = models.PositiveIntegerField(default=0)
+	watchlist = models.PositiveIntegerField(default=0)
+	reviews = models.PositiveIntegerField(default=0)
+	personal_lists = models.PositiveIntegerField(default=0)
+	badges = models.PositiveIntegerField(default=0)
+
+	def __str__(self):
+		return f"{self.user_id} counters"
+
 
 class PersonalList(models.Model):
 	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='personal_lists')
@@ -50,22 +80,83 @@ class PersonalList(models.Model):
 	movies = models.ManyToManyField(Movie, related_name='in_personal_lists', blank=True)
 	is_private = models.BooleanField(default=False)
 	created_at = models.DateTimeField(auto_now_add=True)
+	# Bit of this list in UserMovieState.lists, unique per user
+	slot = models.PositiveSmallIntegerField(null=True, blank=True)
 
 	class Meta:
-		unique_together = [('user', 'name')]
+		unique_together = [('user', 'name'), ('user', 'slot')]
 		ordering = ['-created_at']
 
 	def __str__(self):
 		return f"{self.name} (@{self.user.username})"
 
+	def save(self, *args, **kwargs):
+		if self.slot is None:
+			taken = set(PersonalList.objects.filter(user_id=self.user_id).values_list('slot', flat=True))
+			self.slot = next(slot for slot in range(MAX_LIST_SLOTS + 1) if slot not in taken)
+		return super().save(*args, **kwargs)
+
+	@property
+	def bit(self):
+		return 1 << self.slot
+
 	@property
 	def items_count(self):
 		return self.movies.count()
 
 
+class UserMovieStateQuerySet(models.QuerySet):
+
+	def lookup(self, user, movies):
+		"""movie id -> UserMovieState of `user` for the given movies or ids, in one query"""
+		if not user.is_authenticated:
+			return {}
+		movie_ids = [getattr(movie, 'pk', movie) for movie in movies]
+		return {state.movie_id: state for state in self.filter(user=user, movie_id__in=movie_ids)}
+
+	def annotate(self, user, movies):
+		"""Set `user_state` on every movie, None where the user has no state for it"""
+		movies = list(movies)
+		states = self.lookup(user, movies)
+		for movie in movies:
+			movie.user_state = states.get(movie.pk)
+		return movies
+
+
+class UserMovieState(models.Model):
+	"""
+	What a user did with a movie, in one row: watched, on the watchlist,
+	their rating and which personal lists hold it (bit PersonalList.slot of
+	`lists`). Derived from Profile.watched/to_watch, reviews and personal
+	lists, and kept in sync by authy/signals.py.
+	"""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='movie_states')
+	movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='user_states')
+	watched = models.BooleanField(default=False)
+	in_watchlist = models.BooleanField(default=False)
+	rating = models.PositiveSmallIntegerField(null=True, blank=True)
+	lists = models.PositiveIntegerField(default=0)
+
+	objects = UserMovieStateQuerySet.as_manager()
+
+	class Meta:
+		unique_together = ['user', 'movie']
+
+	def __str__(self):
+		return f"{self.user_id}:{self.movie_id}"
+
+	@property
+	def reviewed(self):
+		return self.rating is not None
+
+	def in_list(self, personal_list):
+		return bool(self.lists & personal_list.bit)
+
+
 def create_user_profile(sender, instance, created, **kwargs):
 	if created:
 		Profile.objects.create(user=instance)
+		ProfileCounters.objects.create(user=instance)
 
 
 def save_user_profile(sender, instance, **kwargs):
@@ -0,0 +1,147 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from django.contrib.auth.models import User
+
+from authy import counters
+from authy.models import Profile, PersonalList, UserMovieState
+from movie.models import Review
+from gamification.models import UserPoints, UserBadge
+
+
+ALL_LISTS = (1 << 31) - 1
+
+
+def ensure_states(user_id, movie_ids):
+	UserMovieState.objects.bulk_create(
+		[UserMovieState(user_id=user_id, movie_id=movie_id) for movie_id in movie_ids],
+		ignore_conflicts=True,
+	)
+
+
+def prune_states(states):
+	"""Rows that no longer say anything are dropped"""
+	states.filter(watched=False, in_watchlist=False, rating=None, lists=0).delete()
+
+
+def set_flag(states, field, value):
+	states.update(**{field: value})
+	if not value:
+		prune_states(states)
+
+
+def sync_profile_movies(field, counted):
+	"""m2m_changed receiver for Profile.watched and Profile.to_watch, `counted` the ProfileCounters they change"""
+	def receiver(sender, instance, action, reverse, pk_set, **kwargs):
+		if action not in ('post_add', 'post_remove', 'post_clear'):
+			return
+		value = action == 'post_add'
+		if not reverse:
+			states = UserMovieState.objects.filter(user_id=instance.user_id)
+			if action != 'post_clear':
+				if value:
+					ensure_states(instance.user_id, pk_set)
+				states = states.filter(movie_id__in=pk_set)
+		else:
+			states = UserMovieState.objects.filter(movie_id=instance.pk)
+			if action != 'post_clear':
+				user_ids = list(Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+				if value:
+					for user_id in user_ids:
+						ensure_states(user_id, [instance.pk])
+				states = states.filter(user_id__in=user_ids)
+		user_ids = list(states.values_list('user_id', flat=True)) if reverse else [instance.user_id]
+		Profile.touch(user_ids)
+		set_flag(states, field, value)
+		counters.recount(user_ids, counted)
+	return receiver
+
+
+def sync_list_movies(sender, instance, action, reverse, pk_set, **kwargs):
+	if action not in ('post_add', 'post_remove', 'post_clear'):
+		return
+	if not reverse:
+		changes = [(instance, pk_set)]
+	elif action == 'post_clear':
+		# The movie left every list
+		states = UserMovieState.objects.filter(movie_id=instance.pk)
+		Profile.touch(states.exclude(lists=0).values('user_id'))
+		set_flag(states, 'lists', 0)
+		return
+	else:
+		changes = [(plist, [instance.pk]) for plist in PersonalList.objects.filter(pk__in=pk_set)]
+
+	Profile.touch([plist.user_id for plist, movie_ids in changes])
+	for plist, movie_ids in changes:
+		states = UserMovieState.objects.filter(user_id=plist.user_id)
+		if action != 'post_clear':
+			states = states.filter(movie_id__in=movie_ids)
+		if action == 'post_add':
+			ensure_states(plist.user_id, movie_ids)
+			states.update(lists=F('lists').bitor(plist.bit))
+		else:
+			states.update(lists=F('lists').bitand(ALL_LISTS ^ plist.bit))
+			prune_states(states)
+
+
+def clear_deleted_list(sender, instance, **kwargs):
+	Profile.touch([instance.user_id])
+	counters.recount([instance.user_id], ['personal_lists'])
+	states = UserMovieState.objects.filter(user_id=instance.user_id)
+	states.update(lists=F('lists').bitand(ALL_LISTS ^ instance.bit))
+	prune_states(states)
+
+
+def sync_review_rating(sender, instance, created, **kwargs):
+	Profile.touch([instance.user_id])
+	if created:
+		counters.recount([instance.user_id], ['reviews'])
+	ensure_states(instance.user_id, [instance.movie_id])
+	UserMovieState.objects.filter(user_id=instance.user_id, movie_id=instance.movie_id).update(rating=instance.rate)
+
+
+def clear_review_rating(sender, instance, **kwargs):
+	Profile.touch([instance.user_id])
+	counters.recount([instance.user_id], ['reviews'])
+	set_flag(UserMovieState.objects.filter(user_id=instance.user_id, movie_id=instance.movie_id), 'rating', None)
+
+
+def touch_user_profile(sender, instance, **kwargs):
+	"""Lists, points and badges are shown on the profile page"""
+	Profile.touch([instance.user_id])
+
+
+def count_created(field):
+	"""post_save receiver recounting `field` of ProfileCounters when a row is created"""
+	def receiver(sender, instance, created, **kwargs):
+		if created:
+			counters.recount([instance.user_id], [field])
+	return receiver
+
+
+def count_deleted(field):
+	def receiver(sender, instance, **kwargs):
+		counters.recount([instance.user_id], [field])
+	return receiver
+
+
+def touch_profile(sender, instance, created, **kwargs):
+	# The page shows the user's names, a new user has no profile yet
+	if not created:
+		Profile.touch([instance.pk])
+
+
+m2m_changed.connect(sync_profile_movies('watched', counters.WATCHED), sender=Profile.watched.through, weak=False)
+m2m_changed.connect(sync_profile_movies('in_watchlist', ['watchlist']), sender=Profile.to_watch.through, weak=False)
+m2m_changed.connect(sync_list_movies, sender=PersonalList.movies.through)
+post_delete.connect(clear_deleted_list, sender=PersonalList)
+post_save.connect(sync_review_rating, sender=Review)
+post_delete.connect(clear_review_rating, sender=Review)
+post_save.connect(touch_user_profile, sender=PersonalList)
+post_save.connect(touch_user_profile, sender=UserPoints)
+post_save.connect(touch_user_profile, sender=UserBadge)
+post_delete.connect(touch_user_profile, sender=UserBadge)
+post_save.connect(touch_profile, sender=User)
+post_save.connect(count_created('personal_lists'), sender=PersonalList, weak=False)
+post_save.connect(count_created('badges'), sender=UserBadge, weak=False)
+post_delete.connect(count_deleted('badges'), sender=UserBadge, weak=False)
@@ -1,11 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
 
 from django.contrib.auth.models import User
+from authy import counters as profile_counters
 from authy.models import Profile, PersonalList
 from movie.models import Movie, Review, Likes
 from gamification.services import award_points
 from comment.models import Comment
 from comment.forms import CommentForm
+from movie.conditional import conditional_page, profile_markers
 
 
 from authy.forms import SignupForm, ChangePasswordForm, EditProfileForm
@@ -105,29 +107,30 @@ def EditProfile(request):
     return render(request, 'edit_profile.html', context)
 
 
+def user_profile_markers(request, username):
+	return profile_markers(Profile.objects.filter(user__username=username))
+
+
+@conditional_page(user_profile_markers)
 def UserProfile(request, username):
 	user = get_object_or_404(User, username=username)
 	profile = Profile.objects.get(user=user)
 
 	#MovieBoxData
-	mWatched_count = profile.watched.filter(Type='movie').count()
-	sWatched_count = profile.watched.filter(Type='series').count()
-	watch_list_count = profile.to_watch.all().count()
-	m_reviewd_count = Review.objects.filter(user=user).count()
-	personal_list_count = PersonalList.objects.filter(user=user).count()
+	counters = profile_counters.for_user(user)
 
 	# Gamification data
 	from gamification.services import get_user_stats, get_user_badges
-	user_stats = get_user_stats(user)
+	user_stats = get_user_stats(user, counters)
 	user_badges = get_user_badges(user)
 
 	context = {
 		'profile': profile,
-		'mWatched_count': mWatched_count,
-		'sWatched_count': sWatched_count,
-		'watch_list_count': watch_list_count,
-		'm_reviewd_count': m_reviewd_count,
-		'personal_list_count': personal_list_count,
+		'mWatched_count': counters.movies_watched,
+		'sWatched_count': counters.series_watched,
+		'watch_list_count': counters.watchlist,
+		'm_reviewd_count': counters.reviews,
+		'personal_list_count': counters.personal_lists,
 		'user_stats': user_stats,
 		'user_badges': user_badges,
 	}
@@ -196,10 +199,7 @@ def UserProfileMoviesReviewed(request, username):
 	profile = Profile.objects.get(user=user)
 
 	#MovieBoxData
-	mWatched_count = profile.watched.filter(Type='movie').count()
-	sWatched_count = profile.watched.filter(Type='series').count()
-	watch_list_count = profile.to_watch.all().count()
-	m_reviewd_count = Review.objects.filter(user=user).count()
+	counters = profile_counters.for_user(user)
 
 	#Movies List
 	movies = Review.objects.filter(user=user)
@@ -210,10 +210,11 @@ def UserProfileMoviesReviewed(request, username):
 
 	context = {
 		'profile': profile,
-		'mWatched_count': mWatched_count,
-		'sWatched_count': sWatched_count,
-		'watch_list_count': watch_list_count,
-		'm_reviewd_count': m_reviewd_count,
+		'mWatched_count': counters.movies_watched,
+		'sWatched_count': counters.series_watched,
+		'watch_list_count': counters.watchlist,
+		'm_reviewd_count': counters.reviews,
+		'personal_list_count': counters.personal_lists,
 		'movie_data': movie_data,
 		'list_title': 'Reviewed',
 	}
@@ -8,4 +8,7 @@ class Comment(models.Model):
 	review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='comments')
 	user = models.ForeignKey(User, on_delete=models.CASCADE)
 	body = models.TextField()
-	date = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+	date = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		indexes = [models.Index(fields=['review', 'date', 'id'])]
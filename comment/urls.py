@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import delete_comment
+from .views import delete_comment, review_comments
 
 urlpatterns = [
 	path('delete/<int:comment_id>', delete_comment, name='delete-comment'),
+	path('review/<int:review_id>', review_comments, name='review-comments'),
 ]
@@ -1,9 +1,11 @@
 from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from .models import Comment
 from movie.models import Review
+from movie import reviews
 from django.contrib.auth.models import User
 
 
@@ -45,3 +47,29 @@ def delete_comment(request, comment_id):
 		
 	except (Comment.DoesNotExist, Review.DoesNotExist):
 		return HttpResponseRedirect(reverse('index'))
+
+
+def review_comments(request, review_id):
+	"""JSON page of a review's comments, oldest first, ?cursor= from the previous page"""
+	review = get_object_or_404(Review, id=review_id)
+	try:
+		page = reviews.comment_page(review, request.GET.get('cursor'))
+	except reviews.InvalidCursor:
+		return JsonResponse({'success': False, 'message': 'Invalid cursor.'}, status=400)
+
+	current_user = request.user if request.user.is_authenticated else None
+	html = ''.join(
+		render_to_string('comment_card.html', {'comment': comment, 'current_user': current_user}, request)
+		for comment in page.items
+	)
+	return JsonResponse({
+		'success': True,
+		'comments': [{
+			'id': comment.id,
+			'username': comment.user.username,
+			'date': comment.date,
+			'body': comment.body,
+		} for comment in page.items],
+		'html': html,
+		'next_cursor': page.next_cursor,
+	})
@@ -2,10 +2,20 @@
 Gamification services for handling points and badges
 """
 from django.contrib.auth.models import User
-from .models import UserPoints, Badge, UserBadge, ActionLog
+from django.core.cache import cache
+from .models import UserPoints, Badge, UserBadge, ActionLog, PointLog
 from .badges import POINT_VALUES, BADGE_REQUIREMENTS
 
 
+# UserPoints counter each action adds to
+ACTION_COUNTERS = {
+    'rate_movie': 'movies_rated',
+    'watch_movie': 'movies_watched',
+    'create_list': 'lists_created',
+    'make_comment': 'comments_made',
+}
+
+
 def get_or_create_user_points(user):
     """Get or create UserPoints for a user"""
     user_points, created = UserPoints.objects.get_or_create(user=user)
@@ -51,14 +61,9 @@ def award_points(user, action, reason="", action_id=None):
     user_points = get_or_create_user_points(user)
     
     # Update the relevant counter
-    if action == 'rate_movie':
-        user_points.movies_rated += 1
-    elif action == 'watch_movie':
-        user_points.movies_watched += 1
-    elif action == 'create_list':
-        user_points.lists_created += 1
-    elif action == 'make_comment':
-        user_points.comments_made += 1
+    if action in ACTION_COUNTERS:
+        counter = ACTION_COUNTERS[action]
+        setattr(user_points, counter, getattr(user_points, counter) + 1)
     
     # Add points and check for badges
     user_points.add_points(points, reason)
@@ -74,6 +79,54 @@ def award_points(user, action, reason="", action_id=None):
     return True
 
 
+def award_points_bulk(user, action, items):
+    """
+    Award points for many actions of one type at once, with the duplicate
+    prevention of award_points() but a fixed number of queries: one to find
+    the actions already logged, then one write per table.
+
+    Args:
+        user: User instance
+        action: Action type (e.g., 'watch_movie')
+        items: (reason, action_id) pairs, action_id identifying each action
+
+    Returns the number of actions points were awarded for.
+    """
+    if action not in POINT_VALUES:
+        return 0
+
+    items = list(dict((action_id, reason) for reason, action_id in items).items())
+    done = set(ActionLog.objects.filter(
+        user=user,
+        action_type=action,
+        action_id__in=[action_id for action_id, reason in items]
+    ).values_list('action_id', flat=True))
+    items = [(action_id, reason) for action_id, reason in items if action_id not in done]
+    if not items:
+        return 0
+
+    points = POINT_VALUES[action]
+    user_points = get_or_create_user_points(user)
+    if action in ACTION_COUNTERS:
+        counter = ACTION_COUNTERS[action]
+        setattr(user_points, counter, getattr(user_points, counter) + len(items))
+
+    # One log entry per action, as award_points() writes them
+    logs = []
+    for action_id, reason in items:
+        user_points.total_points += points
+        logs.append(PointLog(user=user, points=points, reason=reason, total_after=user_points.total_points))
+    user_points.save()
+    PointLog.objects.bulk_create(logs)
+    ActionLog.objects.bulk_create([
+        ActionLog(user=user, action_type=action, action_id=action_id) for action_id, reason in items
+    ])
+
+    check_and_award_badges(user)
+
+    return len(items)
+
+
 def check_and_award_badges(user):
     """Check if user qualifies for new badges and award them"""
     user_points = get_or_create_user_points(user)
@@ -107,8 +160,18 @@ def check_and_award_badges(user):
     return new_badges
 
 
-def get_user_stats(user):
-    """Get comprehensive user statistics including level information"""
+# Badges only appear as they are first earned, their total can lag a little
+BADGE_TOTAL_CACHE_SECONDS = 300
+
+
+def get_user_stats(user, counters=None):
+    """
+    Get comprehensive user statistics including level information.
+    `counters` is the user's ProfileCounters when the caller has them already.
+    """
+    if counters is None:
+        from authy.counters import for_user
+        counters = for_user(user)
     user_points = get_or_create_user_points(user)
     level_info = user_points.get_level_info()
     
@@ -118,8 +181,8 @@ def get_user_stats(user):
         'movies_watched': user_points.movies_watched,
         'lists_created': user_points.lists_created,
         'comments_made': user_points.comments_made,
-        'badges_earned': user.badges.count(),
-        'total_badges': Badge.objects.count(),
+        'badges_earned': counters.badges,
+        'total_badges': cache.get_or_set('gamification:badge-total', Badge.objects.count, BADGE_TOTAL_CACHE_SECONDS),
         'level_info': level_info,
     }
 
@@ -137,4 +137,113 @@ LOGOUT_REDIRECT_URL = 'login'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# OMDb API client (movie/omdb.py), the key comes from the environment and
+# every OMDb call fails with OMDbError without one
+
+OMDB_API_KEY = os.environ.get('OMDB_API_KEY', '')
+OMDB_API_URL = 'http://www.omdbapi.com/'
+OMDB_CONNECT_TIMEOUT = 3.05
+OMDB_READ_TIMEOUT = 5
+OMDB_MAX_RETRIES = 2
+OMDB_BACKOFF_BASE = 0.2
+OMDB_BACKOFF_MAX = 2
+OMDB_POOL_MAXSIZE = 10
+# Calls slower than this count as failures towards the circuit breaker
+OMDB_SLOW_CALL_SECONDS = 2
+OMDB_BREAKER_THRESHOLD = 5
+OMDB_BREAKER_COOLDOWN = 30
+
+# Shared on-disk OMDb response cache (movie/omdb_cache.py), set the path to
+# None to disable it
+OMDB_CACHE_PATH = BASE_DIR / 'var' / 'omdb_cache.sqlite3'
+OMDB_CACHE_TTLS = {
+    'search': 60 * 60,
+    'page': 60 * 60,
+    'title': 60 * 60 * 24,
+    'negative': 60 * 10,
+}
+# Past its TTL an entry is still served for this long while one worker refreshes it
+OMDB_CACHE_STALE_WINDOW = 60 * 60 * 24
+OMDB_CACHE_MAX_ENTRIES = 20000
+
+# Searches with at least this many hits in the local full-text index
+# (movie/search.py) are answered without calling OMDb
+LOCAL_SEARCH_MIN_RESULTS = 3
+
+# Background jobs (movie/jobs.py): 'local' runs them in a thread pool inside
+# the web process, 'database' queues them for `manage.py run_jobs`
+JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'local')
+JOB_LOCAL_WORKERS = 2
+JOB_MAX_ATTEMPTS = 5
+
+# Top rated charts (movie/charts.py): movies need this many reviews to be
+# ranked, and a refresh rescoring more movies than the second setting
+# recomputes everything instead
+CHARTS_MIN_VOTES = 3
+CHARTS_INCREMENTAL_MAX = 200
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Lifetime of the cached movie_details.html fragments. They are keyed on
+# Movie.cache_version, so edits show up immediately regardless.
+MOVIE_DETAILS_CACHE_SECONDS = 60 * 60
+
+# Answer If-None-Match / If-Modified-Since on the movie, genre, actor and
+# profile pages with a 304 (movie/conditional.py). Bump the version to
+# invalidate every ETag handed out, e.g. after a template change.
+CONDITIONAL_GET = True
+CONDITIONAL_GET_VERSION = 1
+
+# The number of titles of a genre or actor page is only an indication,
+# counting a large genre on every page is not worth it (movie/listings.py)
+LISTING_COUNT_CACHE_SECONDS = 60 * 15
+
+# In-memory facet index of the browse page (movie/facets.py): how often a
+# process looks for changed movies, and how many it patches in before
+# reloading the index whole instead
+FACETS_CHECK_SECONDS = 30
+FACETS_PATCH_MAX = 1000
+
+# Search box suggestions (movie/autocomplete.py): per kind and query, how
+# often a process reads back other processes' changes, and how many changed
+# titles and actors it holds on top of its arrays before rebuilding them
+AUTOCOMPLETE_LIMIT = 6
+AUTOCOMPLETE_CHECK_SECONDS = 30
+AUTOCOMPLETE_OVERLAY_MAX = 5000
+
+# "Did you mean" of searches the local index has no hit for (movie/spelling.py):
+# suggestions shown, the share of the query's trigrams a name needs, and how
+# close the best suggestion has to be to be searched instead, without OMDb.
+# Refreshed like the autocomplete index.
+SPELLING_SUGGESTIONS = 5
+SPELLING_MIN_SIMILARITY = 0.3
+SPELLING_CORRECTION_RATIO = 0.8
+SPELLING_CHECK_SECONDS = 30
+SPELLING_OVERLAY_MAX = 5000
+
+# Most titles one request to the bulk watchlist / watched endpoint can change
+MOVIE_LISTS_BULK_MAX = 200
+
+# Actor collaboration graph (actor/graph.py), written by build_actor_graph:
+# where the builds go, co-stars kept per actor, and how often a process looks
+# for a newer build
+ACTOR_GRAPH_DIR = BASE_DIR / 'var' / 'actor_graph'
+ACTOR_GRAPH_TOP_COSTARS = 12
+ACTOR_GRAPH_CHECK_SECONDS = 60
+
+# Fetch and ingest the titles of OMDb search results in the background, so
+# the click-through finds them locally (movie/prefetch.py)
+SEARCH_PREFETCH = True
+SEARCH_PREFETCH_WORKERS = 3
+SEARCH_PREFETCH_MAX_PENDING = 27
+
+POSTER_MAX_BYTES = 10 * 1024 * 1024
+# Widths of the poster thumbnails derived for grid pages (movie/posters.py)
+POSTER_WIDTHS = (160, 320)
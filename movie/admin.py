@@ -1,7 +1,8 @@
 from django.contrib import admin
-from movie.models import Movie, Review
+from movie.models import Movie, Review, Job
 
 # Register your models here.
 
 admin.site.register(Movie)
 admin.site.register(Review)
+admin.site.register(Job)
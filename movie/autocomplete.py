@@ -0,0 +1,125 @@
+"""
+Search box suggestions: movie titles and actor names starting with what
+was typed, the most popular first, answered from memory.
+
+Each process keeps a PrefixIndex per kind. Every word of a name starts a
+key ("the dark knight", "dark knight", "knight"), normalized (lowercase,
+no accents or punctuation) and cut to KEY_BYTES of UTF-8, in one sorted
+fixed-width NumPy byte array, so the keys starting with a prefix are one
+binary search away and a 100k title catalog takes a few MB. The most
+popular of them are picked with an argpartition over their scores:
+reviews on the site first, then IMDb votes, and for actors the sum of
+their movies'.
+
+The arrays are built in one pass on first use and never modified. Changes
+go to a small overlay (movie/catalog_index.py): the entities' new keys in a sorted list, and their
+stale entries in the arrays are skipped. Saves and deletions of movies
+and actors in this process are applied by signals (movie/signals.py),
+other processes' changes are read back from Movie.modified_at at most
+every AUTOCOMPLETE_CHECK_SECONDS, like the facet index. Past
+AUTOCOMPLETE_OVERLAY_MAX changed entities, or when movies or actors
+disappear, the index is rebuilt whole.
+"""
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+
+from movie.catalog_index import OverlayIndex, LiveIndex
+
+
+KEY_BYTES = 32
+
+# Top entries taken from a key range before dropping repeats of an
+# entity, a title can start several keys of the range ("new york, new york")
+CANDIDATES_PER_RESULT = 2
+
+
+def normalize(text):
+	text = text or ''
+	if not text.isascii():
+		text = unicodedata.normalize('NFKD', text)
+		text = ''.join(char for char in text if not unicodedata.combining(char))
+	return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def name_keys(name):
+	words = normalize(name).split()
+	return [' '.join(words[start:]).encode()[:KEY_BYTES] for start in range(len(words))]
+
+
+def prefix_key(query):
+	return normalize(query).encode()[:KEY_BYTES]
+
+
+class PrefixIndex(OverlayIndex):
+
+	def build(self, names):
+		keys, owners = [], []
+		for position, name in enumerate(names):
+			for key in name_keys(name):
+				keys.append(key)
+				owners.append(position)
+		keys = np.array(keys, dtype='S%d' % KEY_BYTES)
+		order = np.argsort(keys, kind='stable')
+		self.keys = keys[order]
+		self.owners = np.array(owners, dtype=np.int32)[order]
+		# (key, id) of the overlay, sorted
+		self.overlay_keys = []
+
+	def copy(self):
+		clone = super().copy()
+		clone.overlay_keys = list(self.overlay_keys)
+		return clone
+
+	def index(self, pk, name):
+		for key in name_keys(name):
+			bisect.insort(self.overlay_keys, (key, pk))
+
+	def unindex(self, pk, name):
+		for key in name_keys(name):
+			position = bisect.bisect_left(self.overlay_keys, (key, pk))
+			if position < len(self.overlay_keys) and self.overlay_keys[position] == (key, pk):
+				del self.overlay_keys[position]
+
+	def complete(self, prefix, limit):
+		"""Display of the `limit` most popular entities with a key starting with `prefix`"""
+		lo = int(np.searchsorted(self.keys, prefix, side='left'))
+		# No UTF-8 byte is 0xff, every key starting with the prefix sorts before this
+		hi = int(np.searchsorted(self.keys, prefix + b'\xff', side='left'))
+		positions = self.owners[lo:hi]
+		if self.stale and len(positions):
+			positions = positions[~np.isin(self.ids[positions], list(self.stale))]
+
+		wanted = limit * CANDIDATES_PER_RESULT
+		if len(positions) > wanted:
+			top = positions[np.argpartition(-self.scores[positions], wanted)[:wanted]]
+			if len(np.unique(top)) < limit:
+				# Too many repeats, rank them all
+				top = np.unique(positions)
+			positions = top
+		positions = np.unique(positions)
+
+		candidates = [(int(self.scores[position]), int(self.ids[position]), self.display[position]) for position in positions.tolist()]
+		start = bisect.bisect_left(self.overlay_keys, (prefix,))
+		end = bisect.bisect_left(self.overlay_keys, (prefix + b'\xff',))
+		for pk in dict.fromkeys(pk for key, pk in self.overlay_keys[start:end]):
+			name, score, display = self.overlay[pk]
+			candidates.append((score, pk, display))
+		candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+		return [display for score, pk, display in candidates[:limit]]
+
+
+live = LiveIndex(PrefixIndex, 'AUTOCOMPLETE')
+
+
+def suggest(query, limit=None):
+	"""{'movies': [...], 'actors': [...]}, the display of the most popular of each starting with `query`"""
+	limit = limit or settings.AUTOCOMPLETE_LIMIT
+	prefix = prefix_key(query)
+	if not prefix:
+		return {'movies': [], 'actors': []}
+	index = live.get()
+	return {'movies': index.movies.complete(prefix, limit), 'actors': index.actors.complete(prefix, limit)}
@@ -0,0 +1,64 @@
+"""
+Denormalized card of a movie: its genres, top-billed actors and external
+ratings as a compact JSON document on the movie row (Movie.card), so
+pages render a movie from one row instead of walking three M2M tables.
+
+    {"genres": [{"title": "Drama", "slug": "drama"}, ...],
+     "actors": [{"name": "...", "slug": "..."}, ...],
+     "ratings": [{"source": "Internet Movie Database", "rating": "8.6/10", "score": 86}, ...]}
+
+Actors are in billing order (Casting.billing), genres and ratings in the
+order they were linked, which for ingested titles is the OMDb payload's. Cards are rebuilt by
+ingest_batch and by the signals on the M2M tables and on renames or
+deletions of genres, actors and ratings (movie/signals.py).
+"""
+from movie.models import Movie, Casting
+
+
+# Actors kept on a card, OMDb lists the top-billed three or four
+CARD_ACTORS = 10
+
+
+def empty_card():
+	return {'genres': [], 'actors': [], 'ratings': []}
+
+
+def build_cards(movie_ids):
+	"""movie id -> card, three queries whatever the number of movies"""
+	movie_ids = list(movie_ids)
+	cards = {movie_id: empty_card() for movie_id in movie_ids}
+
+	genres = Movie.Genre.through.objects.filter(movie_id__in=movie_ids).order_by('id')
+	for movie_id, title, slug in genres.values_list('movie_id', 'genre__title', 'genre__slug'):
+		cards[movie_id]['genres'].append({'title': title, 'slug': slug})
+
+	actors = Casting.objects.filter(movie_id__in=movie_ids).order_by('movie_id', 'billing', 'id')
+	for movie_id, name, slug in actors.values_list('movie_id', 'actor__name', 'actor__slug'):
+		if len(cards[movie_id]['actors']) < CARD_ACTORS:
+			cards[movie_id]['actors'].append({'name': name, 'slug': slug})
+
+	ratings = Movie.Ratings.through.objects.filter(movie_id__in=movie_ids).order_by('id')
+	for movie_id, source, rating, score in ratings.values_list('movie_id', 'rating__source', 'rating__rating', 'rating__score'):
+		cards[movie_id]['ratings'].append({'source': source, 'rating': rating, 'score': score})
+	return cards
+
+
+def refresh_cards(movie_ids, batch_size=500):
+	"""Rebuild and store the cards of the given movies, returns movie id -> card"""
+	movie_ids = list(dict.fromkeys(movie_ids))
+	written = {}
+	for start in range(0, len(movie_ids), batch_size):
+		cards = build_cards(movie_ids[start:start + batch_size])
+		Movie.objects.bulk_update([Movie(pk=movie_id, card=card) for movie_id, card in cards.items()], ['card'])
+		written.update(cards)
+	return written
+
+
+def linked_movie_ids(instance):
+	"""Movies linked to a Genre, Actor or Rating"""
+	through, field = {
+		'genre': (Movie.Genre.through, 'genre_id'),
+		'actor': (Casting, 'actor_id'),
+		'rating': (Movie.Ratings.through, 'rating_id'),
+	}[instance._meta.model_name]
+	return list(through.objects.filter(**{field: instance.pk}).values_list('movie_id', flat=True))
@@ -0,0 +1,230 @@
+"""
+In-memory indexes of movie titles and actor names, shared by the
+autocomplete (movie/autocomplete.py) and spelling (movie/spelling.py)
+suggestions.
+
+An index keeps NumPy arrays built once from every name and never
+modified; names added or changed since go to a small overlay and their
+stale entries in the arrays are skipped. Each process holds a LiveIndex
+per kind, kept current by signals and by reading Movie.modified_at back.
+"""
+import abc
+import copy
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from actor.models import Actor
+from movie.models import Movie, Casting
+
+
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def popularity(reviews_count, votes):
+	"""Reviews on the site, IMDb votes breaking ties, as one sortable integer"""
+	return (reviews_count << 32) + min(votes or 0, 2 ** 32 - 1)
+
+
+def movie_display(pk, title, year, imdb_id):
+	return {'title': title, 'year': year, 'imdbID': imdb_id}
+
+
+def actor_display(pk, name, slug):
+	return {'name': name, 'slug': slug}
+
+
+def movie_entries(movies):
+	for pk, title, year, imdb_id, reviews_count, votes in movies.values_list(
+		'pk', 'Title', 'Year', 'imdbID', 'reviews_count', 'imdbVotes_num',
+	):
+		yield pk, title, popularity(reviews_count, votes), movie_display(pk, title, year, imdb_id)
+
+
+def actor_entries(actors):
+	"""Entries of `actors`, scored by the popularity of their movies"""
+	scores = {}
+	castings = Casting.objects.filter(actor__in=actors.values('pk'))
+	for actor_id, reviews_count, votes in castings.values_list('actor_id', 'movie__reviews_count', 'movie__imdbVotes_num'):
+		scores[actor_id] = scores.get(actor_id, 0) + popularity(reviews_count, votes)
+	for pk, name, slug in actors.values_list('pk', 'name', 'slug'):
+		yield pk, name, scores.get(pk, 0), actor_display(pk, name, slug)
+
+
+def changed_entries(since):
+	"""Entries of the movies changed since `since` and of their cast"""
+	changed = Movie.objects.filter(modified_at__gt=since)
+	movies = list(movie_entries(changed))
+	if not movies:
+		return [], []
+	# Renamed actors bump their movies, and reviews move their scores
+	return movies, list(actor_entries(Actor.objects.filter(castings__movie__in=changed).distinct()))
+
+
+class OverlayIndex(abc.ABC):
+	"""
+	Arrays built once from (id, name, score, display) entries and never
+	modified, with the entities changed since in an overlay: their entries
+	in the arrays are skipped. Subclasses index the names, with build() for
+	the arrays and index() / unindex() for the overlay.
+	"""
+
+	def __init__(self, entries):
+		entries = sorted(entries, key=lambda entry: entry[0])
+		self.ids = np.array([entry[0] for entry in entries], dtype=np.int64)
+		self.scores = np.array([entry[2] for entry in entries], dtype=np.int64)
+		self.display = [entry[3] for entry in entries]
+		self.build([entry[1] for entry in entries])
+
+		self.size = len(entries)
+		self.stale = set()
+		# id -> (name, score, display)
+		self.overlay = {}
+
+	@abc.abstractmethod
+	def build(self, names):
+		"""Index `names`, in the order of self.ids"""
+
+	@abc.abstractmethod
+	def index(self, pk, name):
+		"""Add `name` to the overlay"""
+
+	@abc.abstractmethod
+	def unindex(self, pk, name):
+		"""Remove `name` from the overlay"""
+
+	def copy(self):
+		"""A copy to change while other threads keep reading this one"""
+		clone = copy.copy(self)
+		clone.stale = set(self.stale)
+		clone.overlay = dict(self.overlay)
+		return clone
+
+	def in_arrays(self, pk):
+		position = int(np.searchsorted(self.ids, pk))
+		return position < len(self.ids) and self.ids[position] == pk
+
+	def known(self, pk):
+		return pk in self.overlay or pk not in self.stale and self.in_arrays(pk)
+
+	def score(self, pk, default=0):
+		if pk in self.overlay:
+			return self.overlay[pk][1]
+		if pk not in self.stale and self.in_arrays(pk):
+			return int(self.scores[np.searchsorted(self.ids, pk)])
+		return default
+
+	def remove(self, pk):
+		if self.known(pk):
+			self.size -= 1
+		self.stale.add(pk)
+		found = self.overlay.pop(pk, None)
+		if found is not None:
+			self.unindex(pk, found[0])
+
+	def put(self, pk, name, score, display):
+		self.remove(pk)
+		self.size += 1
+		self.overlay[pk] = (name, score, display)
+		self.index(pk, name)
+
+
+class CatalogIndex:
+	"""The movie and actor indexes of one kind, and when they were last read from the database"""
+
+	def __init__(self, movies, actors, watermark):
+		self.movies = movies
+		self.actors = actors
+		self.watermark = watermark
+
+	def copy(self):
+		return CatalogIndex(self.movies.copy(), self.actors.copy(), self.watermark)
+
+	def overlay_size(self):
+		return len(self.movies.overlay) + len(self.actors.overlay)
+
+
+class LiveIndex:
+	"""
+	This process's CatalogIndex of `index_class`, loaded on first use. Saves
+	and deletions in this process are applied by signals (movie/signals.py),
+	other processes' changes are read back from Movie.modified_at at most
+	every <prefix>_CHECK_SECONDS. Past <prefix>_OVERLAY_MAX changed entities,
+	or when movies or actors disappear, it is loaded again whole.
+	"""
+
+	def __init__(self, index_class, settings_prefix):
+		self.index_class = index_class
+		self.settings_prefix = settings_prefix
+		self.index = None
+		self.checked_at = 0.0
+		self.lock = threading.Lock()
+
+	def setting(self, name):
+		return getattr(settings, '%s_%s' % (self.settings_prefix, name))
+
+	def load(self):
+		watermark = timezone.now() - WATERMARK_OVERLAP
+		movies = self.index_class(movie_entries(Movie.objects.all()))
+		actors = self.index_class(actor_entries(Actor.objects.all()))
+		return CatalogIndex(movies, actors, watermark)
+
+	def refreshed(self, index):
+		"""`index` or an updated copy of it, with the movies changed since its watermark and their cast"""
+		watermark = timezone.now() - WATERMARK_OVERLAP
+		movies, actors = changed_entries(index.watermark)
+		if movies:
+			index = index.copy()
+			for entry in movies:
+				index.movies.put(*entry)
+			for entry in actors:
+				index.actors.put(*entry)
+		if index.overlay_size() > self.setting('OVERLAY_MAX'):
+			return self.load()
+		# Deletions do not show in modified_at
+		if Movie.objects.count() != index.movies.size or Actor.objects.count() != index.actors.size:
+			return self.load()
+		index.watermark = watermark
+		return index
+
+	def get(self):
+		with self.lock:
+			now = time.monotonic()
+			if self.index is None:
+				self.index = self.load()
+			elif now - self.checked_at >= self.setting('CHECK_SECONDS'):
+				self.index = self.refreshed(self.index)
+			else:
+				return self.index
+			self.checked_at = now
+			return self.index
+
+	def apply(self, change):
+		"""Apply `change(index)` to a copy of this process's index, if it has one yet"""
+		with self.lock:
+			if self.index is None:
+				return
+			updated = self.index.copy()
+			change(updated)
+			self.index = updated
+
+	def movie_saved(self, movie):
+		entry = (movie.pk, movie.Title, popularity(movie.reviews_count, movie.imdbVotes_num),
+			movie_display(movie.pk, movie.Title, movie.Year, movie.imdbID))
+		self.apply(lambda index: index.movies.put(*entry))
+
+	def movie_deleted(self, movie_id):
+		self.apply(lambda index: index.movies.remove(movie_id))
+
+	def actor_saved(self, actor):
+		def change(index):
+			score = index.actors.score(actor.pk)
+			index.actors.put(actor.pk, actor.name, score, actor_display(actor.pk, actor.name, actor.slug))
+		self.apply(change)
+
+	def actor_deleted(self, actor_id):
+		self.apply(lambda index: index.actors.remove(actor_id))
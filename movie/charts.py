@@ -0,0 +1,156 @@
+"""
+Top rated charts, overall and per genre, ranked by Bayesian weighted rating:
+
+    score = v / (v + m) * R + m / (v + m) * C
+
+with R the movie's mean review rate, v its number of reviews, m the
+CHARTS_MIN_VOTES (movies with fewer reviews are not ranked) and C the
+mean rate of the whole chart. A movie with few reviews is pulled towards
+the chart mean until it has enough of them to stand on its own.
+
+Scores are materialized in MovieRank and pages read them with an indexed
+ORDER BY score. refresh() recomputes everything in one NumPy pass over the
+review table, or only the reviewed movies modified since the last refresh
+(Movie.modified_at, bumped by review and genre changes) against the chart
+means of the last full pass when there are few of them.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from movie.models import Movie, Review, ChartPrior, MovieRank
+
+
+# Movies stamped shortly before a refresh are rescored again by the next
+# one, the transaction writing them may commit after the refresh
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
+def aggregate(movie_ids, rates):
+	"""Unique movie ids with their review count and rate sum"""
+	movies, inverse = np.unique(movie_ids, return_inverse=True)
+	votes = np.bincount(inverse, minlength=len(movies))
+	totals = np.bincount(inverse, weights=rates, minlength=len(movies))
+	return movies, votes, totals
+
+
+def weighted_scores(votes, totals, prior, min_votes):
+	"""Bayesian weighted rating of every movie, NaN below min_votes"""
+	votes = votes.astype(np.float64)
+	means = totals / np.maximum(votes, 1)
+	scores = votes / (votes + min_votes) * means + min_votes / (votes + min_votes) * prior
+	return np.where(votes >= min_votes, scores, np.nan)
+
+
+def review_arrays(movie_ids=None):
+	reviews = Review.objects.all()
+	if movie_ids is not None:
+		reviews = reviews.filter(movie_id__in=movie_ids)
+	rows = np.array(list(reviews.values_list('movie_id', 'rate')), dtype=np.int64).reshape(-1, 2)
+	return rows[:, 0], rows[:, 1]
+
+
+def genre_links(movie_ids):
+	"""(position in movie_ids, genre id) of every genre link of the given, sorted, movie ids"""
+	links = Movie.Genre.through.objects.filter(movie_id__in=movie_ids.tolist()).values_list('movie_id', 'genre_id')
+	links = np.array(list(links), dtype=np.int64).reshape(-1, 2)
+	return np.searchsorted(movie_ids, links[:, 0]), links[:, 1]
+
+
+def rank_rows(movies, votes, totals, scores, genre=None):
+	for movie_id, v, t, score in zip(movies.tolist(), votes.tolist(), totals.tolist(), scores.tolist()):
+		yield MovieRank(movie_id=movie_id, genre_id=genre, votes=v, total=int(t), score=None if math.isnan(score) else score)
+
+
+def genre_rank_rows(movies, votes, totals, positions, genres, priors, min_votes):
+	"""Per genre ranks, `priors` maps genre id -> chart mean"""
+	prior = np.array([priors[genre] for genre in genres.tolist()], dtype=np.float64)
+	scores = weighted_scores(votes[positions], totals[positions], prior, min_votes)
+	for position, genre, score in zip(positions.tolist(), genres.tolist(), scores.tolist()):
+		yield MovieRank(
+			movie_id=int(movies[position]), genre_id=genre, votes=int(votes[position]),
+			total=int(totals[position]), score=None if math.isnan(score) else score,
+		)
+
+
+@transaction.atomic
+def full_refresh(min_votes):
+	"""Recompute every chart and its mean from the whole review table"""
+	watermark = timezone.now() - WATERMARK_OVERLAP
+	movie_ids, rates = review_arrays()
+	MovieRank.objects.all().delete()
+	ChartPrior.objects.all().delete()
+	if not len(rates):
+		return 0
+
+	movies, votes, totals = aggregate(movie_ids, rates)
+	prior = float(rates.mean())
+	ranks = list(rank_rows(movies, votes, totals, weighted_scores(votes, totals, prior, min_votes)))
+	priors = [ChartPrior(genre=None, mean=prior, votes=len(rates), watermark=watermark)]
+
+	positions, genres = genre_links(movies)
+	if len(genres):
+		# Chart mean of a genre: all rates of its movies over all their reviews
+		genre_ids, genre_inverse = np.unique(genres, return_inverse=True)
+		genre_totals = np.bincount(genre_inverse, weights=totals[positions])
+		genre_votes = np.bincount(genre_inverse, weights=votes[positions])
+		genre_means = dict(zip(genre_ids.tolist(), (genre_totals / genre_votes).tolist()))
+		ranks.extend(genre_rank_rows(movies, votes, totals, positions, genres, genre_means, min_votes))
+		priors.extend(
+			ChartPrior(genre_id=genre, mean=genre_means[genre], votes=int(v))
+			for genre, v in zip(genre_ids.tolist(), genre_votes.tolist())
+		)
+
+	ChartPrior.objects.bulk_create(priors)
+	MovieRank.objects.bulk_create(ranks, batch_size=1000)
+	return len(movies)
+
+
+def changed_movies():
+	"""(movies modified since the last refresh that have or had ranks, new watermark), None before the first refresh"""
+	watermark = timezone.now() - WATERMARK_OVERLAP
+	since = ChartPrior.objects.filter(genre=None).values_list('watermark', flat=True).first()
+	if since is None:
+		return None
+	reviewed = Review.objects.filter(movie=OuterRef('pk'))
+	ranked = MovieRank.objects.filter(movie=OuterRef('pk'), genre=None)
+	movies = Movie.objects.filter(Q(Exists(reviewed)) | Q(Exists(ranked)), modified_at__gt=since)
+	return set(movies.values_list('pk', flat=True)), watermark
+
+
+@transaction.atomic
+def incremental_refresh(changed, watermark, min_votes):
+	"""Rescore only the `changed` movies against the chart means of the last full refresh"""
+	priors = dict(ChartPrior.objects.values_list('genre_id', 'mean'))
+	ChartPrior.objects.filter(genre=None).update(watermark=watermark)
+	MovieRank.objects.filter(movie_id__in=changed).delete()
+
+	movie_ids, rates = review_arrays(changed)
+	if not len(rates):
+		return len(changed)
+	movies, votes, totals = aggregate(movie_ids, rates)
+	ranks = list(rank_rows(movies, votes, totals, weighted_scores(votes, totals, priors[None], min_votes)))
+
+	positions, genres = genre_links(movies)
+	if len(genres):
+		# A genre without a chart yet starts from the overall mean
+		genre_priors = {genre: priors.get(genre, priors[None]) for genre in set(genres.tolist())}
+		ranks.extend(genre_rank_rows(movies, votes, totals, positions, genres, genre_priors, min_votes))
+
+	MovieRank.objects.bulk_create(ranks, batch_size=1000)
+	return len(changed)
+
+
+def refresh(full=False):
+	"""Returns ('full' or 'incremental', number of movies rescored)"""
+	min_votes = settings.CHARTS_MIN_VOTES
+	found = None if full else changed_movies()
+	if found is None or len(found[0]) > settings.CHARTS_INCREMENTAL_MAX:
+		return 'full', full_refresh(min_votes)
+	changed, watermark = found
+	return 'incremental', incremental_refresh(changed, watermark, min_votes)
@@ -0,0 +1,96 @@
+"""
+Conditional GETs of the catalog and profile pages.
+
+Each page gets an ETag hashed from the update markers of what it shows:
+Movie.cache_version and modified_at, bumped with every change to a movie,
+its reviews or their feedback (movie/signals.py), Genre.modified_at,
+touched with those of the genre's movies and its own, Actor.modified_at,
+set with every save of the actor, and Profile.last_activity, touched with
+every change to what a profile page shows (authy/signals.py). Signed-in viewers add their own markers, as the
+pages show their name, their watchlist state and a CSRF token. A client
+revalidating with If-None-Match gets its 304 from one or two indexed
+queries, before the view runs.
+
+Last-Modified is only sent to anonymous visitors, a timestamp cannot tell
+one signed-in user from another. Pages with pending flash messages are
+always rendered, rendering them is what consumes the messages.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, Sum
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from authy.models import Profile
+
+
+def make_etag(*parts):
+	return hashlib.md5(repr((settings.CONDITIONAL_GET_VERSION,) + parts).encode()).hexdigest()
+
+
+def viewer_markers(request):
+	get_token(request)
+	last_activity = Profile.objects.filter(user=request.user).values_list('last_activity', flat=True).first()
+	return (request.user.pk, request.META['CSRF_COOKIE'], last_activity)
+
+
+def page_validators(request, markers, args, kwargs):
+	"""(etag, last modified) of the page, None when it cannot be validated"""
+	if not settings.CONDITIONAL_GET or request.method not in ('GET', 'HEAD'):
+		return None
+	if len(messages.get_messages(request)):
+		return None
+	found = markers(request, *args, **kwargs)
+	if found is None:
+		return None
+	parts, modified = found
+	if request.user.is_authenticated:
+		return make_etag(parts, viewer_markers(request)), None
+	return make_etag(parts), modified
+
+
+def conditional_page(markers):
+	"""
+	Like django's condition(), from a single `markers(request, *args,
+	**kwargs)` returning (hashable parts of the page, last modified) or
+	None for a page that is always rendered.
+	"""
+	def validators(request, *args, **kwargs):
+		if not hasattr(request, '_page_validators'):
+			request._page_validators = page_validators(request, markers, args, kwargs)
+		return request._page_validators
+
+	def etag(request, *args, **kwargs):
+		found = validators(request, *args, **kwargs)
+		return found and found[0]
+
+	def last_modified(request, *args, **kwargs):
+		found = validators(request, *args, **kwargs)
+		return found and found[1]
+
+	return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def movie_markers(movies):
+	"""Markers of a movie or a list of movies, None for an unknown movie"""
+	found = movies.aggregate(count=Count('pk'), version=Sum('cache_version'), modified=Max('modified_at'))
+	if not found['count']:
+		return None
+	return (found['count'], found['version'], found['modified']), found['modified']
+
+
+def genre_markers(genres):
+	"""Markers of a genre page, from Genre.modified_at alone"""
+	found = genres.values_list('pk', 'modified_at').first()
+	if found is None:
+		return None
+	return found, found[1]
+
+
+def profile_markers(profiles):
+	found = profiles.values_list('pk', 'last_activity').first()
+	if found is None:
+		return None
+	return found, found[1]
@@ -0,0 +1,35 @@
+"""
+Keyset pagination cursors shared by movie/listings.py and movie/reviews.py:
+the sort key of the last row of a page, JSON encoded in URL-safe base64.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+
+Page = namedtuple('Page', ['items', 'next_cursor'])
+
+
+class InvalidCursor(ValueError):
+	pass
+
+
+def encode_cursor(obj, fields):
+	values = []
+	for field in fields:
+		value = getattr(obj, field)
+		values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+	return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields, parse):
+	"""The sort key in `cursor`, `parse(field, value)` returns each value decoded or raises ValueError"""
+	try:
+		padded = cursor + '=' * (-len(cursor) % 4)
+		values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+		if not isinstance(values, list) or len(values) != len(fields):
+			raise ValueError(cursor)
+		return [parse(field, value) for field, value in zip(fields, values)]
+	except (binascii.Error, UnicodeDecodeError, ValueError):
+		raise InvalidCursor(cursor)
@@ -0,0 +1,381 @@
+"""
+Faceted browse of the catalog (genres, type, years, IMDb rating) answered
+from memory.
+
+Every process keeps a FacetIndex: the year, rating, votes, type, title and
+genres of every movie in NumPy arrays ordered by movie id, and for every
+facet value a bitset of the movies that have it, 8 movies a byte:
+
+    genre     one bitset per genre
+    type      one bitset per type
+    year      "year <= y" for every year of the catalog, a range is
+              le[to] & ~le[from - 1]
+    rating    "rating >= r" for r in 0.0, 0.1, ... 10.0
+
+A query ANDs a handful of N/8 byte bitsets, facet counts are popcounts of
+each value's bitset ANDed with the result and a page is read off a sort
+order kept with the index. The only SQL is the in_bulk() of the page.
+
+The index is refreshed incrementally. Movies whose modified_at moved
+since the last check are read again and patched in, at most every
+FACETS_CHECK_SECONDS, or on the next query once this process saw a movie
+change (movie/signals.py, ingest_batch): only their bits are set or
+cleared, and they are reinserted into the sort orders their changes
+affect. A change in the number of movies or genres, or a new movie older
+than the newest one, reloads it whole.
+"""
+import copy
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from movie.models import Movie, Genre, MOVIE_SORTS, DEFAULT_MOVIE_SORT
+
+
+# Number of bits set in every byte value
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+# Rating facets in tenths of a point, 0.0 to 10.0
+RATING_STEPS = 101
+
+# Rows stamped shortly before a check are read again at the next one, the
+# transaction writing them may commit after the check
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+Result = namedtuple('Result', ['total', 'ids', 'counts'])
+
+
+def popcount(bits):
+	"""Set bits of a packed bitset, or of every row of a matrix of them"""
+	return POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+def rating_step(min_rating):
+	"""Row of the "rating >= r" bitsets for a minimum rating"""
+	return min(max(math.ceil(min_rating * 10 - 1e-9), 0), RATING_STEPS - 1)
+
+
+def assign_bits(bits, positions, values):
+	"""Set the bits of `positions` in packed `bits`, a bitset or a matrix of them, to `values` (..., positions)"""
+	for position, value in zip(positions.tolist(), np.moveaxis(values, -1, 0)):
+		byte, mask = position >> 3, np.uint8(0x80 >> (position & 7))
+		bits[..., byte] = np.where(value, bits[..., byte] | mask, bits[..., byte] & ~mask)
+
+
+class FacetIndex:
+
+	def __init__(self, rows, links, genres, watermark):
+		"""
+		`rows` are (id, Year_num, imdbRating_num, imdbVotes_num, Type, Title)
+		ordered by id, `links` (movie id, genre id) and `genres` (id, slug, title).
+		"""
+		self.watermark = watermark
+		self.genres = [(slug, title) for pk, slug, title in genres]
+		self.genre_rows = {pk: row for row, (pk, slug, title) in enumerate(genres)}
+		self.genre_slugs = {slug: row for row, (pk, slug, title) in enumerate(genres)}
+		self.types = []
+
+		n = len(rows)
+		self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+		self.year = np.full(n, np.nan)
+		self.rating = np.full(n, np.nan)
+		self.votes = np.full(n, np.nan)
+		self.type = np.zeros(n, dtype=np.int16)
+		self.titles = [''] * n
+		positions = np.arange(n)
+		self.set_rows(positions, rows)
+		self.build(self.memberships(positions, links))
+
+	def type_code(self, kind):
+		if kind not in self.types:
+			self.types.append(kind)
+		return self.types.index(kind)
+
+	def set_rows(self, positions, rows):
+		for position, (pk, year, rating, votes, kind, title) in zip(positions.tolist(), rows):
+			self.year[position] = np.nan if year is None else year
+			self.rating[position] = np.nan if rating is None else rating
+			self.votes[position] = np.nan if votes is None else votes
+			self.type[position] = self.type_code(kind)
+			self.titles[position] = title
+
+	def memberships(self, positions, links):
+		"""Genres x positions matrix of the genres of the movies at `positions`, None for a genre the index does not know"""
+		links = np.array(list(links), dtype=np.int64).reshape(-1, 2)
+		targets = self.ids[positions]
+		by_id = np.argsort(targets)
+		columns = np.searchsorted(targets, links[:, 0], sorter=by_id)
+		# Links of other movies, written after the rows were read
+		known = columns < len(targets)
+		known[known] = targets[by_id[columns[known]]] == links[known, 0]
+		genre_rows = np.array([self.genre_rows.get(genre, -1) for genre in links[:, 1].tolist()], dtype=np.int64)
+		if (genre_rows[known] < 0).any():
+			return None
+		members = np.zeros((len(self.genres), len(positions)), dtype=bool)
+		members[genre_rows[known], by_id[columns[known]]] = True
+		return members
+
+	def build(self, members):
+		"""The bitsets and sort orders, from the arrays and the genre memberships of every movie"""
+		self.all_bits = np.packbits(np.ones(len(self.ids), dtype=bool))
+		self.genre_bits = np.packbits(members, axis=1)
+		self.type_bits = np.packbits(self.type_values(np.arange(len(self.ids))), axis=1)
+		self.years = np.unique(self.year[~np.isnan(self.year)]).astype(np.int64)
+		self.year_le_bits = np.packbits(self.year_values(np.arange(len(self.ids))), axis=1)
+		self.rating_ge_bits = np.packbits(self.rating_values(np.arange(len(self.ids))), axis=1)
+		self.orders = {sort: self.sort_order(ordering) for sort, ordering in MOVIE_SORTS.items()}
+
+	def type_values(self, positions):
+		return self.type[positions][None, :] == np.arange(len(self.types))[:, None]
+
+	def year_values(self, positions):
+		# NaN, no year or rating, compares False
+		with np.errstate(invalid='ignore'):
+			return self.year[positions][None, :] <= self.years[:, None]
+
+	def rating_values(self, positions):
+		with np.errstate(invalid='ignore'):
+			return np.round(self.rating[positions] * 10)[None, :] >= np.arange(RATING_STEPS)[:, None]
+
+	def column(self, field):
+		return {'Year_num': self.year, 'imdbRating_num': self.rating, 'imdbVotes_num': self.votes}[field]
+
+	def sort_values(self, field):
+		if field == 'id':
+			return self.ids.astype(np.float64)
+		if field == 'Title':
+			ranks = np.empty(len(self.titles), dtype=np.float64)
+			ranks[np.argsort(np.array(self.titles, dtype=object), kind='stable')] = np.arange(len(self.titles))
+			return ranks
+		return self.column(field)
+
+	def sort_order(self, ordering):
+		"""Positions in the order_by() `ordering`, NULLs last like SQLite descending"""
+		keys = []
+		for field in reversed(ordering):
+			values = self.sort_values(field.lstrip('-'))
+			# NaN sorts last either way
+			keys.append(-values if field.startswith('-') else values)
+		return np.lexsort(keys)
+
+	def sort_key(self, ordering, position):
+		"""Key of the movie at `position` in the order of sort_order(), titles only sort ascending"""
+		key = []
+		for field in ordering:
+			name = field.lstrip('-')
+			if name == 'Title':
+				key.append(self.titles[position])
+				continue
+			value = float(self.ids[position] if name == 'id' else self.column(name)[position])
+			missing = math.isnan(value)
+			key.append((missing, 0.0 if missing else -value if field.startswith('-') else value))
+		return key
+
+	def merged_order(self, order, ordering, positions):
+		"""`order` with the movies at `positions` taken out and put back where their keys now sort"""
+		rest = order[~np.isin(order, positions)]
+		moved = sorted(positions.tolist(), key=lambda position: self.sort_key(ordering, position))
+		places = []
+		for position in moved:
+			key, lo, hi = self.sort_key(ordering, position), 0, len(rest)
+			while lo < hi:
+				mid = (lo + hi) // 2
+				if self.sort_key(ordering, int(rest[mid])) < key:
+					lo = mid + 1
+				else:
+					hi = mid
+			places.append(lo)
+		return np.insert(rest, places, moved)
+
+	def copy(self):
+		"""A copy to patch while other threads keep reading this one"""
+		clone = copy.copy(self)
+		for name in (
+			'ids', 'year', 'rating', 'votes', 'type',
+			'all_bits', 'genre_bits', 'type_bits', 'year_le_bits', 'rating_ge_bits',
+		):
+			setattr(clone, name, getattr(self, name).copy())
+		clone.titles = list(self.titles)
+		clone.types = list(self.types)
+		clone.orders = dict(self.orders)
+		return clone
+
+	def grow(self, count):
+		"""Room for `count` more movies at the end of the arrays and bitsets"""
+		n = len(self.ids)
+		self.year, self.rating, self.votes = (
+			np.concatenate([values, np.full(count, np.nan)]) for values in (self.year, self.rating, self.votes)
+		)
+		self.type = np.concatenate([self.type, np.zeros(count, dtype=np.int16)])
+		self.titles.extend([''] * count)
+		extra = (n + count + 7) // 8 - (n + 7) // 8
+		for name in ('all_bits', 'genre_bits', 'type_bits', 'year_le_bits', 'rating_ge_bits'):
+			bits = getattr(self, name)
+			setattr(self, name, np.pad(bits, [(0, 0)] * (bits.ndim - 1) + [(0, extra)]))
+
+	def patch(self, rows, links):
+		"""
+		Apply movies read again with their genre links, False when a reload
+		is needed. Only the bits of the patched movies are set or cleared,
+		and only the sort orders whose keys changed are merged again.
+		"""
+		ids = np.array([row[0] for row in rows], dtype=np.int64)
+		n = len(self.ids)
+		positions = np.searchsorted(self.ids, ids)
+		known = positions < n
+		known[known] = self.ids[positions[known]] == ids[known]
+		new = ids[~known]
+		if len(new):
+			if n and new.min() <= self.ids[-1]:
+				return False
+			self.grow(len(new))
+			self.ids = np.concatenate([self.ids, new])
+			positions[~known] = np.arange(n, n + len(new))
+
+		before = {field: self.column(field)[positions].copy() for field in ('Year_num', 'imdbRating_num', 'imdbVotes_num')}
+		before['Title'] = [self.titles[position] for position in positions.tolist()]
+		self.set_rows(positions, rows)
+		members = self.memberships(positions, links)
+		if members is None:
+			return False
+
+		# Years no movie had yet get a row, a copy of the year before's
+		years = self.year[positions]
+		for year in np.setdiff1d(years[~np.isnan(years)].astype(np.int64), self.years).tolist():
+			row = int(np.searchsorted(self.years, year))
+			previous = self.year_le_bits[row - 1] if row else np.zeros_like(self.all_bits)
+			self.years = np.insert(self.years, row, year)
+			self.year_le_bits = np.insert(self.year_le_bits, row, previous, axis=0)
+		if len(self.types) > len(self.type_bits):
+			extra = np.zeros((len(self.types) - len(self.type_bits), len(self.all_bits)), dtype=np.uint8)
+			self.type_bits = np.vstack([self.type_bits, extra])
+
+		assign_bits(self.all_bits, positions, np.ones(len(positions), dtype=bool))
+		assign_bits(self.genre_bits, positions, members)
+		assign_bits(self.type_bits, positions, self.type_values(positions))
+		assign_bits(self.year_le_bits, positions, self.year_values(positions))
+		assign_bits(self.rating_ge_bits, positions, self.rating_values(positions))
+
+		after = {field: self.column(field)[positions] for field in ('Year_num', 'imdbRating_num', 'imdbVotes_num')}
+		after['Title'] = [self.titles[position] for position in positions.tolist()]
+		changed = {
+			field for field in before
+			if not (before[field] == after[field] if field == 'Title' else np.array_equal(before[field], after[field], equal_nan=True))
+		}
+		for sort, ordering in MOVIE_SORTS.items():
+			if len(new) or changed & {field.lstrip('-') for field in ordering}:
+				self.orders[sort] = self.merged_order(self.orders[sort], ordering, positions)
+		return True
+
+	def select(self, genres=(), types=(), years=(None, None), min_rating=None):
+		"""Bitset of the movies in every genre, of any of the types, in the years and rated at least min_rating"""
+		bits = self.all_bits.copy()
+		for slug in genres:
+			if slug not in self.genre_slugs:
+				return np.zeros_like(bits)
+			bits &= self.genre_bits[self.genre_slugs[slug]]
+		if types:
+			codes = [self.types.index(kind) for kind in types if kind in self.types]
+			bits &= np.bitwise_or.reduce(self.type_bits[codes], axis=0) if codes else 0
+		start, end = years
+		if start is not None or end is not None:
+			bits &= self.year_range(start, end)
+		if min_rating is not None:
+			bits &= self.rating_ge_bits[rating_step(min_rating)]
+		return bits
+
+	def year_range(self, start, end):
+		# year_le_bits[i] holds the movies of years[i] or before
+		last = len(self.years) - 1 if end is None else np.searchsorted(self.years, end, side='right') - 1
+		before = -1 if start is None else np.searchsorted(self.years, start) - 1
+		if last < 0:
+			return np.zeros_like(self.all_bits)
+		bits = self.year_le_bits[last].copy()
+		if before >= 0:
+			bits &= ~self.year_le_bits[before]
+		return bits
+
+	def counts(self, bits, selected):
+		"""Movies of the selection per genre and type, and per decade that has any"""
+		years = self.year[selected]
+		decades, decade_counts = np.unique(years[~np.isnan(years)] // 10 * 10, return_counts=True)
+		return {
+			'genres': [
+				(slug, title, count) for (slug, title), count in zip(self.genres, popcount(self.genre_bits & bits).tolist())
+			],
+			'types': list(zip(self.types, popcount(self.type_bits & bits).tolist())),
+			'decades': list(zip(decades.astype(int).tolist(), decade_counts.tolist())),
+		}
+
+	def browse(self, genres=(), types=(), years=(None, None), min_rating=None, sort=DEFAULT_MOVIE_SORT, offset=0, limit=24):
+		"""Result(total, movie ids of the page, facet counts) of a browse query"""
+		bits = self.select(genres, types, years, min_rating)
+		selected = np.unpackbits(bits, count=len(self.ids)).view(bool)
+		order = self.orders.get(sort, self.orders[DEFAULT_MOVIE_SORT])
+		hits = order[selected[order]]
+		ids = self.ids[hits[offset:offset + limit]].tolist()
+		return Result(len(hits), ids, self.counts(bits, selected))
+
+
+def movie_rows(movies):
+	return list(movies.order_by('pk').values_list('pk', 'Year_num', 'imdbRating_num', 'imdbVotes_num', 'Type', 'Title'))
+
+
+def load_index():
+	watermark = timezone.now() - WATERMARK_OVERLAP
+	genres = list(Genre.objects.order_by('title').values_list('pk', 'slug', 'title'))
+	rows = movie_rows(Movie.objects.all())
+	links = Movie.Genre.through.objects.values_list('movie_id', 'genre_id')
+	return FacetIndex(rows, links, genres, watermark)
+
+
+def refreshed(index):
+	"""`index` or a patched copy of it up to date with the database"""
+	watermark = timezone.now() - WATERMARK_OVERLAP
+	rows = movie_rows(Movie.objects.filter(modified_at__gt=index.watermark))
+	if len(rows) > settings.FACETS_PATCH_MAX:
+		return load_index()
+	if rows:
+		links = Movie.Genre.through.objects.filter(movie_id__in=[row[0] for row in rows]).values_list('movie_id', 'genre_id')
+		patched = index.copy()
+		if not patched.patch(rows, links):
+			return load_index()
+		index = patched
+	# Deleted movies and genres do not show in modified_at
+	if Movie.objects.count() != len(index.ids) or Genre.objects.count() != len(index.genres):
+		return load_index()
+	index.watermark = watermark
+	return index
+
+
+_index = None
+_checked_at = 0.0
+_stale = False
+_lock = threading.Lock()
+
+
+def mark_stale():
+	"""Check for changes on the next query rather than after FACETS_CHECK_SECONDS"""
+	global _stale
+	_stale = True
+
+
+def get_index():
+	global _index, _checked_at, _stale
+	with _lock:
+		now = time.monotonic()
+		if _index is None:
+			_index = load_index()
+		elif _stale or now - _checked_at >= settings.FACETS_CHECK_SECONDS:
+			_stale = False
+			_index = refreshed(_index)
+		else:
+			return _index
+		_checked_at = now
+		return _index
@@ -0,0 +1,205 @@
+"""
+Batched catalog ingestion from OMDb title payloads.
+
+Used by movieDetails for a single title and by the ingest_catalog
+management command for thousands. Movies are upserted on their unique
+imdbID; actors, genres and ratings of a whole batch are resolved with one
+bulk_create(ignore_conflicts=True) pass each, and the M2M through rows are
+written with bulk_create as well, so a batch costs a handful of queries
+instead of dozens per title.
+"""
+from django.db import transaction
+from django.utils.text import slugify
+
+from actor.models import Actor
+from movie.models import Movie, Genre, Rating, Casting
+from movie import cards, facets, omdb, search, posters, singleflight
+from movie.numeric import SHADOW_FIELDS, parse_score, shadow_values
+
+
+# OMDb payload key -> Movie field, everything else maps onto itself
+FIELD_ALIASES = {'Poster': 'Poster_url'}
+
+MOVIE_FIELDS = [
+	'Title', 'Year', 'Rated', 'Released', 'Runtime', 'Director', 'Writer', 'Plot',
+	'Language', 'Country', 'Awards', 'Poster_url', 'Metascore', 'imdbRating',
+	'imdbVotes', 'imdbID', 'Type', 'DVD', 'BoxOffice', 'Production', 'Website',
+	'totalSeasons',
+]
+
+
+def is_title_payload(payload):
+	return isinstance(payload, dict) and payload.get('Response') == 'True' and bool(payload.get('imdbID'))
+
+
+def movie_fields(payload):
+	"""Model field values for a title payload, cut to the column sizes, with their parsed numeric copies"""
+	fields = {}
+	for key, value in payload.items():
+		name = FIELD_ALIASES.get(key, key)
+		if name not in MOVIE_FIELDS or not isinstance(value, str):
+			continue
+		max_length = Movie._meta.get_field(name).max_length
+		fields[name] = value[:max_length] if max_length else value
+	fields.update(shadow_values(fields))
+	return fields
+
+
+def split_names(value):
+	return [name.strip() for name in (value or '').split(',') if name.strip() and name.strip() != 'N/A']
+
+
+def actor_names(payload):
+	return split_names(payload.get('Actors'))
+
+
+def genre_titles(payload):
+	# Same normalisation as movieDetails, "Sci-Fi" and "Film-Noir" keep their dash
+	return [title.replace(' ', '') for title in split_names(payload.get('Genre'))]
+
+
+def rating_pairs(payload):
+	return [(rate['Source'], rate['Value']) for rate in payload.get('Ratings') or []]
+
+
+def resolve_actors(names):
+	"""name -> Actor id for every name, creating the missing ones in bulk"""
+	names = set(names)
+	Actor.objects.bulk_create([Actor(name=name, slug=slugify(name)) for name in names], ignore_conflicts=True)
+	actors = dict(Actor.objects.filter(name__in=names).values_list('name', 'id'))
+
+	# Names whose slug collides with another actor ("Jose" and "José") were
+	# ignored above, give them a numbered slug.
+	for name in names - set(actors):
+		slug = base = slugify(name) or 'actor'
+		suffix = 1
+		while Actor.objects.filter(slug=slug).exists():
+			suffix += 1
+			slug = '%s-%s' % (base, suffix)
+		actors[name] = Actor.objects.create(name=name, slug=slug).id
+	return actors
+
+
+def resolve_genres(titles):
+	"""slug -> Genre id"""
+	by_slug = {slugify(title): title for title in titles}
+	Genre.objects.bulk_create([Genre(title=title, slug=slug) for slug, title in by_slug.items()], ignore_conflicts=True)
+	return dict(Genre.objects.filter(slug__in=by_slug).values_list('slug', 'id'))
+
+
+def resolve_ratings(pairs):
+	"""(source, rating) -> Rating id"""
+	pairs = set(pairs)
+	Rating.objects.bulk_create(
+		[Rating(source=source, rating=rating, score=parse_score(rating)) for source, rating in pairs],
+		ignore_conflicts=True,
+	)
+	sources = {source for source, rating in pairs}
+	ratings = {}
+	for pk, source, rating in Rating.objects.filter(source__in=sources).values_list('id', 'source', 'rating'):
+		if (source, rating) in pairs:
+			ratings[(source, rating)] = pk
+	return ratings
+
+
+@transaction.atomic
+def ingest_batch(payloads, refresh=False, fetch_posters=True):
+	"""
+	Upsert a batch of OMDb title payloads keyed on imdbID. Titles already in
+	the catalog are left alone unless `refresh` is set, in which case their
+	metadata and cast/genre/rating links are replaced. Returns the written
+	movies.
+	"""
+	by_id = {}
+	for payload in payloads:
+		if is_title_payload(payload):
+			by_id[payload['imdbID']] = payload
+	if not refresh:
+		existing = set(Movie.objects.filter(imdbID__in=by_id).values_list('imdbID', flat=True))
+		by_id = {imdb_id: payload for imdb_id, payload in by_id.items() if imdb_id not in existing}
+	payloads = list(by_id.values())
+	if not payloads:
+		return []
+
+	actors = resolve_actors(name for payload in payloads for name in actor_names(payload))
+	genres = resolve_genres(title for payload in payloads for title in genre_titles(payload))
+	ratings = resolve_ratings(pair for payload in payloads for pair in rating_pairs(payload))
+
+	string_fields = [name for name in MOVIE_FIELDS if name != 'imdbID']
+	update_fields = string_fields + [shadow for shadow, parse in SHADOW_FIELDS.values()]
+	Movie.objects.bulk_create(
+		[Movie(**dict(dict.fromkeys(string_fields, ''), **movie_fields(payload))) for payload in payloads],
+		update_conflicts=True, unique_fields=['imdbID'], update_fields=update_fields,
+	)
+	movies = list(Movie.objects.filter(imdbID__in=by_id))
+	movie_ids = {movie.imdbID: movie.id for movie in movies}
+
+	if refresh:
+		ids = list(movie_ids.values())
+		Movie.Genre.through.objects.filter(movie_id__in=ids).delete()
+		Casting.objects.filter(movie_id__in=ids).delete()
+		Movie.Ratings.through.objects.filter(movie_id__in=ids).delete()
+
+	movie_genres, castings, movie_ratings = [], [], []
+	for payload in payloads:
+		movie_id = movie_ids[payload['imdbID']]
+		for slug in dict.fromkeys(slugify(title) for title in genre_titles(payload)):
+			movie_genres.append(Movie.Genre.through(movie_id=movie_id, genre_id=genres[slug]))
+		# OMDb lists the cast in billing order
+		for billing, name in enumerate(dict.fromkeys(actor_names(payload))):
+			castings.append(Casting(movie_id=movie_id, actor_id=actors[name], billing=billing))
+		for pair in dict.fromkeys(rating_pairs(payload)):
+			movie_ratings.append(Movie.Ratings.through(movie_id=movie_id, rating_id=ratings[pair]))
+
+	Movie.Genre.through.objects.bulk_create(movie_genres, ignore_conflicts=True)
+	Casting.objects.bulk_create(castings, ignore_conflicts=True)
+	Movie.Ratings.through.objects.bulk_create(movie_ratings, ignore_conflicts=True)
+
+	# bulk_create skips the signals that maintain the search index, the
+	# movie cards, the cached movie page fragments, the browse facets and
+	# queue the poster downloads
+	search.index_movies(movie_ids.values())
+	built = cards.refresh_cards(movie_ids.values())
+	for movie in movies:
+		movie.card = built[movie.pk]
+	Movie.bump_cache_version(movie_ids.values())
+	facets.mark_stale()
+	if fetch_posters:
+		posters.schedule_downloads(movies)
+	return movies
+
+
+def ingest_title(payload):
+	"""Upsert a single OMDb title payload, returns its Movie"""
+	movies = ingest_batch([payload], refresh=True)
+	return movies[0] if movies else None
+
+
+def fetch_and_ingest(imdb_id):
+	"""
+	Fetch and ingest a title that is not in the catalog yet, coalescing
+	concurrent requests for it across workers. Returns (payload, movie):
+	the leader gets both, a follower gets the movie once the leader stored
+	it, or only the payload if the leader is too slow. Raises
+	omdb.OMDbError when OMDb cannot be reached.
+	"""
+	key = 'ingest:%s' % imdb_id
+	if singleflight.acquire(key):
+		singleflight.count('leaders')
+		try:
+			payload = omdb.get_title(imdb_id)
+			movie = ingest_title(payload) if is_title_payload(payload) else None
+			return payload, movie
+		finally:
+			singleflight.release(key)
+
+	singleflight.count('coalesced')
+	movie, timed_out = singleflight.wait(key, lambda: Movie.objects.filter(imdbID=imdb_id).first())
+	if movie is not None:
+		return None, movie
+
+	# The leader is slow, failed or found no title. Its payload is most
+	# likely in the shared response cache already, render from that
+	# without ingesting again.
+	singleflight.count('timeouts' if timed_out else 'not_found')
+	return omdb.get_title(imdb_id), None
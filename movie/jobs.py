@@ -0,0 +1,120 @@
+"""
+Small background job queue.
+
+Handlers register under a name with @handler('name') and are queued with
+enqueue('name', **payload). JOB_QUEUE_BACKEND picks where they run:
+
+- 'local': a bounded thread pool inside the web process, the stand-in for
+  development and single-box deployments, no worker needed.
+- 'database': Job rows consumed by `manage.py run_jobs`, which retries
+  failed jobs with exponential backoff.
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from movie.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# How long a worker may hold a claimed job before another worker retries it
+LOCK_TIMEOUT = timedelta(minutes=5)
+
+
+def handler(kind):
+	def register(func):
+		HANDLERS[kind] = func
+		return func
+	return register
+
+
+def enqueue(kind, dedupe_key='', **payload):
+	"""
+	Queue a job once the current transaction commits. Jobs with a
+	dedupe_key are skipped while an identical one is still queued.
+	"""
+	if kind not in HANDLERS:
+		raise ValueError('Unknown job kind: %s' % kind)
+	if settings.JOB_QUEUE_BACKEND == 'database':
+		if dedupe_key and Job.objects.filter(dedupe_key=dedupe_key, status__in=['pending', 'running']).exists():
+			return
+		Job.objects.create(kind=kind, payload=payload, dedupe_key=dedupe_key)
+	else:
+		transaction.on_commit(lambda: local_queue.submit(kind, dedupe_key, payload))
+
+
+def run(kind, payload):
+	HANDLERS[kind](**payload)
+
+
+class LocalQueue:
+	"""In-process stand-in for the database queue"""
+
+	def __init__(self):
+		self.executor = None
+		self.in_flight = set()
+		self.lock = threading.Lock()
+
+	def submit(self, kind, dedupe_key, payload):
+		with self.lock:
+			if dedupe_key:
+				if dedupe_key in self.in_flight:
+					return
+				self.in_flight.add(dedupe_key)
+			if self.executor is None:
+				self.executor = ThreadPoolExecutor(max_workers=settings.JOB_LOCAL_WORKERS, thread_name_prefix='jobs')
+		self.executor.submit(self.execute, kind, dedupe_key, payload)
+
+	def execute(self, kind, dedupe_key, payload):
+		try:
+			run(kind, payload)
+		except Exception:
+			logger.exception('Job %s %r failed', kind, payload)
+		finally:
+			with self.lock:
+				self.in_flight.discard(dedupe_key)
+			close_old_connections()
+
+
+local_queue = LocalQueue()
+
+
+def claim(limit):
+	"""Claim up to `limit` due jobs for this worker"""
+	now = timezone.now()
+	due = Job.objects.filter(status='pending', run_after__lte=now) | Job.objects.filter(status='running', locked_until__lt=now)
+	claimed = []
+	for job in due.order_by('run_after', 'id')[:limit]:
+		# Only one worker wins the conditional update for a given job
+		won = Job.objects.filter(pk=job.pk, status=job.status, locked_until=job.locked_until).update(
+			status='running', locked_until=now + LOCK_TIMEOUT, attempts=job.attempts + 1,
+		)
+		if won:
+			job.attempts += 1
+			claimed.append(job)
+	return claimed
+
+
+def process(job):
+	"""Run a claimed job, returns True when it succeeded"""
+	try:
+		run(job.kind, job.payload)
+	except Exception:
+		error = traceback.format_exc()
+		if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+			Job.objects.filter(pk=job.pk).update(status='failed', locked_until=None, last_error=error)
+		else:
+			retry_at = timezone.now() + timedelta(seconds=2 ** job.attempts * 10)
+			Job.objects.filter(pk=job.pk).update(status='pending', locked_until=None, run_after=retry_at, last_error=error)
+		return False
+	Job.objects.filter(pk=job.pk).delete()
+	return True
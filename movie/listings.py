@@ -0,0 +1,67 @@
+"""
+Keyset pagination of the movie grids of the genre and actor pages.
+
+Like the review pages (movie/reviews.py), a page is cut with a WHERE on
+the sort key of the last movie shown rather than an OFFSET, so a crawler
+deep into a large genre costs the same per page as the first visit, and
+no COUNT(*) is needed to know whether there is a next page. Sort keys are
+MOVIE_SORTS: an optional indexed column and the movie id, in the same
+direction. Movies without a value for the column (no year, no rating...)
+come last, as SQLite sorts NULL lowest.
+
+The number of movies of a listing is only shown as an indication and is
+cached for LISTING_COUNT_CACHE_SECONDS.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from movie.models import MOVIE_SORTS, DEFAULT_MOVIE_SORT
+from movie.cursors import InvalidCursor, Page, encode_cursor, decode_cursor
+
+
+PAGE_SIZE = 9
+
+
+def parse_value(field, value):
+	"""A value of a movie grid cursor: the id, or a column value that may be missing"""
+	if isinstance(value, bool):
+		raise ValueError(value)
+	if field == 'id' and not isinstance(value, int):
+		raise ValueError(value)
+	if value is not None and not isinstance(value, (int, float, str)):
+		raise ValueError(value)
+	return value
+
+
+def after(fields, values, descending):
+	"""Q for the movies after `values` in the order of `fields`, NULLs sorting lowest"""
+	lookup = 'lt' if descending else 'gt'
+	*key, pk = values
+	condition = Q(**{'id__%s' % lookup: pk})
+	if not key:
+		return condition
+
+	field, value = fields[0], key[0]
+	if value is None:
+		condition &= Q(**{'%s__isnull' % field: True})
+		return condition if descending else condition | Q(**{'%s__isnull' % field: False})
+	condition = Q(**{'%s__%s' % (field, lookup): value}) | Q(**{field: value}) & condition
+	return condition | Q(**{'%s__isnull' % field: True}) if descending else condition
+
+
+def movie_page(movies, sort=DEFAULT_MOVIE_SORT, cursor=None, limit=PAGE_SIZE):
+	"""A page of `movies` in the `sort` order. Raises InvalidCursor for a tampered cursor."""
+	ordering = MOVIE_SORTS.get(sort, MOVIE_SORTS[DEFAULT_MOVIE_SORT])
+	fields = [field.lstrip('-') for field in ordering]
+	descending = ordering[0].startswith('-')
+	if cursor:
+		movies = movies.filter(after(fields, decode_cursor(cursor, fields, parse_value), descending))
+	items = list(movies.order_by(*ordering)[:limit + 1])
+	next_cursor = encode_cursor(items[limit - 1], fields) if len(items) > limit else None
+	return Page(items[:limit], next_cursor)
+
+
+def movie_count(key, movies):
+	"""Cached number of `movies`, `key` names the listing"""
+	return cache.get_or_set('movie-count:%s' % key, movies.count, settings.LISTING_COUNT_CACHE_SECONDS)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movie.models import Movie, Rating
+from movie.numeric import SHADOW_FIELDS, parse_score, shadow_values
+
+
+class Command(BaseCommand):
+    help = 'Fill the parsed numeric columns of movies and ratings from their string fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per bulk update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        shadow_fields = [shadow for shadow, parse in SHADOW_FIELDS.values()]
+
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Movie.objects.filter(pk__gt=last_id).order_by('pk')
+                .only('pk', *SHADOW_FIELDS, *shadow_fields)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            changed = []
+            for movie in batch:
+                values = shadow_values({name: getattr(movie, name) for name in SHADOW_FIELDS})
+                if any(getattr(movie, name) != value for name, value in values.items()):
+                    for name, value in values.items():
+                        setattr(movie, name, value)
+                    changed.append(movie)
+            with transaction.atomic():
+                Movie.objects.bulk_update(changed, shadow_fields)
+            updated += len(changed)
+
+        ratings = []
+        for rating in Rating.objects.only('pk', 'rating', 'score'):
+            score = parse_score(rating.rating)
+            if rating.score != score:
+                rating.score = score
+                ratings.append(rating)
+        Rating.objects.bulk_update(ratings, ['score'], batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} movies and {len(ratings)} ratings.'))
@@ -0,0 +1,106 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from movie import autocomplete, catalog_index
+
+
+WORDS = (
+    'the of and a in love night dark man last day story war city house girl king dead life world return '
+    'secret blood american time black death star lost home game red road great family fire summer river '
+    'little ghost christmas island school heart white new york london paris beyond shadow dream edge'
+).split()
+
+
+def synthetic_entries(count, rng):
+    """Movie entries with titles of 1-5 common words and a long-tailed popularity"""
+    for pk in range(1, count + 1):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))).title() + ' %d' % pk
+        score = catalog_index.popularity(int(rng.paretovariate(1.5)) - 1, int(rng.paretovariate(1.1) * 100))
+        yield pk, title, score, catalog_index.movie_display(pk, title, str(rng.randint(1920, 2024)), 'tt%07d' % pk)
+
+
+def brute_force(entries, prefix, limit):
+    """The suggestions of PrefixIndex.complete(), by scanning every name"""
+    found = [
+        (score, pk, display) for pk, name, score, display in entries
+        if any(key.startswith(prefix) for key in autocomplete.name_keys(name))
+    ]
+    found.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+    return [display for score, pk, display in found[:limit]]
+
+
+def summary(timings):
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f'mean {mean * 1e6:,.0f} us, p95 {p95 * 1e6:,.0f} us, max {timings[-1] * 1e6:,.0f} us'
+
+
+class Command(BaseCommand):
+    help = 'Memory and latency of the autocomplete prefix index on a synthetic catalog, or on the real one with --database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=100000, help='Size of the synthetic catalog')
+        parser.add_argument('--database', action='store_true', help='Load the index from the database instead')
+        parser.add_argument('--queries', type=int, default=2000, help='Number of random prefixes typed')
+        parser.add_argument('--check', type=int, default=100, help='Queries compared with a scan of every name')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the catalog and the queries')
+        parser.add_argument('--limit', type=int, default=6, help='Suggestions per query')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        tracemalloc.start()
+        if options['database']:
+            entries = list(catalog_index.movie_entries(catalog_index.Movie.objects.all()))
+        else:
+            entries = list(synthetic_entries(options['titles'], rng))
+        if not entries:
+            self.stdout.write('No titles to index.')
+            return
+        shown, _ = tracemalloc.get_traced_memory()
+
+        index = autocomplete.PrefixIndex(entries)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Timed again without tracing, which slows allocations down
+        start = time.perf_counter()
+        index = autocomplete.PrefixIndex(entries)
+        build_time = time.perf_counter() - start
+        arrays = sum(array.nbytes for array in (index.keys, index.owners, index.ids, index.scores))
+        self.stdout.write(
+            f'Indexed {len(entries):,} titles as {len(index.keys):,} keys in {build_time * 1000:,.0f} ms, '
+            f'{peak / 2 ** 20:.1f} MB peak.'
+        )
+        self.stdout.write(
+            f'Memory: {(retained - shown) / 2 ** 20:.1f} MB for the index ({arrays / 2 ** 20:.1f} MB of arrays), '
+            f'{shown / 2 ** 20:.1f} MB for the names and suggestions it holds.'
+        )
+
+        # Prefixes of 1 to 8 characters of the words of random titles, as typed
+        queries = []
+        for _ in range(options['queries']):
+            pk, name, score, display = rng.choice(entries)
+            key = rng.choice(autocomplete.name_keys(name) or [b'a']).decode(errors='ignore')
+            queries.append(key[:rng.randint(1, 8)])
+
+        # The first call pays for NumPy's lazy setup
+        index.complete(b'a', options['limit'])
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.complete(autocomplete.prefix_key(query), options['limit'])
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(f'Per keystroke: {summary(timings)}')
+
+        mismatches = 0
+        for query in queries[:options['check']]:
+            prefix = autocomplete.prefix_key(query)
+            if index.complete(prefix, options['limit']) != brute_force(entries, prefix, options['limit']):
+                mismatches += 1
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} of {options["check"]} queries disagree with a full scan.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{options["check"]} queries matched a full scan.'))
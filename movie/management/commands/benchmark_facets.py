@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+
+from movie import facets
+from movie.models import Movie, MOVIE_SORTS
+
+
+def orm_browse(genres, types, years, min_rating, sort, limit):
+    """The browse query of FacetIndex.browse() in SQL: total, page ids, genre and type counts"""
+    movies = Movie.objects.all()
+    for slug in genres:
+        # One join per genre, a movie has to be in all of them
+        movies = movies.filter(Genre__slug=slug)
+    if types:
+        movies = movies.filter(Type__in=types)
+    start, end = years
+    if start is not None:
+        movies = movies.filter(Year_num__gte=start)
+    if end is not None:
+        movies = movies.filter(Year_num__lte=end)
+    if min_rating is not None:
+        # Ratings have one decimal, the index rounds them to tenths
+        movies = movies.filter(imdbRating_num__gte=(facets.rating_step(min_rating) - 0.5) / 10)
+
+    ordering = [F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc() for field in MOVIE_SORTS[sort]]
+    total = movies.count()
+    ids = list(movies.order_by(*ordering).values_list('pk', flat=True)[:limit])
+    links = Movie.Genre.through.objects.filter(movie_id__in=movies.values('pk'))
+    genre_counts = dict(links.values_list('genre__slug').annotate(movies=Count('id')))
+    type_counts = dict(movies.values_list('Type').annotate(movies=Count('id')))
+    return total, ids, genre_counts, type_counts
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def summary(timings):
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f'mean {mean * 1e6:,.0f} us, p95 {p95 * 1e6:,.0f} us'
+
+
+class Command(BaseCommand):
+    help = 'Time random browse queries on the in-memory facet index against the equivalent ORM queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200, help='Number of random queries')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random queries')
+        parser.add_argument('--limit', type=int, default=24, help='Movies per page')
+
+    def handle(self, *args, **options):
+        index, load_time = timed(facets.load_index)
+        self.stdout.write(f'Loaded {len(index.ids)} movies and {len(index.genres)} genres in {load_time * 1000:.0f} ms.')
+        if not len(index.ids):
+            return
+
+        rng = random.Random(options['seed'])
+        slugs = [slug for slug, title in index.genres]
+        decades = sorted({int(year) // 10 * 10 for year in index.years.tolist()})
+        index_timings, orm_timings, mismatches = [], [], 0
+        for _ in range(options['queries']):
+            genres = rng.sample(slugs, min(len(slugs), rng.choice([0, 1, 1, 2, 2, 3])))
+            types = rng.sample(index.types, 1) if index.types and rng.random() < 0.3 else []
+            decade = rng.choice(decades) if decades and rng.random() < 0.5 else None
+            years = (decade, decade + 9) if decade is not None else (None, None)
+            min_rating = rng.choice([None, 5, 6, 7, 7.5, 8])
+            sort = rng.choice(list(MOVIE_SORTS))
+
+            result, elapsed = timed(index.browse, genres, types, years, min_rating, sort, 0, options['limit'])
+            index_timings.append(elapsed)
+            (total, ids, genre_counts, type_counts), elapsed = timed(
+                orm_browse, genres, types, years, min_rating, sort, options['limit'],
+            )
+            orm_timings.append(elapsed)
+
+            expected = (
+                total, ids,
+                {slug: count for slug, title, count in result.counts['genres'] if count},
+                {kind: count for kind, count in result.counts['types'] if count},
+            )
+            if (result.total, result.ids, genre_counts, type_counts) != expected:
+                mismatches += 1
+
+        self.stdout.write(f'Facet index: {summary(index_timings)}')
+        self.stdout.write(f'ORM:         {summary(orm_timings)}')
+        self.stdout.write(f'Speedup:     {sum(orm_timings) / sum(index_timings):.1f}x')
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} of {options["queries"]} queries disagree with the ORM.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Every query matched the ORM.'))
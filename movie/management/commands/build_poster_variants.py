@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from movie.models import Movie
+from movie.posters import rebuild_poster
+
+
+class Command(BaseCommand):
+    help = 'Store existing posters under their content hash and derive their WebP/JPEG thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also revisit processed posters, e.g. after changing POSTER_WIDTHS')
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.exclude(Poster='')
+        if not options['all']:
+            movies = movies.filter(Poster_hash='')
+
+        done = failed = 0
+        for movie_id in movies.values_list('pk', flat=True).iterator():
+            try:
+                rebuild_poster(movie_id)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Movie #{movie_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Processed {done} posters, {failed} failed.'))
@@ -0,0 +1,126 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movie import omdb
+from movie.ingest import ingest_batch
+from movie.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Bulk ingest titles into the catalog, from a file of imdbIDs or saved OMDb JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', help='Text file with one imdbID per line, fetched from OMDb')
+        parser.add_argument('--json', help='OMDb title JSON: a file holding one payload, a list or JSON lines, or a directory of such files')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent OMDb fetches')
+        parser.add_argument('--batch-size', type=int, default=200, help='Titles written per transaction')
+        parser.add_argument('--refresh', action='store_true', help='Re-fetch and update titles already in the catalog')
+        parser.add_argument('--skip-posters', action='store_true', help='Do not queue poster downloads')
+
+    def handle(self, *args, **options):
+        if not options['ids'] and not options['json']:
+            raise CommandError('Pass --ids and/or --json.')
+
+        self.workers = max(1, options['workers'])
+        self.batch_size = max(1, options['batch_size'])
+        self.skip_posters = options['skip_posters']
+        self.refresh = options['refresh']
+        self.created = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self.pool = pool
+            if options['json']:
+                self.ingest_payloads(self.read_payloads(Path(options['json'])))
+            if options['ids']:
+                self.ingest_ids(self.read_ids(Path(options['ids'])))
+
+        elapsed = time.monotonic() - self.started
+        rate = self.created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingested {self.created} titles in {elapsed:.1f}s ({rate:.1f} titles/s), '
+            f'{self.skipped} already in the catalog, {self.failed} failed.'
+        ))
+
+    def read_ids(self, path):
+        if not path.is_file():
+            raise CommandError(f'{path} does not exist.')
+        ids = []
+        for line in path.read_text().splitlines():
+            imdb_id = line.split('#', 1)[0].strip()
+            if imdb_id:
+                ids.append(imdb_id)
+        return list(dict.fromkeys(ids))
+
+    def read_payloads(self, path):
+        if path.is_dir():
+            files = sorted(path.glob('*.json')) + sorted(path.glob('*.jsonl'))
+        elif path.is_file():
+            files = [path]
+        else:
+            raise CommandError(f'{path} does not exist.')
+
+        for file in files:
+            text = file.read_text()
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError:
+                data = [json.loads(line) for line in text.splitlines() if line.strip()]
+            if isinstance(data, dict):
+                data = [data]
+            yield from data
+
+    def ingest_ids(self, ids):
+        if not self.refresh:
+            existing = set(Movie.objects.filter(imdbID__in=ids).values_list('imdbID', flat=True))
+            self.skipped += len(existing)
+            ids = [imdb_id for imdb_id in ids if imdb_id not in existing]
+
+        # Fetch the next batch while the current one is being written
+        batches = [ids[i:i + self.batch_size] for i in range(0, len(ids), self.batch_size)]
+        pending = [self.pool.submit(self.fetch, imdb_id) for imdb_id in batches[0]] if batches else []
+        for index in range(len(batches)):
+            current = pending
+            if index + 1 < len(batches):
+                pending = [self.pool.submit(self.fetch, imdb_id) for imdb_id in batches[index + 1]]
+            payloads = [future.result() for future in current]
+            self.write([payload for payload in payloads if payload is not None])
+
+    def ingest_payloads(self, payloads):
+        batch = []
+        for payload in payloads:
+            batch.append(payload)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+
+    def fetch(self, imdb_id):
+        try:
+            payload = omdb.get_title(imdb_id)
+        except omdb.OMDbError as e:
+            self.stderr.write(f'{imdb_id}: {e}')
+            self.failed += 1
+            return None
+        if payload.get('Response') != 'True':
+            self.stderr.write(f"{imdb_id}: {payload.get('Error', 'not found')}")
+            self.failed += 1
+            return None
+        return payload
+
+    def write(self, payloads):
+        valid = [payload for payload in payloads if isinstance(payload, dict) and payload.get('Response') == 'True']
+        self.failed += len(payloads) - len(valid)
+        movies = ingest_batch(valid, refresh=self.refresh, fetch_posters=not self.skip_posters)
+        self.created += len(movies)
+        self.skipped += len({payload['imdbID'] for payload in valid}) - len(movies)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'{self.created} titles ingested, {self.created / elapsed:.1f} titles/s')
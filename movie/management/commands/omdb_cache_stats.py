@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movie.omdb_cache import get_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the shared OMDb response cache and the ingestion single-flight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true', help='Evict least recently used entries over the size limit')
+        parser.add_argument('--clear', action='store_true', help='Drop every cached response and reset the counters')
+
+    def handle(self, *args, **options):
+        cache = get_cache()
+        if cache is None:
+            raise CommandError('The OMDb cache is disabled (OMDB_CACHE_PATH is not set).')
+
+        if options['clear']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS('OMDb cache cleared.'))
+            return
+
+        if options['evict']:
+            evicted = cache.evict()
+            self.stdout.write(f'Evicted {evicted} entries.')
+
+        stats = cache.stats()
+        kinds = sorted(set(stats['counters']) | set(stats['entries']))
+        if not kinds:
+            self.stdout.write('The OMDb cache is empty.')
+            return
+
+        for kind in kinds:
+            counters = stats['counters'].get(kind, {})
+            if kind == 'singleflight':
+                self.stdout.write(
+                    f"ingestion single-flight: {counters.get('leaders', 0)} leaders, "
+                    f"{counters.get('coalesced', 0)} coalesced requests, {counters.get('timeouts', 0)} gave up waiting, "
+                    f"{counters.get('not_found', 0)} found no title after the leader"
+                )
+                continue
+            hits = counters.get('hits', 0) + counters.get('stale_hits', 0)
+            misses = counters.get('misses', 0)
+            lookups = hits + misses
+            hit_rate = (hits / lookups * 100) if lookups else 0
+            self.stdout.write(
+                f"{kind}: {stats['entries'].get(kind, 0)} entries, "
+                f"{counters.get('hits', 0)} hits, {counters.get('stale_hits', 0)} stale hits, "
+                f"{misses} misses, {counters.get('refreshes', 0)} refreshes, "
+                f"{counters.get('expired_hits', 0)} served expired ({hit_rate:.1f}% hit rate)"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from movie import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the local full-text search index over the movie catalog'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write('Full-text search needs SQLite, the icontains fallback is in use.')
+            return
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} movies.'))
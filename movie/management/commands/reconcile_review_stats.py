@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from movie.models import Movie, Review
+
+
+RATE_FIELDS = ['rate_%d' % rate for rate in range(1, 11)]
+STAT_FIELDS = ['reviews_count', 'reviews_sum'] + RATE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the review count, sum and rating histogram of every movie from its reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Movies written per bulk update')
+
+    def handle(self, *args, **options):
+        counts = {field: Count('id', filter=Q(rate=rate)) for rate, field in enumerate(RATE_FIELDS, 1)}
+        empty = dict.fromkeys(STAT_FIELDS, 0)
+
+        with transaction.atomic():
+            # Lock the movies first, so reviews written meanwhile apply their
+            # F() updates on top of the rebuilt values
+            movies = list(Movie.objects.only('pk', *STAT_FIELDS).select_for_update())
+            rows = Review.objects.values('movie_id').annotate(reviews_count=Count('id'), reviews_sum=Sum('rate'), **counts)
+            actual = {row.pop('movie_id'): row for row in rows}
+
+            changed = []
+            for movie in movies:
+                stats = actual.get(movie.pk, empty)
+                if any(getattr(movie, field) != stats[field] for field in STAT_FIELDS):
+                    for field in STAT_FIELDS:
+                        setattr(movie, field, stats[field])
+                    changed.append(movie)
+            Movie.objects.bulk_update(changed, STAT_FIELDS, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Fixed the review stats of {len(changed)} movies.'))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie import charts
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized top rated charts, incrementally when few reviews changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every chart and the chart means')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        mode, rescored = charts.refresh(full=options['full'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'{mode.capitalize()} refresh rescored {rescored} movies in {elapsed:.2f}s.'))
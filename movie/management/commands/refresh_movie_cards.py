@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from movie.cards import refresh_cards
+from movie.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized genre, cast and rating cards of movies from the M2M tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('imdb_ids', nargs='*', help='Only these titles, all movies by default')
+        parser.add_argument('--batch-size', type=int, default=500, help='Movies rebuilt per round of queries')
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.all()
+        if options['imdb_ids']:
+            movies = movies.filter(imdbID__in=options['imdb_ids'])
+        movie_ids = list(movies.order_by('pk').values_list('pk', flat=True))
+        written = refresh_cards(movie_ids, batch_size=options['batch_size'])
+        Movie.bump_cache_version(movie_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(written)} movie cards.'))
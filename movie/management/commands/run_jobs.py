@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movie import jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (poster downloads, ...) when JOB_QUEUE_BACKEND is 'database'"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs and exit instead of polling')
+        parser.add_argument('--batch', type=int, default=20, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds between polls when the queue is empty')
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        self.stdout.write('Processing jobs, press Ctrl+C to stop.' if not options['once'] else 'Processing due jobs.')
+        try:
+            while True:
+                claimed = jobs.claim(options['batch'])
+                for job in claimed:
+                    if jobs.process(job):
+                        done += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f'{job.kind} #{job.pk} failed (attempt {job.attempts})')
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'{done} jobs done, {failed} failed.'))
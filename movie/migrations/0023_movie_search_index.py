@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS movie_search USING fts5(
+    title, plot, director, writer, actors, genres,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+POPULATE_INDEX = """
+INSERT INTO movie_search (rowid, title, plot, director, writer, actors, genres)
+SELECT m.id, m.Title, m.Plot, m.Director, m.Writer,
+    COALESCE((SELECT group_concat(a.name, ', ') FROM movie_movie_Actors ma
+        JOIN actor_actor a ON a.id = ma.actor_id WHERE ma.movie_id = m.id), ''),
+    COALESCE((SELECT group_concat(g.title, ', ') FROM movie_movie_Genre mg
+        JOIN movie_genre g ON g.id = mg.genre_id WHERE mg.movie_id = m.id), '')
+FROM movie_movie m
+"""
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only, other backends use the icontains fallback in movie/search.py
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute(POPULATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS movie_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0022_add_comment_count'),
+        ('actor', '0008_alter_actor_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
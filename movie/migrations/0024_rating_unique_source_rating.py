@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:00
+
+from django.db import migrations
+
+
+def merge_duplicate_ratings(apps, schema_editor):
+    """Point movies at the oldest of identical (source, rating) rows and drop the rest"""
+    Rating = apps.get_model('movie', 'Rating')
+    Movie = apps.get_model('movie', 'Movie')
+    MovieRatings = Movie.Ratings.through
+
+    keep = {}
+    for rating in Rating.objects.order_by('id'):
+        key = (rating.source, rating.rating)
+        if key not in keep:
+            keep[key] = rating.id
+            continue
+        survivor = keep[key]
+        for link in MovieRatings.objects.filter(rating_id=rating.id):
+            if not MovieRatings.objects.filter(movie_id=link.movie_id, rating_id=survivor).exists():
+                MovieRatings.objects.create(movie_id=link.movie_id, rating_id=survivor)
+        rating.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0023_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='rating',
+            unique_together={('source', 'rating')},
+        ),
+    ]
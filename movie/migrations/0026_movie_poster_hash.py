@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0025_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='Poster_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
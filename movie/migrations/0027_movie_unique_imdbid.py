@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+def repoint(through, movie_field, other_field, duplicate_id, survivor_id):
+    """Move M2M rows from the duplicate movie to the survivor, skipping ones it already has"""
+    for row in through.objects.filter(**{movie_field: duplicate_id}):
+        other_id = getattr(row, other_field + '_id')
+        if not through.objects.filter(**{movie_field: survivor_id, other_field: other_id}).exists():
+            through.objects.create(**{movie_field + '_id': survivor_id, other_field + '_id': other_id})
+    through.objects.filter(**{movie_field: duplicate_id}).delete()
+
+
+def merge_duplicate_movies(apps, schema_editor):
+    """
+    Keep the oldest row of every imdbID and move reviews, watch state,
+    personal lists and cast/genre/rating links of the others onto it.
+    """
+    Movie = apps.get_model('movie', 'Movie')
+    Review = apps.get_model('movie', 'Review')
+    Actor = apps.get_model('actor', 'Actor')
+    Profile = apps.get_model('authy', 'Profile')
+    PersonalList = apps.get_model('authy', 'PersonalList')
+
+    links = [
+        (Movie.Genre.through, 'movie', 'genre'),
+        (Movie.Actors.through, 'movie', 'actor'),
+        (Movie.Ratings.through, 'movie', 'rating'),
+        (Actor.movies.through, 'movie', 'actor'),
+        (Profile.to_watch.through, 'movie', 'profile'),
+        (Profile.watched.through, 'movie', 'profile'),
+        (PersonalList.movies.through, 'movie', 'personallist'),
+    ]
+
+    # Rows without an imdbID cannot collide with real ones, give them a
+    # placeholder so the unique index can be built.
+    for movie in Movie.objects.filter(imdbID=''):
+        Movie.objects.filter(pk=movie.pk).update(imdbID='local-%s' % movie.pk)
+
+    duplicated = (
+        Movie.objects.values('imdbID').annotate(rows=models.Count('id')).filter(rows__gt=1).values_list('imdbID', flat=True)
+    )
+    for imdb_id in list(duplicated):
+        survivor, *duplicates = Movie.objects.filter(imdbID=imdb_id).order_by('id')
+        for duplicate in duplicates:
+            for review in Review.objects.filter(movie=duplicate):
+                # A user keeps a single review per movie, the survivor's one wins
+                if Review.objects.filter(movie=survivor, user_id=review.user_id).exists():
+                    review.delete()
+                else:
+                    Review.objects.filter(pk=review.pk).update(movie=survivor)
+            for through, movie_field, other_field in links:
+                repoint(through, movie_field, other_field, duplicate.id, survivor.id)
+            duplicate.delete()
+            if schema_editor.connection.vendor == 'sqlite':
+                schema_editor.execute('DELETE FROM movie_search WHERE rowid = %s', [duplicate.id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0026_movie_poster_hash'),
+        ('actor', '0008_alter_actor_id'),
+        ('authy', '0003_personallist'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_movies, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='movie',
+            name='imdbID',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0028_numeric_shadow_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_review_aggregates(apps, schema_editor):
+    Movie = apps.get_model('movie', 'Movie')
+    Review = apps.get_model('movie', 'Review')
+    counts = {'rate_%d' % rate: Count('id', filter=Q(rate=rate)) for rate in range(1, 11)}
+    rows = Review.objects.values('movie_id').annotate(reviews_count=Count('id'), reviews_sum=Sum('rate'), **counts)
+    for row in rows:
+        Movie.objects.filter(pk=row.pop('movie_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0029_movie_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rate_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_10',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_6',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_7',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_8',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rate_9',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='reviews_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='reviews_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_review_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0030_movie_review_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'date', 'id'], name='movie_revie_movie_i_717627_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'likes', 'date', 'id'], name='movie_revie_movie_i_b786c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'rate', 'date', 'id'], name='movie_revie_movie_i_0995f4_idx'),
+        ),
+    ]
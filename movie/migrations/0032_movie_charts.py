@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0031_review_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChartPrior',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean', models.FloatField()),
+                ('votes', models.PositiveIntegerField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('genre', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chart_prior', to='movie.genre')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.PositiveIntegerField()),
+                ('total', models.PositiveIntegerField()),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ranks', to='movie.genre')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranks', to='movie.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['genre', 'score'], name='movie_movie_genre_i_52fdf1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:18
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_modified_at(apps, schema_editor):
+    apps.get_model('movie', 'Movie').objects.update(modified_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0032_movie_charts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='modified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_modified_at, migrations.RunPython.noop),
+    ]
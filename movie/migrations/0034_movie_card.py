@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+def fill_cards(apps, schema_editor):
+    Movie = apps.get_model('movie', 'Movie')
+    cards = {pk: {'genres': [], 'actors': [], 'ratings': []} for pk in Movie.objects.values_list('pk', flat=True)}
+    for movie_id, title, slug in Movie.Genre.through.objects.order_by('id').values_list('movie_id', 'genre__title', 'genre__slug'):
+        cards[movie_id]['genres'].append({'title': title, 'slug': slug})
+    for movie_id, name, slug in Movie.Actors.through.objects.order_by('id').values_list('movie_id', 'actor__name', 'actor__slug'):
+        if len(cards[movie_id]['actors']) < 10:
+            cards[movie_id]['actors'].append({'name': name, 'slug': slug})
+    for movie_id, source, rating, score in Movie.Ratings.through.objects.order_by('id').values_list(
+            'movie_id', 'rating__source', 'rating__rating', 'rating__score'):
+        cards[movie_id]['ratings'].append({'source': source, 'rating': rating, 'score': score})
+    Movie.objects.bulk_update([Movie(pk=pk, card=card) for pk, card in cards.items()], ['card'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0033_movie_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='card',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(fill_cards, migrations.RunPython.noop),
+    ]
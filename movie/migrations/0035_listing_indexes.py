@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0034_movie_card'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['Title', 'id'], name='movie_movie_Title_161bae_idx'),
+        ),
+        # The auto-created through table only has single column indexes on
+        # its foreign keys, this covers genre -> movies. Actor -> movies is
+        # covered by Casting's (actor, movie) index.
+        migrations.RunSQL(
+            'CREATE INDEX "movie_movie_Genre_genre_movie_idx" ON "movie_movie_Genre" ("genre_id", "movie_id")',
+            'DROP INDEX "movie_movie_Genre_genre_movie_idx"',
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def merge_castings(apps, schema_editor):
+    """
+    Movie.Actors and Actor.movies were two separate tables, written in
+    payload order for ingested titles. Their union goes to Casting, in the
+    order of Movie.Actors, links only Actor.movies had after them.
+    """
+    Movie = apps.get_model('movie', 'Movie')
+    Actor = apps.get_model('actor', 'Actor')
+    Casting = apps.get_model('movie', 'Casting')
+
+    casts = {}
+    for through in (Movie.Actors.through, Actor.movies.through):
+        for movie_id, actor_id in through.objects.order_by('id').values_list('movie_id', 'actor_id'):
+            cast = casts.setdefault(movie_id, {})
+            cast.setdefault(actor_id, len(cast))
+
+    Casting.objects.bulk_create(
+        [
+            Casting(movie_id=movie_id, actor_id=actor_id, billing=billing)
+            for movie_id, cast in casts.items()
+            for actor_id, billing in cast.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def split_castings(apps, schema_editor):
+    Movie = apps.get_model('movie', 'Movie')
+    Actor = apps.get_model('actor', 'Actor')
+    Casting = apps.get_model('movie', 'Casting')
+    pairs = list(Casting.objects.order_by('movie_id', 'billing', 'id').values_list('movie_id', 'actor_id'))
+    Movie.Actors.through.objects.bulk_create(
+        [Movie.Actors.through(movie_id=movie_id, actor_id=actor_id) for movie_id, actor_id in pairs], batch_size=1000,
+    )
+    Actor.movies.through.objects.bulk_create(
+        [Actor.movies.through(movie_id=movie_id, actor_id=actor_id) for movie_id, actor_id in pairs], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actor', '0008_alter_actor_id'),
+        ('movie', '0035_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Casting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billing', models.PositiveSmallIntegerField(default=0)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='castings', to='actor.actor')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='castings', to='movie.movie')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['movie', 'billing'], name='movie_casti_movie_i_f85225_idx'),
+                    models.Index(fields=['actor', 'movie'], name='movie_casti_actor_i_ae0d3b_idx'),
+                ],
+                'unique_together': {('movie', 'actor')},
+            },
+        ),
+        migrations.RunPython(merge_castings, split_castings),
+        migrations.RemoveField(
+            model_name='movie',
+            name='Actors',
+        ),
+    ]
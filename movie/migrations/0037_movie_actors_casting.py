@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actor', '0009_remove_actor_movies'),
+        ('movie', '0036_casting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='Actors',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='movie.Casting', to='actor.actor'),
+        ),
+    ]
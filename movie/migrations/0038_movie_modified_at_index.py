@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0037_movie_actors_casting'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movie',
+            name='modified_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
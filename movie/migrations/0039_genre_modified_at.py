@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0038_movie_modified_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
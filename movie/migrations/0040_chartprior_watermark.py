@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movie', '0039_genre_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chartprior',
+            name='watermark',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,18 +1,22 @@
 from django.db import models
+from django.db.models import F
 from actor.models import Actor
 
 from django.utils.text import slugify
-import requests
-from io import BytesIO
-from django.core import files
 from django.urls import reverse
+from django.templatetags.static import static
 
 from django.contrib.auth.models import User
+
+from movie.numeric import parse_score, shadow_values
+from django.utils import timezone
 # Create your models here.
 
 class Genre(models.Model):
 	title = models.CharField(max_length=25)
 	slug = models.SlugField(null=False, unique=True)
+	# Last change to the genre or its movies, the validator of the genre page
+	modified_at = models.DateTimeField(default=timezone.now)
 
 	def get_absolute_url(self):
 		return reverse('genres', args=[self.slug])
@@ -24,15 +28,30 @@ class Genre(models.Model):
 		if not self.slug:
 			self.title.replace(" ", "")
 			self.slug = slugify(self.title)
+		self.modified_at = timezone.now()
 		return super().save(*args, **kwargs)
 
+	@classmethod
+	def touch(cls, genres):
+		"""Mark `genres`, ids or a queryset, as changed"""
+		cls.objects.filter(pk__in=genres).update(modified_at=timezone.now())
+
 class Rating(models.Model):
 	source = models.CharField(max_length=50)
 	rating = models.CharField(max_length=10)
+	# `rating` on a 0-100 scale, whatever the source's own scale is
+	score = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+
+	class Meta:
+		unique_together = ['source', 'rating']
 
 	def __str__(self):
 		return self.source
 
+	def save(self, *args, **kwargs):
+		self.score = parse_score(self.rating)
+		return super().save(*args, **kwargs)
+
 class Movie(models.Model):
 	Title = models.CharField(max_length=200)
 	Year = models.CharField(max_length=25, blank=True)
@@ -42,18 +61,21 @@ class Movie(models.Model):
 	Genre = models.ManyToManyField(Genre, blank=True)
 	Director = models.CharField(max_length=100, blank=True)
 	Writer = models.CharField(max_length=300, blank=True)
-	Actors = models.ManyToManyField(Actor, blank=True)
+	# Cast in billing order, also Actor.movies
+	Actors = models.ManyToManyField(Actor, through='Casting', related_name='movies', blank=True)
 	Plot = models.CharField(max_length=900, blank=True)
 	Language = models.CharField(max_length=300, blank=True)
 	Country = models.CharField(max_length=100, blank=True)
 	Awards = models.CharField(max_length=250, blank=True)
 	Poster = models.ImageField(upload_to='movies', blank=True)
 	Poster_url = models.URLField(blank=True)
+	# SHA-256 of the stored poster, names its thumbnails (movie/posters.py)
+	Poster_hash = models.CharField(max_length=64, blank=True)
 	Ratings = models.ManyToManyField(Rating, blank=True)
 	Metascore = models.CharField(max_length=5, blank=True)
 	imdbRating = models.CharField(max_length=5, blank=True)
 	imdbVotes = models.CharField(max_length=100, blank=True)
-	imdbID = models.CharField(max_length=100, blank=True)
+	imdbID = models.CharField(max_length=100, unique=True)
 	Type = models.CharField(max_length=10, blank=True)
 	DVD = models.CharField(max_length=25, blank=True)
 	BoxOffice = models.CharField(max_length=25, blank=True)
@@ -61,20 +83,126 @@ class Movie(models.Model):
 	Website = models.CharField(max_length=150, blank=True)
 	totalSeasons = models.CharField(max_length=3, blank=True)
 
+	# Parsed copies of the string fields above for sorting and filtering in
+	# SQL, see movie/numeric.py. None where OMDb has no usable value.
+	Year_num = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+	Runtime_min = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+	imdbRating_num = models.FloatField(null=True, blank=True, db_index=True)
+	imdbVotes_num = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+	Metascore_num = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+	BoxOffice_num = models.BigIntegerField(null=True, blank=True, db_index=True)
+
+	# Review aggregates, kept up to date by Movie.count_review and rebuilt by
+	# the reconcile_review_stats command. rate_N counts the reviews rated N.
+	reviews_count = models.PositiveIntegerField(default=0)
+	reviews_sum = models.PositiveIntegerField(default=0)
+	rate_1 = models.PositiveIntegerField(default=0)
+	rate_2 = models.PositiveIntegerField(default=0)
+	rate_3 = models.PositiveIntegerField(default=0)
+	rate_4 = models.PositiveIntegerField(default=0)
+	rate_5 = models.PositiveIntegerField(default=0)
+	rate_6 = models.PositiveIntegerField(default=0)
+	rate_7 = models.PositiveIntegerField(default=0)
+	rate_8 = models.PositiveIntegerField(default=0)
+	rate_9 = models.PositiveIntegerField(default=0)
+	rate_10 = models.PositiveIntegerField(default=0)
+
+	# Part of the fragment cache keys of movie_details.html, bumped whenever
+	# the movie, its reviews, their likes or comments change (movie/signals.py)
+	cache_version = models.PositiveIntegerField(default=0)
+	# Time of the last bump, the Last-Modified of the pages showing the movie
+	modified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+	# Genres, top-billed actors and external ratings, kept in sync with the
+	# M2M tables so pages render the movie from its row (movie/cards.py)
+	card = models.JSONField(default=dict, blank=True)
+
+	class Meta:
+		indexes = [models.Index(fields=['Title', 'id'])]
+
 	def __str__(self):
 		return self.Title
 
-	def save(self, *args, **kwargs):
-		if self.Poster == '' and self.Poster_url !='':
-			resp = requests.get(self.Poster_url)
-			pb = BytesIO()
-			pb.write(resp.content)
-			pb.flush()
-			file_name = self.Poster_url.split("/")[-1]
-			self.Poster.save(file_name, files.File(pb), save=False)
+	@property
+	def reviews_avg(self):
+		if not self.reviews_count:
+			return None
+		return self.reviews_sum / self.reviews_count
+
+	@property
+	def rating_histogram(self):
+		"""(rate, count, percent of the reviews) from 10 down to 1"""
+		histogram = []
+		for rate in range(10, 0, -1):
+			count = getattr(self, 'rate_%d' % rate)
+			percent = round(count * 100 / self.reviews_count) if self.reviews_count else 0
+			histogram.append((rate, count, percent))
+		return histogram
+
+	@classmethod
+	def count_review(cls, movie_id, rate, delta=1):
+		"""Add (delta=1) or remove (delta=-1) a review rated `rate` from the aggregates"""
+		rate_field = 'rate_%d' % rate
+		cls.objects.filter(pk=movie_id).update(**{
+			'reviews_count': F('reviews_count') + delta,
+			'reviews_sum': F('reviews_sum') + delta * rate,
+			rate_field: F(rate_field) + delta,
+		})
 
+	@classmethod
+	def bump_cache_version(cls, movie_ids):
+		movie_ids = list(movie_ids)
+		cls.objects.filter(pk__in=movie_ids).update(cache_version=F('cache_version') + 1, modified_at=timezone.now())
+		# Their genre pages show them
+		Genre.touch(cls.Genre.through.objects.filter(movie_id__in=movie_ids).values('genre_id'))
+
+	def save(self, *args, **kwargs):
+		for name, value in shadow_values(self.__dict__).items():
+			setattr(self, name, value)
 		return super().save(*args, **kwargs)
 
+	@property
+	def has_remote_poster(self):
+		return bool(self.Poster_url) and self.Poster_url != 'N/A'
+
+	@property
+	def poster_src(self):
+		"""Local poster once the background download finished, the OMDb URL until then"""
+		if self.Poster:
+			return self.Poster.url
+		if self.has_remote_poster:
+			return self.Poster_url
+		return static('img/no_poster.jpg')
+
+
+class Casting(models.Model):
+	"""An actor in a movie, `billing` is their position in the credits, 0 for the top-billed"""
+	movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='castings')
+	actor = models.ForeignKey(Actor, on_delete=models.CASCADE, related_name='castings')
+	billing = models.PositiveSmallIntegerField(default=0)
+
+	class Meta:
+		unique_together = ['movie', 'actor']
+		indexes = [
+			# Cast of a movie in billing order, movies of an actor
+			models.Index(fields=['movie', 'billing']),
+			models.Index(fields=['actor', 'movie']),
+		]
+
+	def __str__(self):
+		return f"{self.actor_id} in {self.movie_id} (#{self.billing})"
+
+
+# ?sort= values of the genre and actor pages -> keyset sort key, all on
+# indexed columns and ending on the id, in one direction (movie/listings.py)
+MOVIE_SORTS = {
+	'added': ('-id',),
+	'rating': ('-imdbRating_num', '-id'),
+	'votes': ('-imdbVotes_num', '-id'),
+	'year': ('-Year_num', '-id'),
+	'title': ('Title', 'id'),
+}
+DEFAULT_MOVIE_SORT = 'added'
+
 
 RATE_CHOICES = [
 	(1, '1 - Trash'),
@@ -102,6 +230,12 @@ class Review(models.Model):
 
 	class Meta:
 		unique_together = ['user', 'movie']
+		# Sort keys of the review pages, see movie/reviews.py
+		indexes = [
+			models.Index(fields=['movie', 'date', 'id']),
+			models.Index(fields=['movie', 'likes', 'date', 'id']),
+			models.Index(fields=['movie', 'rate', 'date', 'id']),
+		]
 
 	def __str__(self):
 		return self.user.username
@@ -112,4 +246,66 @@ class Likes(models.Model):
 	review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='review_like')
 
 	class Meta:
-		unique_together = ['user', 'review', 'type_like']
\ No newline at end of file
+		unique_together = ['user', 'review', 'type_like']
+
+
+class ChartPrior(models.Model):
+	"""Mean rating of a chart (all movies, or one genre) at its last full refresh"""
+	genre = models.OneToOneField(Genre, on_delete=models.CASCADE, null=True, blank=True, related_name='chart_prior')
+	mean = models.FloatField()
+	votes = models.PositiveIntegerField()
+	refreshed_at = models.DateTimeField(auto_now=True)
+	# On the overall chart's row: movies modified since have not been rescored
+	watermark = models.DateTimeField(null=True, blank=True)
+
+	def __str__(self):
+		return f"{self.genre or 'All'}: {self.mean:.2f}"
+
+
+class MovieRank(models.Model):
+	"""
+	A movie's Bayesian weighted rating in the overall chart (genre None) and
+	in the chart of each of its genres, computed by movie/charts.py. Movies
+	with fewer than CHARTS_MIN_VOTES reviews have no score.
+	"""
+	movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='ranks')
+	genre = models.ForeignKey(Genre, on_delete=models.CASCADE, null=True, blank=True, related_name='ranks')
+	votes = models.PositiveIntegerField()
+	total = models.PositiveIntegerField()
+	score = models.FloatField(null=True, blank=True)
+
+	class Meta:
+		indexes = [models.Index(fields=['genre', 'score'])]
+
+	def __str__(self):
+		return f"{self.movie_id} in {self.genre or 'All'}: {self.score}"
+
+	@property
+	def mean(self):
+		return self.total / self.votes if self.votes else None
+
+
+JOB_STATUS_CHOICES = [
+	('pending', 'Pending'),
+	('running', 'Running'),
+	('failed', 'Failed'),
+]
+
+
+class Job(models.Model):
+	"""Background job, consumed by the run_jobs command when JOB_QUEUE_BACKEND is 'database'"""
+	kind = models.CharField(max_length=50)
+	payload = models.JSONField(default=dict)
+	dedupe_key = models.CharField(max_length=150, blank=True, db_index=True)
+	status = models.CharField(max_length=10, choices=JOB_STATUS_CHOICES, default='pending')
+	attempts = models.PositiveSmallIntegerField(default=0)
+	run_after = models.DateTimeField(default=timezone.now)
+	locked_until = models.DateTimeField(null=True, blank=True)
+	last_error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		indexes = [models.Index(fields=['status', 'run_after'])]
+
+	def __str__(self):
+		return f"{self.kind} #{self.pk} ({self.status})"
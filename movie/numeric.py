@@ -0,0 +1,77 @@
+"""
+Parsing of the numeric OMDb attributes, which OMDb sends as display
+strings ("7.5", "1,234,567", "$10,000,000", "142 min", "2010–2015").
+
+The parsed values are kept in indexed shadow columns next to the original
+strings (Movie.Year_num, Movie.imdbRating_num, ... and Rating.score), so
+pages can sort and filter on them in SQL. Anything unparseable, "N/A"
+included, becomes None.
+"""
+import re
+
+
+NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+
+def first_number(value):
+	if not isinstance(value, str):
+		return None
+	match = NUMBER.search(value)
+	if match is None:
+		return None
+	return float(match.group().replace(',', ''))
+
+
+def parse_int(value):
+	"""'1,234,567' -> 1234567, '$10,000,000' -> 10000000, '142 min' -> 142"""
+	number = first_number(value)
+	return int(number) if number is not None else None
+
+
+def parse_float(value):
+	"""'7.5' -> 7.5"""
+	return first_number(value)
+
+
+def parse_year(value):
+	"""'2010', '2010–2015' and '2010–' -> 2010"""
+	if not isinstance(value, str):
+		return None
+	match = re.search(r'\d{4}', value)
+	return int(match.group()) if match else None
+
+
+def parse_score(value):
+	"""A Ratings value on a 0-100 scale: '85%' -> 85, '7.5/10' -> 75, '75/100' -> 75"""
+	if not isinstance(value, str):
+		return None
+	match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(?:(%)|/\s*(\d+(?:\.\d+)?))?\s*', value)
+	if match is None:
+		return None
+	number, percent, scale = match.groups()
+	number = float(number)
+	if scale:
+		if not float(scale):
+			return None
+		number = number * 100 / float(scale)
+	return max(0, min(100, round(number)))
+
+
+# Movie string field -> (shadow field, parser)
+SHADOW_FIELDS = {
+	'Year': ('Year_num', parse_year),
+	'Runtime': ('Runtime_min', parse_int),
+	'imdbRating': ('imdbRating_num', parse_float),
+	'imdbVotes': ('imdbVotes_num', parse_int),
+	'Metascore': ('Metascore_num', parse_int),
+	'BoxOffice': ('BoxOffice_num', parse_int),
+}
+
+
+def shadow_values(fields):
+	"""Shadow column values for a dict of the Movie string fields"""
+	values = {}
+	for name, (shadow, parse) in SHADOW_FIELDS.items():
+		if name in fields:
+			values[shadow] = parse(fields[name])
+	return values
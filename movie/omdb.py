@@ -0,0 +1,246 @@
+"""
+OMDb API client shared by the movie views.
+
+Keeps a pooled keep-alive session per process, bounds every call with
+connect/read timeouts, retries transient failures with jittered exponential
+backoff and trips a circuit breaker when the upstream keeps failing or
+answering slowly, so callers can fall back to local data instead of tying
+up a worker. Successful answers go through the shared on-disk cache in
+movie/omdb_cache.py.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core import checks
+
+from movie import omdb_cache
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# OMDb answers these for lookups that simply have no result, they are safe
+# to cache for a short while.
+NOT_FOUND_ERRORS = {'Movie not found!', 'Incorrect IMDb ID.', 'Series or episode not found!'}
+
+
+class OMDbError(Exception):
+	"""Raised when OMDb returns something we cannot use"""
+
+
+class OMDbUnavailable(OMDbError):
+	"""Raised when OMDb is down, slow or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+	"""Consecutive-failure breaker with a half-open trial after the cooldown"""
+
+	def __init__(self, threshold, cooldown):
+		self.threshold = threshold
+		self.cooldown = cooldown
+		self.failures = 0
+		self.opened_at = None
+		self.trial_in_flight = False
+		self.lock = threading.Lock()
+
+	@property
+	def state(self):
+		if self.opened_at is None:
+			return 'closed'
+		if time.monotonic() - self.opened_at >= self.cooldown:
+			return 'half-open'
+		return 'open'
+
+	def allow(self):
+		with self.lock:
+			state = self.state
+			if state == 'closed':
+				return True
+			if state == 'half-open' and not self.trial_in_flight:
+				self.trial_in_flight = True
+				return True
+			return False
+
+	def record_success(self):
+		with self.lock:
+			self.failures = 0
+			self.opened_at = None
+			self.trial_in_flight = False
+
+	def record_failure(self):
+		with self.lock:
+			self.failures += 1
+			self.trial_in_flight = False
+			if self.opened_at is not None or self.failures >= self.threshold:
+				self.opened_at = time.monotonic()
+
+
+class OMDbClient:
+	def __init__(self, api_key=None, base_url=None):
+		self.api_key = api_key or settings.OMDB_API_KEY
+		self.base_url = base_url or settings.OMDB_API_URL
+		self.timeout = (settings.OMDB_CONNECT_TIMEOUT, settings.OMDB_READ_TIMEOUT)
+		self.max_retries = settings.OMDB_MAX_RETRIES
+		self.backoff_base = settings.OMDB_BACKOFF_BASE
+		self.backoff_max = settings.OMDB_BACKOFF_MAX
+		self.slow_call = settings.OMDB_SLOW_CALL_SECONDS
+		self.breaker = CircuitBreaker(settings.OMDB_BREAKER_THRESHOLD, settings.OMDB_BREAKER_COOLDOWN)
+		self._session = None
+		self._session_pid = None
+		self._session_lock = threading.Lock()
+
+	@property
+	def session(self):
+		# Sessions are created lazily and per process so forked workers never
+		# share keep-alive sockets with their parent.
+		pid = os.getpid()
+		if self._session is None or self._session_pid != pid:
+			with self._session_lock:
+				if self._session is None or self._session_pid != pid:
+					session = requests.Session()
+					adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.OMDB_POOL_MAXSIZE)
+					session.mount('http://', adapter)
+					session.mount('https://', adapter)
+					self._session = session
+					self._session_pid = pid
+		return self._session
+
+	def search(self, query, page=1):
+		"""Search titles, returns the raw OMDb payload"""
+		kind = 'search' if int(page) == 1 else 'page'
+		key = omdb_cache.search_key(query, page)
+		return self.cached(kind, key, {'s': omdb_cache.normalize_query(query), 'page': page})
+
+	def title(self, imdb_id):
+		"""Fetch the full record of a single title"""
+		return self.cached('title', omdb_cache.title_key(imdb_id), {'i': imdb_id})
+
+	def cached(self, kind, key, params):
+		cache = omdb_cache.get_cache()
+		if cache is None:
+			return self.get(params)
+
+		try:
+			payload, state = cache.get(key)
+			claimed = state == omdb_cache.STALE and cache.claim_refresh(key)
+		except omdb_cache.CACHE_ERRORS as e:
+			# The cache is only an optimisation, answer as if it were disabled
+			logger.warning('OMDb cache lookup failed, calling OMDb uncached: %s', e)
+			return self.get(params)
+
+		if state == omdb_cache.FRESH:
+			cache.incr(kind, 'hits')
+			return payload
+		if state == omdb_cache.STALE:
+			cache.incr(kind, 'stale_hits')
+			if claimed:
+				cache.incr(kind, 'refreshes')
+				threading.Thread(target=self.refresh, args=(cache, kind, key, params), daemon=True).start()
+			return payload
+
+		cache.incr(kind, 'misses')
+		try:
+			fresh = self.get(params)
+		except OMDbError:
+			if payload is None:
+				raise
+			# Long expired, but still better than nothing while OMDb is down.
+			cache.incr(kind, 'expired_hits')
+			return payload
+		self.store(cache, kind, key, fresh)
+		return fresh
+
+	def refresh(self, cache, kind, key, params):
+		try:
+			self.store(cache, kind, key, self.get(params))
+		except OMDbError:
+			pass  # the lease expires on its own and another request retries
+
+	def store(self, cache, kind, key, payload):
+		try:
+			if payload.get('Response') == 'True':
+				cache.set(key, kind, payload)
+			elif payload.get('Error') in NOT_FOUND_ERRORS:
+				cache.set(key, 'negative', payload)
+		except omdb_cache.CACHE_ERRORS as e:
+			logger.warning('OMDb cache write failed: %s', e)
+
+	def get(self, params):
+		if not self.api_key:
+			raise OMDbError('OMDB_API_KEY is not set')
+		if not self.breaker.allow():
+			raise OMDbUnavailable('OMDb circuit breaker is open')
+
+		params = dict(params, apikey=self.api_key)
+		attempt = 0
+		while True:
+			started = time.monotonic()
+			try:
+				response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+				if response.status_code in RETRY_STATUSES:
+					raise OMDbUnavailable('OMDb answered %s' % response.status_code)
+				response.raise_for_status()
+				payload = response.json()
+			except (requests.ConnectionError, requests.Timeout, OMDbUnavailable) as e:
+				if attempt >= self.max_retries:
+					self.breaker.record_failure()
+					raise OMDbUnavailable(str(e)) from e
+				attempt += 1
+				self.sleep_backoff(attempt)
+				continue
+			except (requests.RequestException, ValueError) as e:
+				self.breaker.record_failure()
+				raise OMDbError(str(e)) from e
+
+			# A slow answer is still served, but counts against the breaker so
+			# a degraded upstream stops being called.
+			if time.monotonic() - started > self.slow_call:
+				self.breaker.record_failure()
+			else:
+				self.breaker.record_success()
+			return payload
+
+	def sleep_backoff(self, attempt):
+		"""Full-jitter exponential backoff"""
+		ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+		time.sleep(random.uniform(0, ceiling))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+	"""Process-wide client, so every view shares one pool and breaker"""
+	global _client
+	if _client is None:
+		with _client_lock:
+			if _client is None:
+				_client = OMDbClient()
+	return _client
+
+
+@checks.register()
+def check_api_key(app_configs, **kwargs):
+	if settings.OMDB_API_KEY:
+		return []
+	return [checks.Warning(
+		'OMDB_API_KEY is not set, every OMDb call will fail.',
+		hint='Set the OMDB_API_KEY environment variable to your OMDb API key.',
+		id='movie.W001',
+	)]
+
+
+def search(query, page=1):
+	return get_client().search(query, page)
+
+
+def get_title(imdb_id):
+	return get_client().title(imdb_id)
@@ -0,0 +1,222 @@
+"""
+On-disk OMDb response cache shared by every worker process.
+
+Entries live in a small SQLite file next to the project. Each kind of
+lookup (search, page, title) has its own TTL; once an entry is past its
+TTL it is still served for a grace window while exactly one worker refreshes
+it in the background (stale-while-revalidate). The least recently used
+entries are evicted once the cache grows past OMDB_CACHE_MAX_ENTRIES.
+A cache file that cannot be opened or written (a read-only checkout, a
+locked database) is skipped and OMDb is called uncached.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+EXPIRED = 'expired'
+
+# Only refresh the LRU timestamp when it is older than this, so cache hits
+# do not turn into a write on every request.
+TOUCH_INTERVAL = 60
+STATS_FLUSH_INTERVAL = 10
+REFRESH_LEASE = 30
+EVICT_EVERY = 100
+
+# What a missing, read-only or locked cache file raises
+CACHE_ERRORS = (sqlite3.Error, OSError)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+	key TEXT PRIMARY KEY,
+	kind TEXT NOT NULL,
+	payload TEXT NOT NULL,
+	stored_at REAL NOT NULL,
+	expires_at REAL NOT NULL,
+	accessed_at REAL NOT NULL,
+	refreshing_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+	kind TEXT NOT NULL,
+	name TEXT NOT NULL,
+	value INTEGER NOT NULL DEFAULT 0,
+	PRIMARY KEY (kind, name)
+);
+"""
+
+
+def normalize_query(query):
+	return ' '.join(query.lower().split())
+
+
+def search_key(query, page=1):
+	return 'search:%s:%s' % (normalize_query(query), page)
+
+
+def title_key(imdb_id):
+	return 'title:%s' % imdb_id.strip().lower()
+
+
+class ResponseCache:
+	def __init__(self, path, ttls, stale_window, max_entries):
+		self.path = str(path)
+		self.ttls = ttls
+		self.stale_window = stale_window
+		self.max_entries = max_entries
+		self.local = threading.local()
+		self.stats_lock = threading.Lock()
+		self.pending_stats = {}
+		self.stats_flushed_at = time.monotonic()
+		self.sets = 0
+
+	def connect(self):
+		pid = os.getpid()
+		conn = getattr(self.local, 'conn', None)
+		if conn is None or self.local.pid != pid:
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+			conn.execute('PRAGMA journal_mode=WAL')
+			conn.execute('PRAGMA synchronous=NORMAL')
+			conn.executescript(SCHEMA)
+			self.local.conn = conn
+			self.local.pid = pid
+		return conn
+
+	def get(self, key):
+		"""Returns (payload, state) or (None, None) on a miss"""
+		conn = self.connect()
+		row = conn.execute(
+			'SELECT payload, expires_at, accessed_at FROM entries WHERE key = ?', (key,)
+		).fetchone()
+		if row is None:
+			return None, None
+
+		payload, expires_at, accessed_at = row
+		now = time.time()
+		if now - accessed_at > TOUCH_INTERVAL:
+			conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+
+		if now < expires_at:
+			state = FRESH
+		elif now < expires_at + self.stale_window:
+			state = STALE
+		else:
+			state = EXPIRED
+		return json.loads(payload), state
+
+	def set(self, key, kind, payload):
+		now = time.time()
+		ttl = self.ttls.get(kind, self.ttls['search'])
+		self.connect().execute(
+			'INSERT OR REPLACE INTO entries (key, kind, payload, stored_at, expires_at, accessed_at, refreshing_until) '
+			'VALUES (?, ?, ?, ?, ?, ?, 0)',
+			(key, kind, json.dumps(payload), now, now + ttl, now),
+		)
+		self.sets += 1
+		if self.sets % EVICT_EVERY == 0:
+			self.evict()
+
+	def claim_refresh(self, key):
+		"""Take the refresh lease for a stale key, only one caller across all workers wins"""
+		now = time.time()
+		cursor = self.connect().execute(
+			'UPDATE entries SET refreshing_until = ? WHERE key = ? AND refreshing_until < ?',
+			(now + REFRESH_LEASE, key, now),
+		)
+		return cursor.rowcount == 1
+
+	def evict(self):
+		conn = self.connect()
+		count = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+		overflow = count - self.max_entries
+		if overflow > 0:
+			conn.execute(
+				'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)',
+				(overflow,),
+			)
+		return max(overflow, 0)
+
+	def clear(self):
+		conn = self.connect()
+		conn.execute('DELETE FROM entries')
+		conn.execute('DELETE FROM stats')
+
+	def incr(self, kind, name, amount=1):
+		"""Count a hit/miss, buffered in-process and flushed every few seconds and at exit"""
+		with self.stats_lock:
+			self.pending_stats[(kind, name)] = self.pending_stats.get((kind, name), 0) + amount
+			if time.monotonic() - self.stats_flushed_at < STATS_FLUSH_INTERVAL:
+				return
+			pending = self.pending_stats
+			self.pending_stats = {}
+			self.stats_flushed_at = time.monotonic()
+		self.flush_stats(pending)
+
+	def flush_stats(self, pending=None):
+		if pending is None:
+			with self.stats_lock:
+				pending = self.pending_stats
+				self.pending_stats = {}
+		if not pending:
+			return
+		try:
+			conn = self.connect()
+			for (kind, name), amount in pending.items():
+				conn.execute(
+					'INSERT INTO stats (kind, name, value) VALUES (?, ?, ?) '
+					'ON CONFLICT (kind, name) DO UPDATE SET value = value + excluded.value',
+					(kind, name, amount),
+				)
+		except CACHE_ERRORS as e:
+			logger.warning('Dropped OMDb cache counters: %s', e)
+
+	def stats(self):
+		self.flush_stats()
+		conn = self.connect()
+		counters = {}
+		for kind, name, value in conn.execute('SELECT kind, name, value FROM stats ORDER BY kind, name'):
+			counters.setdefault(kind, {})[name] = value
+		entries = dict(conn.execute('SELECT kind, COUNT(*) FROM entries GROUP BY kind').fetchall())
+		return {'counters': counters, 'entries': entries}
+
+
+_cache = None
+_cache_unavailable = False
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+	"""Process-wide cache, or None when OMDB_CACHE_PATH is unset or cannot be opened"""
+	global _cache, _cache_unavailable
+	if not settings.OMDB_CACHE_PATH or _cache_unavailable:
+		return None
+	if _cache is None:
+		with _cache_lock:
+			if _cache is None and not _cache_unavailable:
+				cache = ResponseCache(
+					settings.OMDB_CACHE_PATH,
+					settings.OMDB_CACHE_TTLS,
+					settings.OMDB_CACHE_STALE_WINDOW,
+					settings.OMDB_CACHE_MAX_ENTRIES,
+				)
+				try:
+					cache.connect()
+				except CACHE_ERRORS as e:
+					logger.warning('OMDb cache disabled, %s cannot be opened: %s', cache.path, e)
+					_cache_unavailable = True
+					return None
+				# Counters still buffered when the worker exits
+				atexit.register(cache.flush_stats)
+				_cache = cache
+	return _cache
@@ -0,0 +1,139 @@
+"""
+Poster downloads, run as background jobs instead of inside Movie.save().
+
+The image is streamed to a temporary file in chunks and handed to the
+storage from there, so a download never holds the whole body in memory.
+Until the file exists, Movie.poster_src points templates at the OMDb URL.
+
+Originals are stored under the SHA-256 of their content, so identical
+posters are kept once, and fixed-width WebP and JPEG thumbnails
+(POSTER_WIDTHS) are derived from them for the grid pages, see
+movie/templatetags/poster_tags.py.
+"""
+import hashlib
+import os
+import tempfile
+
+import requests
+from PIL import Image
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from movie.models import Movie
+from movie import jobs
+
+
+CHUNK_SIZE = 64 * 1024
+
+VARIANT_FORMATS = {
+	'webp': ('WEBP', {'quality': 80, 'method': 4}),
+	'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_session = requests.Session()
+
+
+class PosterTooLarge(Exception):
+	pass
+
+
+def schedule_download(movie):
+	if not movie.Poster and movie.has_remote_poster:
+		jobs.enqueue('download_poster', dedupe_key='poster:%s' % movie.pk, movie_id=movie.pk)
+
+
+def schedule_downloads(movies):
+	for movie in movies:
+		schedule_download(movie)
+
+
+def original_name(content_hash, extension):
+	return 'movies/%s.%s' % (content_hash, extension)
+
+
+def variant_name(content_hash, width, extension):
+	return 'movies/derived/%s-%s.%s' % (content_hash, width, extension)
+
+
+def variant_url(content_hash, width, extension):
+	return default_storage.url(variant_name(content_hash, width, extension))
+
+
+def store_original(fp):
+	"""
+	Store a poster under its content hash and derive its thumbnails.
+	`fp` is a binary file positioned at the start. Returns (name, hash).
+	"""
+	digest = hashlib.sha256()
+	for chunk in iter(lambda: fp.read(CHUNK_SIZE), b''):
+		digest.update(chunk)
+	content_hash = digest.hexdigest()
+	fp.seek(0)
+
+	with Image.open(fp) as image:
+		extension = 'png' if image.format == 'PNG' else 'jpg'
+		name = original_name(content_hash, extension)
+		if not default_storage.exists(name):
+			fp.seek(0)
+			default_storage.save(name, File(fp, name=os.path.basename(name)))
+		build_variants(image, content_hash)
+	return name, content_hash
+
+
+def build_variants(image, content_hash):
+	"""Write the missing thumbnails of a poster, never upscaling it"""
+	image = image.convert('RGB')
+	for width in settings.POSTER_WIDTHS:
+		resized = None
+		for extension, (image_format, options) in VARIANT_FORMATS.items():
+			name = variant_name(content_hash, width, extension)
+			if default_storage.exists(name):
+				continue
+			if resized is None:
+				resized = image.copy()
+				resized.thumbnail((width, width * 3), Image.LANCZOS)
+			with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as out:
+				resized.save(out, image_format, **options)
+				out.seek(0)
+				default_storage.save(name, ContentFile(out.read()))
+
+
+@jobs.handler('download_poster')
+def download_poster(movie_id):
+	movie = Movie.objects.filter(pk=movie_id).first()
+	if movie is None or movie.Poster or not movie.has_remote_poster:
+		return
+
+	with tempfile.TemporaryFile() as tmp:
+		with _session.get(movie.Poster_url, stream=True, timeout=(3.05, 10)) as response:
+			response.raise_for_status()
+			size = 0
+			for chunk in response.iter_content(CHUNK_SIZE):
+				size += len(chunk)
+				if size > settings.POSTER_MAX_BYTES:
+					raise PosterTooLarge('%s is over %s bytes' % (movie.Poster_url, settings.POSTER_MAX_BYTES))
+				tmp.write(chunk)
+		tmp.seek(0)
+		name, content_hash = store_original(tmp)
+
+	# Only fill an empty poster, another download may have won the race.
+	# The file itself is shared by content, so it is never deleted here.
+	if Movie.objects.filter(pk=movie_id, Poster='').update(Poster=name, Poster_hash=content_hash):
+		Movie.bump_cache_version([movie_id])
+
+
+@jobs.handler('build_poster_variants')
+def rebuild_poster(movie_id):
+	"""Move an existing local poster to its content-hash name and derive its thumbnails"""
+	movie = Movie.objects.filter(pk=movie_id).first()
+	if movie is None or not movie.Poster:
+		return
+	old_name = movie.Poster.name
+	with default_storage.open(old_name, 'rb') as fp:
+		name, content_hash = store_original(fp)
+	Movie.objects.filter(pk=movie_id).update(Poster=name, Poster_hash=content_hash)
+	Movie.bump_cache_version([movie_id])
+	if old_name != name and not Movie.objects.filter(Poster=old_name).exists():
+		default_storage.delete(old_name)
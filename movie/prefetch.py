@@ -0,0 +1,114 @@
+"""
+Background prefetch of the titles shown on a search results page.
+
+Most visitors click one of the nine results, so once the page is sent
+their detail records are fetched from OMDb and ingested in the background
+while it is being read, and the click lands on a local row. Prefetches go through the same
+single-flight as movieDetails (movie/ingest.py), so a click that races a
+prefetch waits for it instead of fetching the title again.
+
+Work runs on a small per-process thread pool. At most
+SEARCH_PREFETCH_MAX_PENDING titles are queued or running per process,
+anything beyond that is dropped, prefetching is only an optimisation.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from movie import omdb
+from movie.ingest import fetch_and_ingest
+from movie.models import Movie
+
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+
+	def __init__(self, workers, max_pending):
+		self.workers = workers
+		self.max_pending = max_pending
+		self.executor = None
+		self.executor_pid = None
+		self.pending = set()
+		self.lock = threading.Lock()
+
+	def get_executor(self):
+		# Threads do not survive a fork, a forked worker needs its own pool
+		pid = os.getpid()
+		if self.executor is None or self.executor_pid != pid:
+			self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+			self.executor_pid = pid
+			self.pending = set()
+		return self.executor
+
+	def schedule(self, imdb_ids):
+		"""
+		Queue the titles, returns how many were queued. Titles already in the
+		catalog are skipped by the workers, not here.
+		"""
+		imdb_ids = list(dict.fromkeys(imdb_id for imdb_id in imdb_ids if imdb_id))
+		if not imdb_ids:
+			return 0
+
+		queued = 0
+		with self.lock:
+			executor = self.get_executor()
+			for imdb_id in imdb_ids:
+				if imdb_id in self.pending:
+					continue
+				if len(self.pending) >= self.max_pending:
+					break
+				self.pending.add(imdb_id)
+				executor.submit(self.fetch, imdb_id)
+				queued += 1
+		return queued
+
+	def fetch(self, imdb_id):
+		try:
+			if not Movie.objects.filter(imdbID=imdb_id).exists():
+				fetch_and_ingest(imdb_id)
+		except omdb.OMDbError as e:
+			logger.info('Prefetch of %s skipped: %s', imdb_id, e)
+		except Exception:
+			logger.exception('Prefetch of %s failed', imdb_id)
+		finally:
+			with self.lock:
+				self.pending.discard(imdb_id)
+			close_old_connections()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+	global _prefetcher
+	if _prefetcher is None:
+		with _prefetcher_lock:
+			if _prefetcher is None:
+				_prefetcher = Prefetcher(settings.SEARCH_PREFETCH_WORKERS, settings.SEARCH_PREFETCH_MAX_PENDING)
+	return _prefetcher
+
+
+def prefetch_results(movie_data):
+	"""Queue the titles of an OMDb search payload, local results are already in the catalog"""
+	if not settings.SEARCH_PREFETCH or movie_data.get('local'):
+		return 0
+	return get_prefetcher().schedule(result.get('imdbID') for result in movie_data.get('Search', []))
+
+
+def prefetch_after(response, movie_data):
+	"""Prefetch the titles of `movie_data` once `response` has been sent"""
+	close = response.close
+
+	def close_and_prefetch():
+		close()
+		prefetch_results(movie_data)
+
+	response.close = close_and_prefetch
+	return response
@@ -0,0 +1,85 @@
+"""
+Keyset pagination of the reviews of a movie and the comments of a review.
+
+Pages are cut with a WHERE on the sort key of the last row shown instead
+of an OFFSET, so page 100 costs the same as page 1 and rows written in the
+meantime never shift a page. The cursor handed to the client is that sort
+key, JSON encoded in URL-safe base64. Every sort ends on the primary key
+so keys are unique.
+"""
+from django.db.models import Prefetch, Q
+from django.utils.dateparse import parse_datetime
+
+from movie.cursors import InvalidCursor, Page, encode_cursor, decode_cursor
+from movie.models import Review
+from comment.models import Comment
+
+
+PAGE_SIZE = 10
+COMMENT_PAGE_SIZE = 10
+PREVIEW_COMMENTS = 2
+
+# ?sort= of the reviews endpoint -> descending sort key
+REVIEW_SORTS = {
+	'newest': ('date', 'id'),
+	'liked': ('likes', 'date', 'id'),
+	'rated': ('rate', 'date', 'id'),
+}
+DEFAULT_SORT = 'newest'
+
+# Oldest first, like a conversation
+COMMENT_ORDER = ('date', 'id')
+
+def parse_value(field, value):
+	"""A value of a review or comment cursor, dates as ISO strings and the rest integers"""
+	if field == 'date':
+		value = parse_datetime(value) if isinstance(value, str) else None
+		if value is None:
+			raise ValueError(value)
+	elif not isinstance(value, int) or isinstance(value, bool):
+		raise ValueError(value)
+	return value
+
+
+def after(fields, values, descending):
+	"""Q for the rows after `values` in the order of `fields`"""
+	lookup = 'lt' if descending else 'gt'
+	condition = Q()
+	for i, field in enumerate(fields):
+		equal = {name: value for name, value in zip(fields[:i], values[:i])}
+		condition |= Q(**equal, **{'%s__%s' % (field, lookup): values[i]})
+	return condition
+
+
+def paginate(queryset, fields, cursor, limit, descending):
+	if cursor:
+		queryset = queryset.filter(after(fields, decode_cursor(cursor, fields, parse_value), descending))
+	ordering = ['-%s' % field if descending else field for field in fields]
+	items = list(queryset.order_by(*ordering)[:limit + 1])
+	next_cursor = encode_cursor(items[limit - 1], fields) if len(items) > limit else None
+	return Page(items[:limit], next_cursor)
+
+
+def review_page(movie, sort=DEFAULT_SORT, cursor=None, limit=PAGE_SIZE):
+	"""
+	A page of reviews with their authors and first comments. Each review
+	gets `preview_comments` and `comments_cursor`, where the comments
+	endpoint carries on. Raises InvalidCursor for a tampered cursor.
+	"""
+	fields = REVIEW_SORTS.get(sort, REVIEW_SORTS[DEFAULT_SORT])
+	previews = Comment.objects.select_related('user').order_by(*COMMENT_ORDER)[:PREVIEW_COMMENTS]
+	reviews = Review.objects.filter(movie=movie).select_related('user', 'user__profile').prefetch_related(
+		Prefetch('comments', queryset=previews, to_attr='preview_comments'),
+	)
+	page = paginate(reviews, fields, cursor, limit, descending=True)
+	for review in page.items:
+		if review.preview_comments and review.comment_count > len(review.preview_comments):
+			review.comments_cursor = encode_cursor(review.preview_comments[-1], COMMENT_ORDER)
+		else:
+			review.comments_cursor = None
+	return page
+
+
+def comment_page(review, cursor=None, limit=COMMENT_PAGE_SIZE):
+	comments = Comment.objects.filter(review=review).select_related('user')
+	return paginate(comments, COMMENT_ORDER, cursor, limit, descending=False)
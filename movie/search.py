@@ -0,0 +1,126 @@
+"""
+Local full-text search over the Movie catalog.
+
+On SQLite the catalog is mirrored into an FTS5 table (created by migration
+0023) holding the title, plot, director, writer, actor and genre names of
+every movie, ranked with BM25. Other database backends fall back to a plain
+icontains lookup on the title and actor names.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from movie.models import Movie
+
+
+INDEX_TABLE = 'movie_search'
+
+# BM25 weights, in the column order of the FTS table:
+# title, plot, director, writer, actors, genres
+WEIGHTS = (10.0, 1.0, 3.0, 2.0, 4.0, 2.0)
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+
+def is_supported():
+	return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+	"""Turn free text into an FTS5 query, every word a quoted prefix term"""
+	words = re.findall(r'\w+', query.lower())
+	return ' '.join('"%s"*' % word for word in words)
+
+
+def highlight(snippet):
+	"""Escape an FTS snippet and turn its match markers into <mark> tags"""
+	html = escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+	return mark_safe(html)
+
+
+def document(movie):
+	return (
+		movie.pk,
+		movie.Title,
+		movie.Plot,
+		movie.Director,
+		movie.Writer,
+		', '.join(actor.name for actor in movie.Actors.all()),
+		', '.join(genre.title for genre in movie.Genre.all()),
+	)
+
+
+def index_movies(movie_ids):
+	"""(Re)index the given movies, movies that no longer exist are dropped"""
+	if not is_supported() or not movie_ids:
+		return
+	movie_ids = list(movie_ids)
+	movies = Movie.objects.filter(pk__in=movie_ids).prefetch_related('Actors', 'Genre')
+	rows = [document(movie) for movie in movies]
+	with connection.cursor() as cursor:
+		cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % INDEX_TABLE, [(pk,) for pk in movie_ids])
+		cursor.executemany(
+			'INSERT INTO %s (rowid, title, plot, director, writer, actors, genres) '
+			'VALUES (%%s, %%s, %%s, %%s, %%s, %%s, %%s)' % INDEX_TABLE,
+			rows,
+		)
+
+
+def remove_movies(movie_ids):
+	if not is_supported() or not movie_ids:
+		return
+	with connection.cursor() as cursor:
+		cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % INDEX_TABLE, [(pk,) for pk in movie_ids])
+
+
+def rebuild(batch_size=500):
+	"""Reindex the whole catalog, returns the number of indexed movies"""
+	if not is_supported():
+		return 0
+	with connection.cursor() as cursor:
+		cursor.execute('DELETE FROM %s' % INDEX_TABLE)
+	ids = list(Movie.objects.order_by('pk').values_list('pk', flat=True))
+	for start in range(0, len(ids), batch_size):
+		index_movies(ids[start:start + batch_size])
+	return len(ids)
+
+
+def search(query, limit=9, offset=0):
+	"""
+	Returns (results, total) where results is a list of (movie, snippet)
+	pairs, best match first.
+	"""
+	if not is_supported():
+		return fallback_search(query, limit, offset)
+
+	match = build_match(query)
+	if not match:
+		return [], 0
+
+	with connection.cursor() as cursor:
+		cursor.execute('SELECT COUNT(*) FROM %s WHERE %s MATCH %%s' % (INDEX_TABLE, INDEX_TABLE), [match])
+		total = cursor.fetchone()[0]
+		if not total:
+			return [], 0
+		cursor.execute(
+			'SELECT rowid, snippet(%s, -1, %%s, %%s, %%s, 12) FROM %s WHERE %s MATCH %%s '
+			'ORDER BY bm25(%s, %s) LIMIT %%s OFFSET %%s' % (
+				INDEX_TABLE, INDEX_TABLE, INDEX_TABLE, INDEX_TABLE, ', '.join(str(w) for w in WEIGHTS),
+			),
+			[HIGHLIGHT_START, HIGHLIGHT_END, '…', match, limit, offset],
+		)
+		hits = cursor.fetchall()
+
+	movies = Movie.objects.in_bulk([pk for pk, snippet in hits])
+	results = [(movies[pk], highlight(snippet)) for pk, snippet in hits if pk in movies]
+	return results, total
+
+
+def fallback_search(query, limit, offset):
+	movies = Movie.objects.filter(Q(Title__icontains=query) | Q(Actors__name__icontains=query)).distinct().order_by('Title')
+	total = movies.count()
+	return [(movie, '') for movie in movies[offset:offset + limit]], total
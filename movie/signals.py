@@ -0,0 +1,163 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+
+from actor.models import Actor
+from movie.models import Movie, Genre, Rating, Casting, Review, Likes
+from movie import autocomplete, cards, facets, search, spelling, posters
+from comment.models import Comment
+
+
+def index_saved_movie(sender, instance, **kwargs):
+	search.index_movies([instance.pk])
+	facets.mark_stale()
+	Movie.bump_cache_version([instance.pk])
+
+
+def schedule_poster_download(sender, instance, **kwargs):
+	posters.schedule_download(instance)
+
+
+def unindex_deleted_movie(sender, instance, **kwargs):
+	search.remove_movies([instance.pk])
+	facets.mark_stale()
+
+
+def index_movie_relations(sender, instance, action, reverse, pk_set, **kwargs):
+	"""Keep actor and genre names of the search index in sync with the M2M tables"""
+	if action not in ('post_add', 'post_remove', 'post_clear'):
+		return
+	facets.mark_stale()
+	if not reverse:
+		search.index_movies([instance.pk])
+		Movie.bump_cache_version([instance.pk])
+	elif pk_set:
+		search.index_movies(pk_set)
+		Movie.bump_cache_version(pk_set)
+	elif action == 'post_clear':
+		# A reverse clear does not tell which movies were touched
+		search.rebuild()
+
+
+def touch_linked_genres(sender, instance, action, reverse, pk_set, **kwargs):
+	"""Genres gaining or losing movies, bump_cache_version() only reaches the genres a movie is left in"""
+	if action == 'pre_clear' and not reverse:
+		# A clear does not tell which genres it touches, note them first
+		instance._cleared_genre_ids = list(instance.Genre.values_list('pk', flat=True))
+	if action not in ('post_add', 'post_remove', 'post_clear'):
+		return
+	if reverse:
+		Genre.touch([instance.pk])
+	elif action == 'post_clear':
+		Genre.touch(getattr(instance, '_cleared_genre_ids', []))
+	else:
+		Genre.touch(pk_set)
+
+
+def touch_deleted_movie_genres(sender, instance, **kwargs):
+	# The links are gone by post_delete
+	Genre.touch(instance.Genre.values('pk'))
+
+
+def sync_casting(sender, instance, **kwargs):
+	"""Castings saved or deleted on their own rather than through Movie.Actors"""
+	search.index_movies([instance.movie_id])
+	cards.refresh_cards([instance.movie_id])
+	Movie.bump_cache_version([instance.movie_id])
+
+
+def invalidate_movie_ratings(sender, instance, action, reverse, pk_set, **kwargs):
+	if action not in ('post_add', 'post_remove', 'post_clear'):
+		return
+	if not reverse:
+		Movie.bump_cache_version([instance.pk])
+	elif pk_set:
+		Movie.bump_cache_version(pk_set)
+
+
+def refresh_movie_cards(sender, instance, action, reverse, pk_set, **kwargs):
+	"""Keep Movie.card in sync with the genre, actor and rating links"""
+	if action == 'pre_clear' and reverse:
+		# A reverse clear does not tell which movies it touches, note them first
+		instance._card_movie_ids = cards.linked_movie_ids(instance)
+	if action not in ('post_add', 'post_remove', 'post_clear'):
+		return
+	if not reverse:
+		cards.refresh_cards([instance.pk])
+	elif action == 'post_clear':
+		cards.refresh_cards(getattr(instance, '_card_movie_ids', []))
+	elif pk_set:
+		cards.refresh_cards(pk_set)
+
+
+def refresh_renamed_cards(sender, instance, created, **kwargs):
+	"""Genre, actor and rating names are copied onto the cards of their movies"""
+	if not created:
+		movie_ids = cards.linked_movie_ids(instance)
+		cards.refresh_cards(movie_ids)
+		Movie.bump_cache_version(movie_ids)
+
+
+def note_card_movies(sender, instance, **kwargs):
+	# The links are gone by post_delete
+	instance._card_movie_ids = cards.linked_movie_ids(instance)
+
+
+def refresh_deleted_cards(sender, instance, **kwargs):
+	movie_ids = getattr(instance, '_card_movie_ids', [])
+	cards.refresh_cards(movie_ids)
+	Movie.bump_cache_version(movie_ids)
+
+
+def update_suggestions(sender, instance, **kwargs):
+	"""Apply saved movies and actors to this process's autocomplete and spelling indexes, other processes read them back"""
+	for index in (autocomplete.live, spelling.live):
+		if sender is Movie:
+			index.movie_saved(instance)
+		else:
+			index.actor_saved(instance)
+
+
+def drop_suggestions(sender, instance, **kwargs):
+	for index in (autocomplete.live, spelling.live):
+		if sender is Movie:
+			index.movie_deleted(instance.pk)
+		else:
+			index.actor_deleted(instance.pk)
+
+
+def invalidate_review_movie(sender, instance, **kwargs):
+	Movie.bump_cache_version([instance.movie_id])
+
+
+def invalidate_feedback_movie(sender, instance, **kwargs):
+	"""Likes and comments are shown with their review on the movie page"""
+	movie_id = Review.objects.filter(pk=instance.review_id).values_list('movie_id', flat=True).first()
+	if movie_id is not None:
+		Movie.bump_cache_version([movie_id])
+
+
+post_save.connect(index_saved_movie, sender=Movie)
+post_save.connect(schedule_poster_download, sender=Movie)
+post_delete.connect(unindex_deleted_movie, sender=Movie)
+pre_delete.connect(touch_deleted_movie_genres, sender=Movie)
+m2m_changed.connect(touch_linked_genres, sender=Movie.Genre.through)
+m2m_changed.connect(index_movie_relations, sender=Movie.Actors.through)
+m2m_changed.connect(index_movie_relations, sender=Movie.Genre.through)
+m2m_changed.connect(invalidate_movie_ratings, sender=Movie.Ratings.through)
+post_save.connect(sync_casting, sender=Casting)
+post_delete.connect(sync_casting, sender=Casting)
+m2m_changed.connect(refresh_movie_cards, sender=Movie.Actors.through)
+m2m_changed.connect(refresh_movie_cards, sender=Movie.Genre.through)
+m2m_changed.connect(refresh_movie_cards, sender=Movie.Ratings.through)
+for model in (Genre, Actor, Rating):
+	post_save.connect(refresh_renamed_cards, sender=model)
+	pre_delete.connect(note_card_movies, sender=model)
+	post_delete.connect(refresh_deleted_cards, sender=model)
+for model in (Movie, Actor):
+	post_save.connect(update_suggestions, sender=model)
+	post_delete.connect(drop_suggestions, sender=model)
+post_save.connect(invalidate_review_movie, sender=Review)
+post_delete.connect(invalidate_review_movie, sender=Review)
+post_save.connect(invalidate_feedback_movie, sender=Likes)
+post_delete.connect(invalidate_feedback_movie, sender=Likes)
+post_save.connect(invalidate_feedback_movie, sender=Comment)
+post_delete.connect(invalidate_feedback_movie, sender=Comment)
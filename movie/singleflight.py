@@ -0,0 +1,124 @@
+"""
+Single-flight coordination for first-time ingestion of a title.
+
+When many requests open the same uncached imdbID at once, one of them
+takes a lease in the shared SQLite file of movie/omdb_cache.py and ingests
+the title. The others wait briefly for the row to appear, and if the
+leader is slow they render from the OMDb payload it already put in the
+shared response cache instead of ingesting again. Without a cache file,
+or when it cannot be written, the leases fall back to in-process locks.
+"""
+import logging
+import os
+import threading
+import time
+
+from movie import omdb_cache
+
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 15
+WAIT_SECONDS = 5
+POLL_SECONDS = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+	key TEXT PRIMARY KEY,
+	owner TEXT NOT NULL,
+	expires_at REAL NOT NULL
+);
+"""
+
+_local_flights = set()
+_local_lock = threading.Lock()
+_schema_ready = set()
+
+
+def owner():
+	return '%s:%s' % (os.getpid(), threading.get_ident())
+
+
+def connect(cache):
+	conn = cache.connect()
+	if cache.path not in _schema_ready:
+		conn.executescript(SCHEMA)
+		_schema_ready.add(cache.path)
+	return conn
+
+
+def acquire(key):
+	"""Try to become the leader for `key`"""
+	cache = omdb_cache.get_cache()
+	if cache is not None:
+		try:
+			conn = connect(cache)
+			now = time.time()
+			# An expired lease belongs to a leader that died, take it over
+			conn.execute('DELETE FROM flights WHERE key = ? AND expires_at < ?', (key, now))
+			cursor = conn.execute(
+				'INSERT OR IGNORE INTO flights (key, owner, expires_at) VALUES (?, ?, ?)',
+				(key, owner(), now + LEASE_SECONDS),
+			)
+			return cursor.rowcount == 1
+		except omdb_cache.CACHE_ERRORS as e:
+			logger.warning('Single-flight lease of %s taken in-process: %s', key, e)
+
+	with _local_lock:
+		if key in _local_flights:
+			return False
+		_local_flights.add(key)
+		return True
+
+
+def release(key):
+	with _local_lock:
+		_local_flights.discard(key)
+	cache = omdb_cache.get_cache()
+	if cache is not None:
+		try:
+			connect(cache).execute('DELETE FROM flights WHERE key = ? AND owner = ?', (key, owner()))
+		except omdb_cache.CACHE_ERRORS:
+			pass  # the lease expires on its own
+
+
+def in_flight(key):
+	with _local_lock:
+		if key in _local_flights:
+			return True
+	cache = omdb_cache.get_cache()
+	if cache is None:
+		return False
+	try:
+		row = connect(cache).execute(
+			'SELECT 1 FROM flights WHERE key = ? AND expires_at >= ?', (key, time.time())
+		).fetchone()
+	except omdb_cache.CACHE_ERRORS:
+		return False
+	return row is not None
+
+
+def wait(key, check, timeout=WAIT_SECONDS):
+	"""
+	Poll `check` until it returns something or the leader of `key` is gone.
+	Returns the last result of `check` and whether the wait timed out with
+	the leader still at work.
+	"""
+	deadline = time.monotonic() + timeout
+	while True:
+		result = check()
+		if result:
+			return result, False
+		if not in_flight(key):
+			# The leader may have stored its result and released the key
+			# since `check` ran
+			return check(), False
+		if time.monotonic() >= deadline:
+			return result, True
+		time.sleep(POLL_SECONDS)
+
+
+def count(name):
+	cache = omdb_cache.get_cache()
+	if cache is not None:
+		cache.incr('singleflight', name)
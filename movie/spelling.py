@@ -0,0 +1,191 @@
+"""
+"Did you mean" for searches nothing matched: movie titles and actor names
+spelled like the query, from a trigram index kept in memory.
+
+Names are normalized like the autocomplete keys (movie/autocomplete.py)
+and cut into the trigrams of their words, padded like PostgreSQL's
+pg_trgm: "godfather" gives "  g", " go", "god", ..., "er ". The index maps
+every trigram to the sorted array of the names having it, all postings in
+one CSR pair of arrays. A query counts, with one bincount over the
+postings of its trigrams, how many of them each name shares; the share of
+the query's trigrams found scores the candidates, and the best ones are
+ranked again by how close the query is to the words of the name
+(difflib's ratio against the name's runs of about as many words as the
+query).
+
+Like the autocomplete index, it is built on first use and changes go to
+an overlay (movie/catalog_index.py: names added or changed since, their
+stale postings skipped),
+applied by signals for this process and read back from Movie.modified_at
+for the others.
+
+views.search_movies() asks it when the local full-text search finds
+nothing. When the closest name is at least SPELLING_CORRECTION_RATIO
+close, the words of it the query was closest to are searched instead,
+locally, without asking OMDb.
+"""
+import difflib
+import math
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from movie.autocomplete import normalize
+from movie.catalog_index import OverlayIndex, LiveIndex
+
+
+# Candidates ranked again by closeness, out of those sharing the most trigrams
+CANDIDATES = 20
+
+# Names less close than this to the query are not worth suggesting
+MIN_CLOSENESS = 0.65
+
+# Shorter queries are one typo away from too many words ("heat", "hat")
+# to be corrected without asking
+CORRECTION_MIN_LENGTH = 5
+
+Suggestion = namedtuple('Suggestion', ['name', 'display', 'similarity', 'closeness', 'correction'])
+
+
+def trigrams(name):
+	"""Trigrams of the words of a normalized name"""
+	grams = set()
+	for word in name.split():
+		padded = '  %s ' % word
+		grams.update(padded[start:start + 3] for start in range(len(padded) - 2))
+	return grams
+
+
+def closeness(query, name):
+	"""
+	(similarity ratio, run) of `query` and the closest run of words of
+	`name`, of as many words as the query give or take one for words
+	split or run together ("spiderman", "spider man"), or all of it.
+	"""
+	words, count = name.split(), len(query.split())
+	runs = {name}
+	for length in range(max(count - 1, 1), count + 2):
+		runs.update(' '.join(words[start:start + length]) for start in range(max(len(words) - length + 1, 1)))
+
+	# The matcher caches what it learns of its second sequence, the query
+	matcher = difflib.SequenceMatcher(None, '', query)
+	best = (0.0, name)
+	for run in sorted(runs):
+		matcher.set_seq1(run)
+		# Cheap upper bounds first
+		if matcher.real_quick_ratio() > best[0] and matcher.quick_ratio() > best[0]:
+			best = max(best, (matcher.ratio(), run))
+	return best
+
+
+class TrigramIndex(OverlayIndex):
+
+	def build(self, names):
+		self.names = [normalize(name) for name in names]
+		self.grams = {}
+		rows, positions = [], []
+		for position, name in enumerate(self.names):
+			for gram in trigrams(name):
+				rows.append(self.grams.setdefault(gram, len(self.grams)))
+				positions.append(position)
+		rows = np.array(rows, dtype=np.int64)
+		# Stable, the positions of a trigram stay sorted
+		order = np.argsort(rows, kind='stable')
+		self.postings = np.array(positions, dtype=np.int32)[order]
+		self.indptr = np.zeros(len(self.grams) + 1, dtype=np.int64)
+		np.cumsum(np.bincount(rows, minlength=len(self.grams)), out=self.indptr[1:])
+		# Trigram -> ids of the overlay, sets replaced rather than modified
+		# so copies can share them
+		self.overlay_grams = {}
+
+	def copy(self):
+		clone = super().copy()
+		clone.overlay_grams = dict(self.overlay_grams)
+		return clone
+
+	def put(self, pk, name, score, display):
+		super().put(pk, normalize(name), score, display)
+
+	def index(self, pk, name):
+		for gram in trigrams(name):
+			self.overlay_grams[gram] = self.overlay_grams.get(gram, frozenset()) | {pk}
+
+	def unindex(self, pk, name):
+		for gram in trigrams(name):
+			self.overlay_grams[gram] = self.overlay_grams[gram] - {pk}
+
+	def shared(self, grams, min_count):
+		"""[(trigrams shared, score, name, display)] of the names sharing at least `min_count` of `grams`"""
+		rows = [self.grams[gram] for gram in grams if gram in self.grams]
+		found = []
+		if rows:
+			positions = np.concatenate([self.postings[self.indptr[row]:self.indptr[row + 1]] for row in rows])
+			counts = np.bincount(positions, minlength=len(self.ids))
+			matched = np.flatnonzero(counts >= min_count)
+			if self.stale:
+				matched = matched[~np.isin(self.ids[matched], list(self.stale))]
+			# Most trigrams shared, then most popular
+			matched = matched[np.lexsort((-self.scores[matched], -counts[matched]))[:CANDIDATES]]
+			found = [
+				(int(counts[position]), int(self.scores[position]), self.names[position], self.display[position])
+				for position in matched.tolist()
+			]
+
+		overlay = Counter(pk for gram in grams for pk in self.overlay_grams.get(gram, ()))
+		for pk, count in overlay.items():
+			if count >= min_count:
+				name, score, display = self.overlay[pk]
+				found.append((count, score, name, display))
+		return found
+
+	def suggest(self, query, limit, min_similarity):
+		"""[Suggestion] for a normalized query, closest first"""
+		grams = trigrams(query)
+		if not grams:
+			return []
+		found = self.shared(grams, max(math.ceil(min_similarity * len(grams)), 1))
+		candidates = sorted(found, key=lambda found: (-found[0], -found[1]))[:CANDIDATES]
+		suggestions = [
+			(Suggestion(name, display, count / len(grams), *closeness(query, name)), score)
+			for count, score, name, display in candidates
+		]
+		suggestions = [found for found in suggestions if found[0].closeness >= MIN_CLOSENESS]
+		suggestions.sort(key=lambda found: (-found[0].closeness, -found[0].similarity, -found[1]))
+		return [suggestion for suggestion, score in suggestions[:limit]]
+
+
+live = LiveIndex(TrigramIndex, 'SPELLING')
+
+
+def suggest(query, limit=None):
+	"""
+	Titles and actor names spelled like `query`, closest first: their
+	autocomplete display with their `text`, `kind` ('movie' or 'actor'),
+	`similarity` (share of the query's trigrams), `closeness` and the
+	`correction` of the query, the words of the name it is closest to.
+	"""
+	query = normalize(query)
+	limit = limit or settings.SPELLING_SUGGESTIONS
+	index = live.get()
+	found = [
+		(suggestion, 'movie') for suggestion in index.movies.suggest(query, limit, settings.SPELLING_MIN_SIMILARITY)
+	] + [
+		(suggestion, 'actor') for suggestion in index.actors.suggest(query, limit, settings.SPELLING_MIN_SIMILARITY)
+	]
+	found.sort(key=lambda pair: (-pair[0].closeness, -pair[0].similarity))
+	return [
+		dict(
+			suggestion.display, kind=kind, similarity=suggestion.similarity, closeness=suggestion.closeness,
+			correction=suggestion.correction, text=suggestion.display['title' if kind == 'movie' else 'name'],
+		)
+		for suggestion, kind in found[:limit]
+	]
+
+
+def correction(query, suggestions):
+	"""What to search instead of `query` given its suggestions, None when none is close enough"""
+	if not suggestions or len(normalize(query)) < CORRECTION_MIN_LENGTH:
+		return None
+	best = suggestions[0]
+	return best['correction'] if best['closeness'] >= settings.SPELLING_CORRECTION_RATIO else None
@@ -0,0 +1,35 @@
+from django import template
+from django.conf import settings
+from django.utils.html import format_html
+
+from movie.posters import variant_url
+
+
+register = template.Library()
+
+# Grid cards are a third of the container on desktop and full width on phones
+GRID_SIZES = '(min-width: 601px) 33vw, 100vw'
+
+
+@register.simple_tag
+def poster_srcset(movie, extension='webp'):
+	"""srcset of the poster thumbnails, empty until the poster has been processed"""
+	if not movie.Poster_hash:
+		return ''
+	return ', '.join(
+		'%s %sw' % (variant_url(movie.Poster_hash, width, extension), width)
+		for width in settings.POSTER_WIDTHS
+	)
+
+
+@register.simple_tag
+def poster_picture(movie, css_class='', sizes=GRID_SIZES):
+	"""<picture> serving WebP thumbnails, JPEG ones as fallback and the full poster otherwise"""
+	if not movie.Poster_hash:
+		return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', movie.poster_src, movie.Title, css_class)
+	return format_html(
+		'<picture><source type="image/webp" srcset="{}" sizes="{}">'
+		'<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy"></picture>',
+		poster_srcset(movie, 'webp'), sizes,
+		movie.poster_src, poster_srcset(movie, 'jpg'), sizes, movie.Title, css_class,
+	)
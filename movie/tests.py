@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, override_settings
 
-# Create your tests here.
+from movie import singleflight
+
+
+@override_settings(OMDB_CACHE_PATH='')
+class SingleFlightWaitTests(SimpleTestCase):
+
+	def test_result_stored_as_the_leader_releases(self):
+		key = 'ingest:tt0068646'
+		self.assertTrue(singleflight.acquire(key))
+		results = []
+
+		def check():
+			# The leader stores its row and releases the key right after
+			# the first check found nothing
+			if not results:
+				results.append('movie')
+				singleflight.release(key)
+				return None
+			return results[0]
+
+		self.assertEqual(singleflight.wait(key, check, timeout=1), ('movie', False))
+
+	def test_leader_gone_without_result(self):
+		self.assertEqual(singleflight.wait('ingest:tt0000000', lambda: None, timeout=1), (None, False))
+
+	def test_timeout(self):
+		key = 'ingest:tt0111161'
+		self.assertTrue(singleflight.acquire(key))
+		try:
+			self.assertEqual(singleflight.wait(key, lambda: None, timeout=0.1), (None, True))
+		finally:
+			singleflight.release(key)
@@ -1,10 +1,15 @@
 from django.urls import path
-from movie.views import index, pagination, movieDetails, genres, addMoviesToWatch, addMoviesWatched, Rate, DeleteReview, removeFromWatchlist, removeFromWatchlistAjax, markAsWatchedAjax
+from movie.views import index, pagination, movieDetails, genres, addMoviesToWatch, addMoviesWatched, Rate, DeleteReview, removeFromWatchlist, removeFromWatchlistAjax, markAsWatchedAjax, bulkMovieLists, movieReviews, charts, browse, suggestions
 
 
 urlpatterns = [
 	path('', index, name='index'),
 	path('search/<query>/page/<page_number>', pagination, name='pagination'),
+	path('browse', browse, name='browse'),
+	path('autocomplete', suggestions, name='autocomplete'),
+	path('charts', charts, name='charts'),
+	path('lists/bulk', bulkMovieLists, name='bulk-movie-lists'),
+	path('charts/<slug:genre_slug>', charts, name='genre-charts'),
 	path('<imdb_id>', movieDetails, name='movie-details'),
 	path('<imdb_id>/addtomoviewatch', addMoviesToWatch, name='add-movies-to-watch'),
 	path('<imdb_id>/addmoviewatched', addMoviesWatched, name='add-movies-watched'),
@@ -14,4 +19,5 @@ urlpatterns = [
 	path('genre/<slug:genre_slug>', genres, name='genres'),
 	path('<imdb_id>/rate', Rate, name='rate-movie'),
 	path('<imdb_id>/delete-review', DeleteReview, name='delete-review'),
+	path('<imdb_id>/reviews', movieReviews, name='movie-reviews'),
 ]
\ No newline at end of file
@@ -1,21 +1,30 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.template import loader
-from django.utils.text import slugify
 from django.core.paginator import Paginator
 from django.urls import reverse
-from django.db.models import Avg
-
-from movie.models import Movie, Genre, Rating, Review
-from actor.models import Actor
-from authy.models import Profile
+from django.db import transaction
+from django.contrib import messages
+from django.conf import settings
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
+from django.utils.cache import patch_cache_control
+
+from movie import autocomplete, facets, listings, omdb, reviews, search, spelling
+from movie.conditional import conditional_page, movie_markers, genre_markers
+from movie.prefetch import prefetch_after
+from movie.ingest import fetch_and_ingest
+from movie.numeric import parse_int, parse_float
+from movie.models import Movie, Genre, Review, MovieRank, MOVIE_SORTS, DEFAULT_MOVIE_SORT
+from authy.models import Profile, UserMovieState
 from django.contrib.auth.models import User
-from gamification.services import award_points
+from gamification.services import award_points, award_points_bulk
 
 
 from movie.forms import RateForm
 
-import requests
+import json
 import re
 
 
@@ -25,202 +34,248 @@ def validate_imdb_id(imdb_id):
 	return bool(re.match(pattern, imdb_id))
 
 
+def local_search_results(query, page_number=1):
+	"""Search our own catalog, shaped like an OMDb search payload"""
+	results, total = search.search(query, limit=9, offset=(page_number - 1) * 9)
+	movies = []
+	for movie, snippet in results:
+		movies.append({
+			'Title': movie.Title,
+			'Year': movie.Year,
+			'imdbID': movie.imdbID,
+			'Type': movie.Type,
+			'Poster': movie.poster_src,
+			'Snippet': snippet,
+		})
+	return {
+		'Search': movies,
+		'Response': 'True' if movies else 'False',
+		'totalResults': total,
+		'local': True,
+		'has_next': total > page_number * 9,
+	}
+
+
+def search_movies(query, page_number=1, exact=False):
+	"""
+	Answer from the local catalog when it has enough hits, otherwise ask
+	OMDb, falling back to whatever we have locally when OMDb is unavailable.
+
+	A query without a single local hit is probably misspelled: when a local
+	title or actor name is close enough, it is searched instead without
+	asking OMDb, unless `exact`. Otherwise the closest names are offered
+	as "did you mean" if OMDb finds nothing either.
+	"""
+	local_data = local_search_results(query, page_number)
+	if local_data['totalResults'] >= settings.LOCAL_SEARCH_MIN_RESULTS:
+		return local_data
+
+	suggestions = []
+	if not local_data['totalResults']:
+		suggestions = [
+			dict(suggestion, url=suggestion_url(suggestion)) for suggestion in spelling.suggest(query)
+		]
+		correction = None if exact else spelling.correction(query, suggestions)
+		if correction:
+			corrected = local_search_results(correction, page_number)
+			if corrected['totalResults']:
+				corrected['corrected'] = correction
+				corrected['suggestions'] = suggestions[1:]
+				return corrected
+
+	try:
+		movie_data = omdb.search(query, page_number)
+	except omdb.OMDbError:
+		local_data['suggestions'] = suggestions
+		return local_data
+
+	if "Search" in movie_data:
+		movie_data["Search"] = movie_data["Search"][:9]  # only first 9 movies
+	else:
+		movie_data['suggestions'] = suggestions
+	movie_data['has_next'] = 'Search' in movie_data
+	return movie_data
+
+
+def suggestion_url(suggestion):
+	if suggestion['kind'] == 'movie':
+		return reverse('movie-details', args=[suggestion['imdbID']])
+	return reverse('actors', args=[suggestion['slug']]) if suggestion['slug'] else None
+
+
 # Create your views here.
 def index(request):
 	query = request.GET.get('q')
 
 	if query:
-		url = 'http://www.omdbapi.com/?apikey=4eb57329&s=' + query
-		response = requests.get(url)
-		movie_data = response.json()
-		if "Search" in movie_data:
-			movie_data["Search"] = movie_data["Search"][:9]  # only first 9 movies
+		exact = bool(request.GET.get('exact'))
+		movie_data = search_movies(query, exact=exact)
 
 		context = {
 			'query': query,
 			'movie_data': movie_data,
 			'page_number': 1,
+			'exact': exact,
 		}
 
 		template = loader.get_template('search_results.html')
-
-		return HttpResponse(template.render(context, request))
+		return prefetch_after(HttpResponse(template.render(context, request)), movie_data)
 
 	return render(request, 'index.html')
 
 
 def pagination(request, query, page_number):
     page_number = int(page_number)
-    url = f'http://www.omdbapi.com/?apikey=4eb57329&s={query}&page={page_number}'
-    response = requests.get(url)
-    movie_data = response.json()
-    if "Search" in movie_data:
-        movie_data["Search"] = movie_data["Search"][:9]  # only first 9 movies
+    exact = bool(request.GET.get('exact'))
+    movie_data = search_movies(query, page_number, exact=exact)
 
     context = {
         'query': query,
         'movie_data': movie_data,
         'page_number': page_number,  # keep current page number
+        'exact': exact,
     }
 
     template = loader.get_template('search_results.html')
-    return HttpResponse(template.render(context, request))
+    return prefetch_after(HttpResponse(template.render(context, request)), movie_data)
+
+def review_viewer(request):
+	"""
+	Fragment cache key part of the reviews block of movie_details.html.
+	Anonymous visitors share one rendering; signed-in users see their own
+	like/delete links and a comment form holding their CSRF token, so they
+	get one per user and CSRF secret.
+	"""
+	if not request.user.is_authenticated:
+		return ''
+	get_token(request)
+	return '%s:%s' % (request.user.pk, request.META['CSRF_COOKIE'])
 
+
+def movie_details_markers(request, imdb_id):
+	return movie_markers(Movie.objects.filter(imdbID=imdb_id))
+
+
+@conditional_page(movie_details_markers)
 def movieDetails(request, imdb_id):
 	# Validate IMDB ID format
 	if not validate_imdb_id(imdb_id):
 		return HttpResponseRedirect(reverse('index'))
 
-	if Movie.objects.filter(imdbID=imdb_id).exists():
-		movie_data = Movie.objects.get(imdbID=imdb_id)
-		reviews = Review.objects.filter(movie=movie_data).select_related('user', 'user__profile').prefetch_related('comments__user', 'comments__user__profile')
-		reviews_avg = reviews.aggregate(Avg('rate'))
-		reviews_count = reviews.count()
-		our_db = True
+	movie_data = Movie.objects.filter(imdbID=imdb_id).first()
+	if movie_data is None:
+		try:
+			payload, movie_data = fetch_and_ingest(imdb_id)
+		except omdb.OMDbError:
+			messages.error(request, 'Movie details are temporarily unavailable, please try again shortly.')
+			return HttpResponseRedirect(reverse('index'))
 
-		# Check if current user has already reviewed this movie
-		user_has_reviewed = False
-		current_user = None
-		
-		if request.user.is_authenticated:
-			current_user = request.user
-			profile = Profile.objects.get(user=current_user)
-			user_has_reviewed = Review.objects.filter(user=request.user, movie=movie_data).exists()
-			in_watchlist = profile.to_watch.filter(imdbID=imdb_id).exists()
-			is_watched = profile.watched.filter(imdbID=imdb_id).exists()
-		else:
-			user_has_reviewed = False
-			in_watchlist = False
-			is_watched = False
+		if payload is not None:
+			if payload.get('Response') == 'False':
+				return HttpResponseRedirect(reverse('index'))
 
-		context = {
-			'movie_data': movie_data,
-			'reviews': reviews,
-			'reviews_avg': reviews_avg,
-			'reviews_count': reviews_count,
-			'our_db': our_db,
-			'user_has_reviewed': user_has_reviewed,
-			'current_user': current_user,
-
-			'in_watchlist': in_watchlist,
-			'is_watched': is_watched
-		}
+			# First view of the title, render straight from the OMDb payload
+			context = {
+				'movie_data': payload,
+				'our_db': False,
+				# A one-off rendering, the next view comes from the catalog
+				'cache_seconds': 0,
+			}
+			template = loader.get_template('movie_details.html')
+			return HttpResponse(template.render(context, request))
 
-	else:
-		url = 'http://www.omdbapi.com/?apikey=4eb57329&i=' + imdb_id
-		response = requests.get(url)
-		movie_data = response.json()
-
-		#Inject to our database bellow:
-
-		rating_objs = []
-		genre_objs = []
-		actor_objs = []
-
-		#For the actors
-		actor_list = [x.strip() for x in movie_data['Actors'].split(',')]
-
-		for actor in actor_list:
-			a, created = Actor.objects.get_or_create(name=actor)
-			actor_objs.append(a)
-
-		#For the Genre or categories
-		genre_list = list(movie_data['Genre'].replace(" ", "").split(','))
-
-		for genre in genre_list:
-			genre_slug = slugify(genre)
-			g, created = Genre.objects.get_or_create(title=genre, slug=genre_slug)
-			genre_objs.append(g)
-
-		#For the Rate
-		for rate in movie_data['Ratings']:
-			r, created = Rating.objects.get_or_create(source=rate['Source'], rating=rate['Value'])
-			rating_objs.append(r)
-
-		if movie_data['Type'] == 'movie':  #update for movies
-			m, created = Movie.objects.get_or_create(
-				Title=movie_data['Title'],
-				Year=movie_data['Year'],
-				Rated=movie_data['Rated'],
-				Released=movie_data['Released'],
-				Runtime=movie_data['Runtime'],
-				Director=movie_data['Director'],
-				Writer=movie_data['Writer'],
-				Plot=movie_data['Plot'],
-				Language=movie_data['Language'],
-				Country=movie_data['Country'],
-				Awards=movie_data['Awards'],
-				Poster_url=movie_data['Poster'],
-				Metascore=movie_data['Metascore'],
-				imdbRating=movie_data['imdbRating'],
-				imdbVotes=movie_data['imdbVotes'],
-				imdbID=movie_data['imdbID'],
-				Type=movie_data['Type'],
-				DVD=movie_data['DVD'],
-				BoxOffice=movie_data['BoxOffice'],
-				Production=movie_data['Production'],
-				Website=movie_data['Website'],
-				)
-			m.Genre.set(genre_objs)
-			m.Actors.set(actor_objs)
-			m.Ratings.set(rating_objs)
-
-		else:             #create
-			m, created = Movie.objects.get_or_create(
-				Title=movie_data['Title'],
-				Year=movie_data['Year'],
-				Rated=movie_data['Rated'],
-				Released=movie_data['Released'],
-				Runtime=movie_data['Runtime'],
-				Director=movie_data['Director'],
-				Writer=movie_data['Writer'],
-				Plot=movie_data['Plot'],
-				Language=movie_data['Language'],
-				Country=movie_data['Country'],
-				Awards=movie_data['Awards'],
-				Poster_url=movie_data['Poster'],
-				Metascore=movie_data['Metascore'],
-				imdbRating=movie_data['imdbRating'],
-				imdbVotes=movie_data['imdbVotes'],
-				imdbID=movie_data['imdbID'],
-				Type=movie_data['Type'],
-				totalSeasons=movie_data['totalSeasons'],
-				)
-
-			m.Genre.set(genre_objs)
-			m.Actors.set(actor_objs)
-			m.Ratings.set(rating_objs)
-
-
-		for actor in actor_objs:
-			actor.movies.add(m)
-			actor.save()
-
-		m.save()
-		our_db = False
+	review_sort = request.GET.get('reviews')
+	if review_sort not in reviews.REVIEW_SORTS:
+		review_sort = reviews.DEFAULT_SORT
+	# Only the first page is rendered here, and only on a fragment cache miss
+	reviews_page = SimpleLazyObject(lambda: reviews.review_page(movie_data, review_sort))
+	our_db = True
 
-		context = {
-			'movie_data': movie_data,
-			'our_db': our_db,
-		}
+	# Whether the current user reviewed, watched or listed this movie, one query
+	current_user = request.user if request.user.is_authenticated else None
+	state = UserMovieState.objects.lookup(request.user, [movie_data]).get(movie_data.pk)
+	user_has_reviewed = state is not None and state.reviewed
+	in_watchlist = state is not None and state.in_watchlist
+	is_watched = state is not None and state.watched
+
+	context = {
+		'movie_data': movie_data,
+		'cache_seconds': settings.MOVIE_DETAILS_CACHE_SECONDS,
+		'review_viewer': review_viewer(request),
+		'reviews_page': reviews_page,
+		'review_sort': review_sort,
+		'our_db': our_db,
+		'user_has_reviewed': user_has_reviewed,
+		'current_user': current_user,
+
+		'in_watchlist': in_watchlist,
+		'is_watched': is_watched
+	}
 
 	template = loader.get_template('movie_details.html')
 
 	return HttpResponse(template.render(context, request))
 
 
+def movieReviews(request, imdb_id):
+	"""JSON page of a movie's reviews, ?sort= as on the details page, ?cursor= from the previous page"""
+	movie = get_object_or_404(Movie, imdbID=imdb_id)
+	sort = request.GET.get('sort')
+	if sort not in reviews.REVIEW_SORTS:
+		sort = reviews.DEFAULT_SORT
+	try:
+		page = reviews.review_page(movie, sort, request.GET.get('cursor'))
+	except reviews.InvalidCursor:
+		return JsonResponse({'success': False, 'message': 'Invalid cursor.'}, status=400)
+
+	current_user = request.user if request.user.is_authenticated else None
+	html = ''.join(
+		render_to_string('review_card.html', {'review': review, 'movie_data': movie, 'current_user': current_user}, request)
+		for review in page.items
+	)
+	return JsonResponse({
+		'success': True,
+		'reviews': [{
+			'id': review.id,
+			'username': review.user.username,
+			'date': review.date,
+			'rate': review.rate,
+			'text': review.text,
+			'likes': review.likes,
+			'unlikes': review.unlikes,
+			'comment_count': review.comment_count,
+		} for review in page.items],
+		'html': html,
+		'next_cursor': page.next_cursor,
+	})
+
+
+def genre_page_markers(request, genre_slug):
+	return genre_markers(Genre.objects.filter(slug=genre_slug))
+
+
+@conditional_page(genre_page_markers)
 def genres(request, genre_slug):
 	genre = get_object_or_404(Genre, slug=genre_slug)
 	movies = Movie.objects.filter(Genre=genre)
+	sort = request.GET.get('sort')
+	if sort not in MOVIE_SORTS:
+		sort = DEFAULT_MOVIE_SORT
 
 	#Pagination
-	paginator = Paginator(movies, 9)
-	page_number = request.GET.get('page')
-	movie_data = paginator.get_page(page_number)
+	cursor = request.GET.get('after')
+	try:
+		page = listings.movie_page(movies, sort, cursor)
+	except reviews.InvalidCursor:
+		return HttpResponseRedirect('%s?sort=%s' % (request.path, sort))
 
 	context = {
-		'movie_data': movie_data,
+		'movie_data': UserMovieState.objects.annotate(request.user, page.items),
+		'next_cursor': page.next_cursor,
+		'first_page': not cursor,
+		'total': listings.movie_count('genre:%s' % genre.pk, movies),
 		'genre': genre,
+		'sort': sort,
 	}
 
 
@@ -229,6 +284,91 @@ def genres(request, genre_slug):
 	return HttpResponse(template.render(context, request))
 
 
+BROWSE_PAGE_SIZE = 24
+
+
+def browse(request):
+	"""Movies filtered by genres, type, years and rating, from the in-memory facet index"""
+	genres = request.GET.getlist('genre')
+	types = request.GET.getlist('type')
+	years = (parse_int(request.GET.get('from')), parse_int(request.GET.get('to')))
+	min_rating = parse_float(request.GET.get('rating'))
+	sort = request.GET.get('sort')
+	if sort not in MOVIE_SORTS:
+		sort = DEFAULT_MOVIE_SORT
+	page_number = max(parse_int(request.GET.get('page')) or 1, 1)
+
+	result = facets.get_index().browse(
+		genres, types, years, min_rating, sort,
+		offset=(page_number - 1) * BROWSE_PAGE_SIZE, limit=BROWSE_PAGE_SIZE,
+	)
+	movies = Movie.objects.in_bulk(result.ids)
+	movies = [movies[pk] for pk in result.ids if pk in movies]
+
+	# The filters without the page, for the pagination links
+	query = request.GET.copy()
+	query.pop('page', None)
+
+	context = {
+		'movie_data': UserMovieState.objects.annotate(request.user, movies),
+		'total': result.total,
+		'counts': result.counts,
+		'genres': genres,
+		'types': types,
+		'year_from': years[0],
+		'year_to': years[1],
+		'min_rating': min_rating,
+		'sort': sort,
+		'page_number': page_number,
+		'has_previous': page_number > 1,
+		'has_next': page_number * BROWSE_PAGE_SIZE < result.total,
+		'query': query.urlencode(),
+	}
+
+	template = loader.get_template('browse.html')
+
+	return HttpResponse(template.render(context, request))
+
+
+def suggestions(request):
+	"""Titles and actors starting with ?q=, for the search box, from the in-memory autocomplete index"""
+	query = request.GET.get('q', '')[:100]
+	found = autocomplete.suggest(query)
+	response = JsonResponse({
+		'query': query,
+		'movies': [
+			dict(movie, url=reverse('movie-details', args=[movie['imdbID']])) for movie in found['movies']
+		],
+		'actors': [
+			dict(actor, url=reverse('actors', args=[actor['slug']])) for actor in found['actors'] if actor['slug']
+		],
+	})
+	# Every keystroke asks, let browsers keep answers for a moment
+	patch_cache_control(response, max_age=60)
+	return response
+
+
+def charts(request, genre_slug=None):
+	"""Top rated movies overall or in a genre, from the ranks materialized by refresh_charts"""
+	genre = get_object_or_404(Genre, slug=genre_slug) if genre_slug else None
+	ranks = MovieRank.objects.filter(genre=genre, score__isnull=False).select_related('movie').order_by('-score', 'movie_id')
+
+	paginator = Paginator(ranks, 50)
+	page_number = request.GET.get('page')
+	ranks = paginator.get_page(page_number)
+
+	context = {
+		'ranks': ranks,
+		'genre': genre,
+		'genres': Genre.objects.filter(chart_prior__isnull=False).order_by('title'),
+		'min_votes': settings.CHARTS_MIN_VOTES,
+	}
+
+	template = loader.get_template('charts.html')
+
+	return HttpResponse(template.render(context, request))
+
+
 def addMoviesToWatch(request, imdb_id):
 	movie = Movie.objects.get(imdbID=imdb_id)
 	user = request.user
@@ -343,6 +483,89 @@ def markAsWatchedAjax(request, imdb_id):
 	}, status=405)
 
 
+BULK_OPERATIONS = ('watchlist', 'watched', 'remove')
+
+
+def bulkMovieLists(request):
+	"""
+	AJAX endpoint changing the watchlist or watched list for many titles at
+	once. Takes a JSON body {"operation": "watchlist" | "watched" | "remove",
+	"imdb_ids": [...]}: "watched" also takes the titles off the watchlist,
+	like markAsWatchedAjax, and "remove" takes them off the watchlist. The
+	movies are read in one query and each list is written with one insert
+	or delete, all in one transaction.
+	"""
+	if request.method != 'POST':
+		return JsonResponse({
+			'success': False,
+			'message': 'Invalid request method.'
+		}, status=405)
+	if not request.user.is_authenticated:
+		return JsonResponse({
+			'success': False,
+			'message': 'Please log in first.'
+		}, status=401)
+
+	try:
+		data = json.loads(request.body)
+		operation = data['operation']
+		imdb_ids = data['imdb_ids']
+		if not isinstance(imdb_ids, list):
+			raise TypeError(imdb_ids)
+		imdb_ids = list(dict.fromkeys(imdb_ids))
+	except (ValueError, TypeError, KeyError):
+		return JsonResponse({
+			'success': False,
+			'message': 'Expected a JSON object with an operation and imdb_ids.'
+		}, status=400)
+	if operation not in BULK_OPERATIONS or not all(isinstance(imdb_id, str) for imdb_id in imdb_ids):
+		return JsonResponse({
+			'success': False,
+			'message': 'Unknown operation or invalid IMDb IDs.'
+		}, status=400)
+	if len(imdb_ids) > settings.MOVIE_LISTS_BULK_MAX:
+		return JsonResponse({
+			'success': False,
+			'message': f'At most {settings.MOVIE_LISTS_BULK_MAX} titles per request.'
+		}, status=400)
+
+	user = request.user
+	profile = Profile.objects.filter(user=user).first()
+	if profile is None:
+		return JsonResponse({
+			'success': False,
+			'message': 'Profile not found.'
+		}, status=404)
+
+	valid_ids = [imdb_id for imdb_id in imdb_ids if validate_imdb_id(imdb_id)]
+	movies = list(Movie.objects.filter(imdbID__in=valid_ids).only('pk', 'imdbID', 'Title', 'Type'))
+	found = {movie.imdbID for movie in movies}
+	newly_watched = 0
+
+	with transaction.atomic():
+		if operation == 'watchlist':
+			profile.to_watch.add(*movies)
+		elif operation == 'remove':
+			profile.to_watch.remove(*movies)
+		else:
+			already_watched = set(profile.watched.filter(pk__in=[movie.pk for movie in movies]).values_list('pk', flat=True))
+			profile.to_watch.remove(*movies)
+			profile.watched.add(*movies)
+			# Award points for watching, only for titles not watched before
+			newly_watched = award_points_bulk(user, 'watch_movie', [
+				(f"Watched {movie.Title}", movie.imdbID) for movie in movies if movie.pk not in already_watched
+			])
+
+	return JsonResponse({
+		'success': True,
+		'operation': operation,
+		'updated': [movie.imdbID for movie in movies],
+		'not_found': [imdb_id for imdb_id in imdb_ids if imdb_id not in found],
+		'newly_watched': newly_watched,
+		'message': f'{len(movies)} of {len(imdb_ids)} titles updated.',
+	})
+
+
 def Rate(request, imdb_id):
 	# Validate IMDB ID format
 	if not validate_imdb_id(imdb_id):
@@ -368,7 +591,9 @@ def Rate(request, imdb_id):
 				rate = form.save(commit=False)
 				rate.user = user
 				rate.movie = movie
-				rate.save()
+				with transaction.atomic():
+					rate.save()
+					Movie.count_review(movie.pk, rate.rate)
 
 				# Award points for rating a movie (Sadia's)
 				award_points(user, 'rate_movie', f"Rated {movie.Title}", movie.imdbID)
@@ -412,8 +637,12 @@ def DeleteReview(request, imdb_id):
 			return HttpResponseRedirect(reverse('movie-details', args=[imdb_id]))
 		
 		if request.method == 'POST':
-			# Delete the review
-			review.delete()
+			# Delete the review, a concurrent delete of the same review must
+			# not count it twice
+			with transaction.atomic():
+				deleted, per_model = Review.objects.filter(pk=review.pk).delete()
+				if per_model.get(Review._meta.label):
+					Movie.count_review(movie.pk, review.rate, -1)
 			return HttpResponseRedirect(reverse('movie-details', args=[imdb_id]))
 		else:
 			# Show confirmation page